@@ -0,0 +1,311 @@
+import argparse
+import asyncio
+import contextlib
+import copy
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+sys.path[:0] = [str(ROOT / "scripts"), str(ROOT)]  # scripts by bare name, as pytest imports them; ROOT for tests.conftest
+
+import aiohttp
+import mongomock
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from pymongo import MongoClient
+
+import avtonet_scraper
+import normalise_vehicles
+import autobid_scraper
+import doberavto_car_sync
+import autolina_scraper
+from vehicle_fields import extract_engine_info
+from html_parsers import parse_avtonet_rows
+from mongo_writes import bulk_upsert_vehicles
+from pipeline import ApiSource, Runtime
+from tests.conftest import replay_bulk_write
+
+# Offline benchmarks for the scrape hot paths. The result pages and API payloads in benchmarks/fixtures are
+# synthetic (made-up listings in the sites' markup and payload shape, not captures of the live sites). They are
+# served by a local HTTP stand-in and written to mongomock (or a scratch database with --mongo-uri), and each
+# source is timed stage by stage: fetch, parse, normalise, write. Browser sources are fetched over plain HTTP,
+# so the numbers cover our code rather than page rendering. Results are JSON; --baseline fails on regressions.
+STAGES = ("fetch", "parse", "normalise", "write")
+
+# Startup is timed per entry point in a fresh interpreter, along with which of the heavy dependencies the import
+# pulled in; they should only load once a run actually opens a browser, the database or an HTTP session.
+ENTRY_POINTS = ("avtonet_scraper", "autobid_scraper", "doberavto_car_sync", "autolina_scraper", "data_cleanup",
+                "remove_duplicate_data", "run_all", "vehicle_fields")
+HEAVY_MODULES = ("playwright", "playwright_stealth", "pymongo", "motor", "aiohttp", "pandas")
+
+AVTONET_HTML = (FIXTURES / "avtonet_results.html").read_text(encoding="utf-8")
+AUTOBID_HTML = (FIXTURES / "autobid_results.html").read_text(encoding="utf-8")
+DOBERAVTO_JSON = json.loads((FIXTURES / "doberavto_search.json").read_text(encoding="utf-8"))
+AUTOLINA_JSON = json.loads((FIXTURES / "autolina_searchcars.json").read_text(encoding="utf-8"))
+
+# ---------- Local HTTP stand-in ----------
+# Every page number serves the same fixture with its listing ids shifted, so each page writes new links
+@lru_cache(maxsize=None)
+def avtonet_page(page_num: int) -> str:
+    return AVTONET_HTML.replace("details.asp?id=", f"details.asp?id={page_num}0")
+
+@lru_cache(maxsize=None)
+def autobid_page(page_num: int) -> str:
+    return AUTOBID_HTML.replace("/sl/avto/", f"/sl/avto/{page_num}0")
+
+@lru_cache(maxsize=None)
+def doberavto_page(offset: int, size: int) -> str:
+    cars = [{**car, "postId": car["postId"] + offset} for car in DOBERAVTO_JSON["results"][:size]]
+    return json.dumps({**DOBERAVTO_JSON, "results": cars})
+
+@lru_cache(maxsize=None)
+def autolina_page(offset: int, limit: int) -> str:
+    cars = [{**car, "carId": car["carId"] + offset} for car in AUTOLINA_JSON["data"]["cars"][:limit]]
+    return json.dumps({"data": {**AUTOLINA_JSON["data"], "cars": cars}})
+
+def stand_in_app() -> web.Application:
+    async def avtonet(request):
+        return web.Response(text=avtonet_page(int(request.query["stran"])), content_type="text/html")
+
+    async def autobid(request):
+        return web.Response(text=autobid_page(int(request.query["currentPage"])), content_type="text/html")
+
+    async def doberavto(request):
+        return web.Response(text=doberavto_page(int(request.query["from"]), int(request.query["results"])), content_type="application/json")
+
+    async def autolina(request):
+        return web.Response(text=autolina_page(int(request.query["offset"]), int(request.query["limit"])), content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/avtonet/results.asp", avtonet)
+    app.router.add_get("/autobid/rezultati-iskanja", autobid)
+    app.router.add_get("/doberavto/search", doberavto)
+    app.router.add_get("/autolina/searchcars", autolina)
+    return app
+
+# ---------- Timing ----------
+class StageTimer:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(name, []).append(time.perf_counter() - started)
+
+def summarise(samples: List[float], items: int) -> Dict[str, float]:
+    total = sum(samples)
+    return {
+        "total_s": round(total, 6),
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+        "per_item_us": round(total / items * 1e6, 3) if items else None
+    }
+
+# ---------- Benchmarks ----------
+async def bench_source(runtime: Runtime, source, job: Dict[str, Any], pages: int, repeat: int) -> Dict[str, Any]:
+    timer = StageTimer()
+    items = 0
+    for _ in range(repeat):
+        job["collection"].drop()  # every round inserts the same listings into an empty collection
+        for page_num in range(1, pages + 1):
+            with timer.stage("fetch"):
+                if isinstance(source, ApiSource):
+                    raw = await source.fetch(runtime, job, page_num)
+                else:
+                    async with runtime.session.get(source.page_url(job, page_num)) as response:
+                        raw = await response.text()
+            with timer.stage("parse"):
+                rows = await source.parse(raw, job)
+            with timer.stage("normalise"):
+                docs = source.normalise_batch(rows, job)
+            with timer.stage("write"):
+                await bulk_upsert_vehicles(job["collection"], docs)
+            items += len(docs)
+
+    total = sum(sum(timer.samples[stage]) for stage in STAGES)
+    return {
+        "pages": pages * repeat,
+        "items": items,
+        "items_per_sec": round(items / total, 1) if total else None,
+        "stages": {stage: summarise(timer.samples[stage], items) for stage in STAGES}
+    }
+
+def bench_extract_engine_info(iterations: int) -> Dict[str, Any]:
+    engines = [row["specs"].get("Motor") for row in parse_avtonet_rows(AVTONET_HTML)]
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for engine in engines:
+            extract_engine_info(engine)
+    elapsed = time.perf_counter() - started
+    calls = iterations * len(engines)
+    return {"calls": calls, "total_s": round(elapsed, 6), "per_call_us": round(elapsed / calls * 1e6, 3)}
+
+IMPORT_PROBE = """
+import sys, time
+sys.path[:0] = {paths!r}
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started, *(name for name in {heavy!r} if name in sys.modules))
+"""
+
+def time_import(module: str) -> Dict[str, Any]:
+    probe = IMPORT_PROBE.format(paths=[str(ROOT), str(ROOT / "scripts")], module=module, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    elapsed, *heavy = result.stdout.strip().splitlines()[-1].split()
+    return {"seconds": float(elapsed), "heavy_modules": heavy}
+
+def bench_startup(modules, repeat: int) -> Dict[str, Any]:
+    results = {}
+    for module in modules:
+        runs = [time_import(module) for _ in range(repeat)]
+        results[module] = {
+            "import_ms": round(statistics.median(run["seconds"] for run in runs) * 1000, 3),
+            "heavy_modules": runs[-1]["heavy_modules"]
+        }
+    return results
+
+# The stored-document normalisation pass over everything the source benchmarks wrote, mixed in one collection.
+# A dry run times reading and normalising alone; the full pass adds the bulk updates (slow on mongomock, which
+# scans the collection for every update).
+async def bench_normalise(db, repeat: int) -> Dict[str, Any]:
+    docs = [doc for name in ("avto.net", "autobid.de", "doberavto.si", "autolina.ch") for doc in db[f"bench_{name}"].find({}, {"_id": 0})]
+    dry_samples, samples, changed = [], [], 0
+    for _ in range(repeat):
+        db["bench_normalise"].drop()
+        db["bench_normalise"].insert_many([dict(doc) for doc in docs])
+        for dry_run, timings in ((True, dry_samples), (False, samples)):
+            started = time.perf_counter()
+            stats = await normalise_vehicles.normalise_collection(db["bench_normalise"], dry_run=dry_run)
+            timings.append(time.perf_counter() - started)
+        changed += stats["changed"]
+    items = len(docs) * repeat
+    return {
+        "docs": items,
+        "changed": changed,
+        "docs_per_sec": round(items / sum(dry_samples), 1) if items else None,
+        "write_docs_per_sec": round(items / sum(samples), 1) if items else None,
+        **summarise(dry_samples, items)
+    }
+
+def open_database(mongo_uri: Optional[str]):
+    if mongo_uri:
+        client = MongoClient(mongo_uri)
+        client.drop_database("scraper_benchmarks")
+        return client["scraper_benchmarks"], "mongodb"
+    mongomock.collection.Collection.bulk_write = replay_bulk_write
+    return mongomock.MongoClient()["scraper_benchmarks"], "mongomock"
+
+def with_url(source: ApiSource, url: str) -> ApiSource:
+    source = copy.copy(source)
+    source.url = url
+    return source
+
+async def run_benchmarks(pages: int, api_pages: int, repeat: int, engine_iterations: int, mongo_uri: Optional[str] = None) -> Dict[str, Any]:
+    db, backend = open_database(mongo_uri)
+    results: Dict[str, Any] = {}
+
+    async with TestServer(stand_in_app()) as server:
+        base = str(server.make_url(""))
+        avtonet_job = {**avtonet_scraper.SOURCE.jobs(db)[0], "start_url": f"{base}/avtonet/results.asp?stran=1"}
+        autobid_job = {**autobid_scraper.SOURCE.jobs(db)[0], "start_url": f"{base}/autobid/rezultati-iskanja?currentPage=1"}
+        doberavto = with_url(doberavto_car_sync.SOURCE, f"{base}/doberavto/search")
+        autolina = with_url(autolina_scraper.SOURCE, f"{base}/autolina/searchcars")
+
+        async with aiohttp.ClientSession() as session:
+            runtime = Runtime(db, session=session)
+            for name, source, job, source_pages in [
+                ("avto.net", avtonet_scraper.SOURCE, avtonet_job, pages),
+                ("autobid.de", autobid_scraper.SOURCE, autobid_job, pages),
+                ("doberavto.si", doberavto, doberavto.jobs(db)[0], api_pages),
+                ("autolina.ch", autolina, autolina.jobs(db)[0], api_pages)
+            ]:
+                # One collection per source, so the write stage does not depend on what ran before it
+                results[name] = await bench_source(runtime, source, {**job, "collection": db[f"bench_{name}"]}, source_pages, repeat)
+
+    results["normalise"] = await bench_normalise(db, repeat)
+    results["extract_engine_info"] = bench_extract_engine_info(engine_iterations)
+    results["startup"] = bench_startup(ENTRY_POINTS, repeat)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "mongo": backend,
+            "pages": pages,
+            "api_pages": api_pages,
+            "repeat": repeat
+        },
+        "benchmarks": results
+    }
+
+# Per-item (or per-call) times are compared. Write times grow with the collection (mongomock scans it on every
+# upsert), so only compare runs made with the same settings.
+def comparable_metrics(report: Dict[str, Any]) -> Dict[str, float]:
+    metrics = {}
+    for name, result in report["benchmarks"].items():
+        for stage, summary in result.get("stages", {}).items():
+            metrics[f"{name}.{stage}.per_item_us"] = summary["per_item_us"]
+        for key in ("per_call_us", "per_item_us"):
+            if key in result:
+                metrics[f"{name}.{key}"] = result[key]
+    for module, result in report["benchmarks"].get("startup", {}).items():
+        metrics[f"startup.{module}.import_ms"] = result["import_ms"]
+    return {key: value for key, value in metrics.items() if value is not None}
+
+def find_regressions(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    current, previous = comparable_metrics(report), comparable_metrics(baseline)
+    regressions = []
+    for key, value in sorted(current.items()):
+        if key in previous and previous[key] and value > previous[key] * (1 + tolerance):
+            regressions.append(f"{key}: {previous[key]} -> {value} ({value / previous[key] - 1:+.0%})")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay the synthetic fixture pages through the scrape pipeline and time each stage.")
+    parser.add_argument("--pages", type=int, default=int(os.environ.get("BENCH_PAGES", "5")), help="result pages per source and round")
+    parser.add_argument("--api-pages", type=int, default=int(os.environ.get("BENCH_API_PAGES", "2")), help="API pages per source and round (DoberAvto pages hold 500 listings)")
+    parser.add_argument("--repeat", type=int, default=int(os.environ.get("BENCH_REPEAT", "3")), help="rounds per source")
+    parser.add_argument("--engine-iterations", type=int, default=200, help="passes over the fixture engine strings")
+    parser.add_argument("--mongo-uri", default=os.environ.get("BENCH_MONGO_URI"), help="write to a scratch database instead of mongomock")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="previous results file; exit 1 if any per-item time regressed")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_benchmarks(args.pages, args.api_pages, args.repeat, args.engine_iterations, args.mongo_uri))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        settings = ("mongo", "pages", "api_pages", "repeat")
+        if any(baseline["meta"].get(key) != report["meta"][key] for key in settings):
+            print(f"Warning: baseline ran with different settings {({key: baseline['meta'].get(key) for key in settings})}", file=sys.stderr)
+        regressions = find_regressions(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
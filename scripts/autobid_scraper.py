@@ -3,26 +3,15 @@ import warnings
 import os
 import re
 
-from typing import Dict, Any
-from playwright.async_api import async_playwright
-from playwright_stealth import stealth_async
-from motor.motor_asyncio import AsyncIOMotorClient
+from typing import Dict, Any, List
 from cryptography.utils import CryptographyDeprecationWarning
-from tenacity import retry, stop_after_attempt, wait_exponential
-from avtonet_scraper import scrape, scrape_single_page, create_batches, check_special_make, check_special_model
+from vehicle_fields import check_special_make, check_special_model
+from html_parsers import parse_autobid_rows
+from pipeline import BrowserSource, run_standalone, select_row_reader
+from extraction_plan import plan_for
 
 warnings.filterwarnings("ignore", category=CryptographyDeprecationWarning)
 
-mongo_uri = os.environ.get("MONGO_URI")
-if not mongo_uri:
-    raise RuntimeError("MONGO_URI not set in environment variables.")
-
-client = AsyncIOMotorClient(mongo_uri)
-db = client["endava"]
-car_collection = db["cars"]
-moto_collection = db["motorcycles"]
-truck_collection = db["trucks"]
-
 FUEL_TYPES = {
     "bencin", "dizel", "avtoplin", "zemeljski plin", "hibrid", 
     "mild-hybrid", "plug-in-hybrid", "benzin mildhybrid", 
@@ -34,51 +23,55 @@ GEARBOX_TYPES = {
     "avtomatik", "polavtomatik", "ročni menjalnik"
 }
 
+REGISTRATION_RE = re.compile(r"\d{1,2}\.\d{4}")
+POWER_KW_RE = re.compile(r"(\d+)\s*kW")
+POWER_HP_RE = re.compile(r"(\d+)\s*KM")
+OWNERS_RE = re.compile(r"^\s*(\d+)\s*(?:lastnik|lastnikov)?\s*$")
+
+# Row-level sources shared by the field specs below; see extraction_plan.py. The power spec is parsed once for
+# engine_kw/engine_hp and the misc line is split once for fuel_type/gearbox.
+ROW_SOURCES = {
+    "name_parts": lambda row, value: (row.get("name") or "").strip().split(),
+    "make": lambda row, value: check_special_make(value("name_parts")) if value("name_parts") else None,
+    "price": lambda row, value: parse_price_text(row["price"]) if row.get("price") else None,
+    "specs": lambda row, value: row.get("specs") or [],
+    "power": lambda row, value: parse_power(value("specs")),
+    "misc_items": lambda row, value: [item.strip() for item in row["misc"].split(", ")] if row.get("misc") else [],
+    "img_src": lambda row, value: row.get("img_src"),
+    "link": lambda row, value: "https://autobid.de" + row["href"] if row.get("href") else None
+}
+
 VEHICLE_FIELDS = {
-    "make": {"source": "name_parts", "processor": lambda np: check_special_make(np)},
-    "model": {"source": "name_parts", "processor": lambda np, make: check_special_model(make, np)},
+    "make": {"source": "make", "processor": lambda make: make},
+    "model": {"source": ("make", "name_parts"), "processor": lambda make, np: check_special_model(make, np)},
     "price_eur": {"source": "price", "processor": lambda price: price},
     "first_registration": {
         "source": "specs",
-        "processor": lambda s: int(s[0].split(".")[-1].strip()) if s and s[0] and re.match(r"\d{1,2}\.\d{4}", s[0]) else None
+        "processor": lambda s: int(s[0].split(".")[-1].strip()) if s[0] and REGISTRATION_RE.match(s[0]) else None
     },
     "mileage_km": {
         "source": "specs",
-        "processor": lambda s: int(s[1].replace(" Kilometrih", "").replace(".", "").strip()) if s and len(s) > 1 and "Kilometrih" in s[1] else None
+        "processor": lambda s: int(s[1].replace(" Kilometrih", "").replace(".", "").strip()) if len(s) > 1 and "Kilometrih" in s[1] else None
     },
     "fuel_type": {
-        "source": "misc",
-        "processor": lambda m: next((item.strip() for item in m.split(", ") if item.strip().lower() in FUEL_TYPES), None) if m else None
+        "source": "misc_items",
+        "processor": lambda items: next((item for item in items if item.lower() in FUEL_TYPES), None)
     },
     "gearbox": {
-        "source": "misc",
-        "processor": lambda m: next((item.strip() for item in m.split(", ") if item.strip().lower() in GEARBOX_TYPES), None) if m else None
-    },
-    "engine_kw": {
-        "source": "specs",
-        "processor": lambda s: int(re.search(r"(\d+)\s*kW", s[2]).group(1)) if s and len(s) > 2 and re.search(r"(\d+)\s*kW", s[2]) else None
-    },
-    "engine_hp": {
-        "source": "specs",
-        "processor": lambda s: int(re.search(r"(\d+)\s*KM", s[2]).group(1)) if s and len(s) > 2 and re.search(r"(\d+)\s*KM", s[2]) else None
-    },
-    "state": {
-        "source": "specs",
-        "processor": lambda s: (
-            "RABLJENO" if s and len(s) > 3 and s[3] and (
-                s[3].lower().startswith("neznano") or 
-                (re.search(r"^\s*(\d+)\s*(?:lastnik|lastnikov)?\s*$", s[3]) and 
-                int(re.search(r"^\s*(\d+)\s*(?:lastnik|lastnikov)?\s*$", s[3]).group(1)) > 0)
-            ) else "NOVO"
-        )
+        "source": "misc_items",
+        "processor": lambda items: next((item for item in items if item.lower() in GEARBOX_TYPES), None)
     },
-    "image_url": {"source": "img_element", "processor": lambda img, _: img},
-    "link": {"source": "link_element", "processor": lambda _, link: link}
+    "engine_kw": {"source": "power", "processor": lambda power: power[0]},
+    "engine_hp": {"source": "power", "processor": lambda power: power[1]},
+    "state": {"source": "specs", "processor": lambda s: "RABLJENO" if len(s) > 3 and is_used(s[3]) else "NOVO"},
+    "image_url": {"source": "img_src", "processor": lambda img: img},
+    "link": {"source": "link", "processor": lambda link: link}
 }
 
-async def scrape_data(page, fields: Dict[str, Dict[str, Any]], collection):
+# Element handles are only used to read the raw row; the compiled field plan does the rest
+async def read_rows(page) -> list:
     vehicles = await page.query_selector_all("div.-mx-3.block.px-3.pt-3.cursor-pointer")
-    vehicle_data_list = []
+    rows = []
 
     for vehicle in vehicles:
         full_name_element = await vehicle.query_selector("a.relative.max-w-max")
@@ -88,64 +81,28 @@ async def scrape_data(page, fields: Dict[str, Dict[str, Any]], collection):
         img_element = await vehicle.query_selector("picture.flex.h-auto.w-full.max-w-full.object-contain img")
         link_element = await vehicle.query_selector("a.flex.w-full.min-w-full.items-center.justify-center.bg-black")
 
-        full_name = await full_name_element.inner_text() if full_name_element else ""
-        name_parts = full_name.strip().split()
-        specs_values = await extract_specs_from_spans(specs_elements)
-        misc_text = await misc_element.inner_text() if misc_element else ""
-        if misc_text and "drugo" in misc_text.lower():
-            continue
-        make_value = check_special_make(name_parts) if name_parts else None
-
-        data_sources = {
-            "name_parts": name_parts,
-            "price": price_element,
-            "specs": specs_values,
-            "misc": misc_text,
-            "img_element": img_element,
-            "link_element": link_element
-        }
-
-        vehicle_data = {}
-        for field, config in fields.items():
-            source = config["source"]
-            processor = config["processor"]
-            try:
-                if source == "name_parts" and field == "model":
-                    vehicle_data[field] = processor(name_parts, make_value) if name_parts and make_value else None
-                elif source == "price":
-                    price = await extract_price(data_sources[source])
-                    vehicle_data[field] = processor(price) if price is not None else None
-                elif source == "img_element":
-                        img = processor(data_sources[source], img_element)
-                        vehicle_data[field] = await img.get_attribute('src') if img else None
-                elif source == "link_element":
-                    link = processor(data_sources[source], link_element)
-                    if link:
-                        href = await link.get_attribute('href')
-                        vehicle_data[field] = "https://autobid.de" + href  if href else None
-                    else:
-                        vehicle_data[field] = None
-                else:
-                    vehicle_data[field] = processor(data_sources[source]) if data_sources[source] else None
-            except Exception as e:
-                print(f"Error processing field {field}: {e}")
-                vehicle_data[field] = None
-
-        if vehicle_data.get("link"):
-            existing_vehicle = await collection.find_one({"link": vehicle_data["link"]})
-            if existing_vehicle:
-                continue
-            if any(vehicle_data.values()):
-                vehicle_data_list.append(vehicle_data)
-
-    if vehicle_data_list:
-        try:
-            await collection.insert_many(vehicle_data_list, ordered=False)
-            print(f"Inserted {len(vehicle_data_list)} new vehicles from page {page.url.split('=')[-1]}")
-        except Exception as e:
-            print(f"Error inserting data to MongoDB: {e}")
-
-    return vehicle_data_list
+        rows.append({
+            "name": await full_name_element.inner_text() if full_name_element else "",
+            "price": await price_element.inner_text() if price_element else None,
+            "specs": await extract_specs_from_spans(specs_elements),
+            "misc": await misc_element.inner_text() if misc_element else "",
+            "img_src": await img_element.get_attribute("src") if img_element else None,
+            "href": await link_element.get_attribute("href") if link_element else None
+        })
+
+    return rows
+
+# Listings filed under "drugo" (other) are not vehicles we track
+def is_other_category(row: Dict[str, Any]) -> bool:
+    return bool(row["misc"]) and "drugo" in row["misc"].lower()
+
+# Runs the compiled field plan on plain row dicts (as returned by parse_autobid_rows), without touching the browser.
+# Fields whose source is empty stay None.
+def build_vehicle_batch(rows: List[Dict[str, Any]], fields: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return plan_for(fields, ROW_SOURCES, skip_empty=True).apply_batch(rows)
+
+def build_vehicle_data(row: Dict[str, Any], fields: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    return plan_for(fields, ROW_SOURCES, skip_empty=True).apply(row)
 
 # ---------- Helper Functions ----------
 async def extract_specs_from_spans(specs_elements):
@@ -155,48 +112,42 @@ async def extract_specs_from_spans(specs_elements):
         specs_values.append(value.strip())
     return specs_values
 
-async def extract_price(price_element):
-    if price_element:
-        try:
-            price_value = await price_element.inner_text()
-            price_value = price_value.replace("\xa0", "").replace("€", "").replace(".", "").replace(",", "").strip()
-            return int(price_value) if price_value.isdigit() else None
-        except Exception as e:
-            print(f"Error extracting price: {e}")
-    return None
-
-async def scrape_all_categories():
-    await scrape(
-        start_url=car_url,
-        fields=VEHICLE_FIELDS,
-        collection=car_collection,
-        start_page=1,
-        end_page=25,
-        batch_size=5,
-        scrape_data_func=scrape_data
-    )
-    await scrape(
-        start_url=moto_url,
-        fields=VEHICLE_FIELDS,
-        collection=moto_collection,
-        start_page=1,
-        end_page=25,
-        batch_size=5,
-        scrape_data_func=scrape_data
-    )
-    await scrape(
-        start_url=truck_url,
-        fields=VEHICLE_FIELDS,
-        collection=truck_collection,
-        start_page=1,
-        end_page=25,
-        batch_size=5,
-        scrape_data_func=scrape_data
-    )
+def parse_power(specs: List[str]):
+    if len(specs) < 3 or not specs[2]:
+        return None, None
+    kw, hp = POWER_KW_RE.search(specs[2]), POWER_HP_RE.search(specs[2])
+    return (int(kw.group(1)) if kw else None), (int(hp.group(1)) if hp else None)
+
+def is_used(owners: str) -> bool:
+    if not owners:
+        return False
+    if owners.lower().startswith("neznano"):
+        return True
+    match = OWNERS_RE.search(owners)
+    return bool(match) and int(match.group(1)) > 0
+
+def parse_price_text(price_value: str):
+    price_value = price_value.replace("\xa0", "").replace("€", "").replace(".", "").replace(",", "").strip()
+    return int(price_value) if price_value.isdigit() else None
+
+# Set AUTOBID_EXTRACTION_MODE=handles to read the rows through element handles instead of parsing page.content()
+ROW_READERS = {
+    "handles": read_rows,
+    "html": None
+}
+EXTRACTION_MODE = os.environ.get("AUTOBID_EXTRACTION_MODE", "html")
+ROW_READER = select_row_reader(ROW_READERS, EXTRACTION_MODE, "AUTOBID_EXTRACTION_MODE")
 
-if __name__ == "__main__":
-    car_url = "https://autobid.de/sl/rezultati-iskanja?e367=1&sortingType=auctionStartDate-DESCENDING&currentPage=1"
-    moto_url = "https://autobid.de/sl/rezultati-iskanja?e367=2&sortingType=auctionStartDate-DESCENDING&currentPage=1"
-    truck_url = "https://autobid.de/sl/rezultati-iskanja?e367=3&sortingType=auctionStartDate-DESCENDING&currentPage=1"
+car_url = "https://autobid.de/sl/rezultati-iskanja?e367=1&sortingType=auctionStartDate-DESCENDING&currentPage=1"
+moto_url = "https://autobid.de/sl/rezultati-iskanja?e367=2&sortingType=auctionStartDate-DESCENDING&currentPage=1"
+truck_url = "https://autobid.de/sl/rezultati-iskanja?e367=3&sortingType=auctionStartDate-DESCENDING&currentPage=1"
 
-    asyncio.run(scrape_all_categories())
\ No newline at end of file
+# Declarative adapter run by the shared pipeline, both from run_all.py and standalone
+SOURCE = BrowserSource("autobid.de", [
+    {"category": "cars", "start_url": car_url, "fields": VEHICLE_FIELDS, "collection": "cars", "newest_first": True},
+    {"category": "motorcycles", "start_url": moto_url, "fields": VEHICLE_FIELDS, "collection": "motorcycles", "newest_first": True},
+    {"category": "trucks", "start_url": truck_url, "fields": VEHICLE_FIELDS, "collection": "trucks", "newest_first": True}
+], parser=parse_autobid_rows, build=build_vehicle_batch, skip_row=is_other_category, read_rows=ROW_READER)
+
+if __name__ == "__main__":
+    asyncio.run(run_standalone([SOURCE]))
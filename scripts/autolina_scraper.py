@@ -1,14 +1,14 @@
-import requests
+import asyncio
 import os
 from datetime import datetime
-from pymongo import MongoClient
+from pipeline import ApiSource, run_standalone
+from vehicle_fields import kw_to_hp
 
-MONGO_URI = os.getenv("MONGO_URI")
-
-if not MONGO_URI:
-    raise Exception("❌ MONGO_URI not found in environment variables")
-
-url = "https://m.autolina.ch/api/v2/searchcars?offset=20&limit=20"
+# The searchcars API is paged with offset/limit; pages are fetched concurrently until one comes back empty
+url = "https://m.autolina.ch/api/v2/searchcars"
+PAGE_SIZE = int(os.environ.get("AUTOLINA_PAGE_SIZE", "20"))
+CONCURRENCY = int(os.environ.get("AUTOLINA_CONCURRENCY", "8"))
+MAX_PAGES = int(os.environ.get("AUTOLINA_MAX_PAGES", "5000"))
 
 def translate_transmission(t):
     return {
@@ -30,51 +30,41 @@ def extract_year(constructionYear):
     except:
         return None
 
-client = MongoClient(MONGO_URI)
-db = client["endava"]  
-collection = db["cars"]
-
-response = requests.get(url)
-data = response.json()
-
-autolina_links = set()
-new_documents = []
-
-for car in data.get("data", {}).get("cars", []):
-    link = f"https://www.autolina.ch/auto/{car.get('slug')}/{car.get('carId')}"
-    autolina_links.add(link)
-
-    if not collection.find_one({"link": link}):
-        converted = {
-            "make": car.get("makeName"),
-            "model": car.get("modelName"),
-            "first_registration": extract_year(car.get("constructionYear")),
-            "mileage_km": car.get("mileage"),
-            "fuel_type": translate_fuel(car.get("fuelType")),
-            "gearbox": translate_transmission(car.get("gearboxType")),
-            "engine_ccm": None,
-            "engine_kw": car.get("powerOutput"),
-            "engine_hp": round(car.get("powerOutput") * 1.36) if car.get("powerOutput") else None,
-            "battery_kwh": None,
-            "state": "NOVO" if car.get("isNew") else "RABLJENO",
-            "price_eur": car.get("price"),
-            "image_url": car.get("pics")[0] if car.get("pics") else None,
-            "link": link
-        }
-        new_documents.append(converted)
+def convert_car(car):
+    return {
+        "make": car.get("makeName"),
+        "model": car.get("modelName"),
+        "first_registration": extract_year(car.get("constructionYear")),
+        "mileage_km": car.get("mileage"),
+        "fuel_type": translate_fuel(car.get("fuelType")),
+        "gearbox": translate_transmission(car.get("gearboxType")),
+        "engine_ccm": None,
+        "engine_kw": car.get("powerOutput"),
+        "engine_hp": kw_to_hp(car.get("powerOutput")),
+        "battery_kwh": None,
+        "state": "NOVO" if car.get("isNew") else "RABLJENO",
+        "price_eur": car.get("price"),
+        "image_url": car.get("pics")[0] if car.get("pics") else None,
+        "link": f"https://www.autolina.ch/auto/{car.get('slug')}/{car.get('carId')}"
+    }
 
-if new_documents:
-    collection.insert_many(new_documents)
-    print(f"✅ Inserted {len(new_documents)} new Autolina cars.")
-else:
-    print("ℹ️ No new Autolina cars to insert.")
+def page_params(page_num, page_size):
+    return {"offset": (page_num - 1) * page_size, "limit": page_size}
 
-deleted_count = 0
-cursor = collection.find({"link": {"$regex": "^https://www\\.autolina\\.ch/auto/"}})
+# Deletes only run after every page up to the first empty one arrived, so a partial fetch never removes live listings
+SOURCE = ApiSource(
+    "autolina.ch", url, [{"category": "cars", "collection": "cars"}],
+    page_params=page_params,
+    extract=lambda data: data.get("data", {}).get("cars", []),
+    convert=convert_car,
+    page_size=PAGE_SIZE,
+    concurrency=CONCURRENCY,
+    max_pages=MAX_PAGES
+)
 
-for doc in cursor:
-    if doc["link"] not in autolina_links:
-        collection.delete_one({"_id": doc["_id"]})
-        deleted_count += 1
+# Without a db the shared async client from connections.py is used
+def sync_autolina(db=None):
+    return asyncio.run(run_standalone([SOURCE], db))
 
-print(f"🗑️ Deleted {deleted_count} old Autolina cars no longer listed.")
+if __name__ == "__main__":
+    sync_autolina()
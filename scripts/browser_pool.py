@@ -0,0 +1,144 @@
+import asyncio
+import os
+import time
+
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+BROWSER_ARGS = ["--disable-blink-features=AutomationControlled"]
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
+    "viewport": {"width": 1280, "height": 720},
+    "locale": "en-US"
+}
+
+POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "3"))
+RECYCLE_AFTER_PAGES = int(os.environ.get("BROWSER_RECYCLE_AFTER_PAGES", "50"))
+
+# playwright and playwright_stealth (which drags in pkg_resources) are imported on first use, so entry points that
+# never open a browser (the syncs, deduplication, the benchmark's parser runs) do not pay for them at startup
+def async_playwright():
+    from playwright.async_api import async_playwright as start_playwright
+    return start_playwright()
+
+async def stealth_async(page):
+    from playwright_stealth import stealth_async as apply_stealth
+    await apply_stealth(page)
+
+class ContextSlot:
+    def __init__(self):
+        self.context = None
+        self.pages_served = 0
+
+# One Chromium per run with `size` reusable contexts. A context is replaced after `recycle_after_pages`
+# pages so every fingerprint (cookies, storage) stays fresh, and the browser is relaunched if it dies.
+class BrowserPool:
+    def __init__(self, playwright, size: int = POOL_SIZE, recycle_after_pages: int = RECYCLE_AFTER_PAGES,
+                 legacy_pages_per_launch: int = 5, headless: bool = True):
+        self.playwright = playwright
+        self.size = max(1, size)
+        self.recycle_after_pages = recycle_after_pages
+        self.legacy_pages_per_launch = legacy_pages_per_launch
+        self.headless = headless
+        self.browser = None
+        self.slots: List[ContextSlot] = [ContextSlot() for _ in range(self.size)]
+        self.retired: List[Any] = []
+        self.in_flight: Dict[Any, int] = {}
+        self.next_slot = 0
+        self.lock = asyncio.Lock()
+        self.stats: Dict[str, float] = {"launches": 0, "launch_seconds": 0.0, "contexts": 0, "context_seconds": 0.0, "pages": 0, "recycled": 0}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def is_healthy(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+    async def ensure_browser(self):
+        if self.is_healthy():
+            return self.browser
+        if self.browser is not None:
+            print("Browser pool: browser disconnected, relaunching")
+            for slot in self.slots:
+                slot.context = None
+        started = time.perf_counter()
+        self.browser = await self.playwright.chromium.launch(headless=self.headless, args=BROWSER_ARGS)
+        self.stats["launches"] += 1
+        self.stats["launch_seconds"] += time.perf_counter() - started
+        return self.browser
+
+    async def new_context(self):
+        browser = await self.ensure_browser()
+        started = time.perf_counter()
+        context = await browser.new_context(**CONTEXT_OPTIONS)
+        self.stats["contexts"] += 1
+        self.stats["context_seconds"] += time.perf_counter() - started
+        return context
+
+    # Leases a context for `pages` page loads; slots are shared round-robin, so several leases may run on one context
+    @asynccontextmanager
+    async def context(self, pages: int = 1):
+        async with self.lock:
+            slot = self.slots[self.next_slot]
+            self.next_slot = (self.next_slot + 1) % self.size
+            if slot.context is None or not self.is_healthy():
+                slot.context = await self.new_context()
+                slot.pages_served = 0
+            elif slot.pages_served >= self.recycle_after_pages:
+                if self.in_flight.get(slot.context):
+                    self.retired.append(slot.context)
+                else:
+                    self.in_flight.pop(slot.context, None)
+                    await slot.context.close()
+                slot.context = await self.new_context()
+                slot.pages_served = 0
+                self.stats["recycled"] += 1
+            slot.pages_served += pages
+            self.stats["pages"] += pages
+            context = slot.context
+            self.in_flight[context] = self.in_flight.get(context, 0) + 1
+        try:
+            yield context
+        finally:
+            self.in_flight[context] -= 1
+            # A recycled context is closed by the last lease still using it
+            if context in self.retired and not self.in_flight[context]:
+                self.retired.remove(context)
+                del self.in_flight[context]
+                await context.close()
+
+    async def close(self):
+        for context in [slot.context for slot in self.slots if slot.context is not None] + self.retired:
+            try:
+                await context.close()
+            except Exception as e:
+                print(f"Browser pool: error closing context: {e}")
+        self.retired = []
+        self.in_flight = {}
+        for slot in self.slots:
+            slot.context = None
+        if self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+        self.report()
+
+    def startup_seconds_saved(self) -> float:
+        if not self.stats["launches"]:
+            return 0.0
+        avg_launch = self.stats["launch_seconds"] / self.stats["launches"]
+        legacy_launches = -(-self.stats["pages"] // self.legacy_pages_per_launch)
+        return max(0.0, (legacy_launches - self.stats["launches"]) * avg_launch)
+
+    def report(self) -> Optional[str]:
+        if not self.stats["pages"]:
+            return None
+        message = (
+            f"Browser pool: {self.stats['launches']} launch(es) in {self.stats['launch_seconds']:.2f}s, "
+            f"{self.stats['contexts']} context(s) ({self.stats['recycled']} recycled), {self.stats['pages']} pages served; "
+            f"~{self.startup_seconds_saved():.1f}s of browser startup saved versus one launch per {self.legacy_pages_per_launch} pages"
+        )
+        print(message)
+        return message
@@ -0,0 +1,135 @@
+import os
+
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+from db_utils import cursor_list, db_call
+from metrics import METRICS
+from scheduler import current_page_report, report_page
+
+# Checkpoint journal for resuming a nightly run that died midway. Completed result pages (with their page report)
+# and in-flight cleanup batches are recorded in the "checkpoints" collection under the run id; a rerun with the same
+# id skips finished jobs and pages without re-fetching them and rechecks the interrupted cleanup batch first.
+# CHECKPOINT_RUN_ID defaults to GITHUB_RUN_ID, which stays the same when a failed workflow is re-run; without
+# either, checkpoints are off. Entries expire after CHECKPOINT_TTL_HOURS.
+CHECKPOINT_RUN_ID = os.environ.get("CHECKPOINT_RUN_ID") or os.environ.get("GITHUB_RUN_ID", "")
+CHECKPOINT_TTL_HOURS = float(os.environ.get("CHECKPOINT_TTL_HOURS", "48"))
+
+_indexed_databases = set()
+
+def checkpoint_collection(collection):
+    return collection.database["checkpoints"]
+
+async def ensure_checkpoint_index(collection):
+    checkpoints = checkpoint_collection(collection)
+    if checkpoints.database.name in _indexed_databases:
+        return
+    await db_call(checkpoints, "create_index", "created_at", expireAfterSeconds=int(CHECKPOINT_TTL_HOURS * 3600), name="checkpoint_ttl")
+    _indexed_databases.add(checkpoints.database.name)
+
+class CrawlJournal:
+    def __init__(self, collection, site: str, category: str, run_id: str = CHECKPOINT_RUN_ID):
+        self.checkpoints = checkpoint_collection(collection)
+        self.collection = collection
+        self.site = site
+        self.category = category
+        self.run_id = run_id
+        self.completed: Dict[int, Dict[str, Any]] = {}
+        self.done = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.run_id)
+
+    def job_id(self) -> str:
+        return f"{self.run_id}:{self.site}:{self.category}"
+
+    # Returns the job's original start time, which the sweep after a resumed full crawl must use: listings seen
+    # before the interruption were stamped then, not during the rerun
+    async def open(self, started_at: datetime) -> datetime:
+        if not self.enabled:
+            return started_at
+        from pymongo import ReturnDocument
+        await ensure_checkpoint_index(self.collection)
+        job = await db_call(self.checkpoints, "find_one_and_update",
+            {"_id": self.job_id()},
+            {"$setOnInsert": {"run_id": self.run_id, "kind": "job", "started_at": started_at, "done": False, "created_at": datetime.now(timezone.utc)}},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+        self.done = job.get("done", False)
+        pages = await cursor_list(self.checkpoints.find({"run_id": self.run_id, "kind": "page", "job": self.job_id()}))
+        self.completed = {doc["page"]: doc["report"] for doc in pages}
+        if self.done or self.completed:
+            print(f"Resuming {self.site} {self.category} from run {self.run_id}: {len(self.completed)} pages done{', job finished' if self.done else ''}")
+        return job["started_at"]
+
+    async def complete_page(self, page_num: int, report: Dict[str, Any]):
+        await db_call(self.checkpoints, "update_one",
+            {"_id": f"{self.job_id()}:{page_num}"},
+            {"$set": {"run_id": self.run_id, "kind": "page", "job": self.job_id(), "page": page_num, "report": report,
+                      "created_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    async def finish(self):
+        if self.enabled:
+            await db_call(self.checkpoints, "update_one", {"_id": self.job_id()}, {"$set": {"done": True}})
+
+    # Pages finished by an earlier attempt replay their stored report (stop conditions and full-crawl detection
+    # still see them); only pages that were parsed are recorded, so failed pages are fetched again
+    def wrap(self, fetch_page: Callable[[int], Awaitable]) -> Callable[[int], Awaitable]:
+        if not self.enabled:
+            return fetch_page
+
+        async def resumable_fetch_page(page_num: int):
+            if page_num in self.completed:
+                METRICS.count("pages_resumed", site=self.site)
+                report_page(**self.completed[page_num])
+                return
+            result = await fetch_page(page_num)
+            report = current_page_report.get()
+            if report and report.get("listings") is not None:
+                await self.complete_page(page_num, dict(report))
+            return result
+
+        return resumable_fetch_page
+
+class CleanupJournal:
+    def __init__(self, collection, site: str, run_id: str = CHECKPOINT_RUN_ID):
+        self.checkpoints = checkpoint_collection(collection)
+        self.collection = collection
+        self.site = site
+        self.run_id = run_id
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.run_id)
+
+    def batch_id(self) -> str:
+        return f"{self.run_id}:cleanup:{self.site}:{self.collection.name}"
+
+    # Checks already spent by this run on the site, so a rerun only uses what is left of the budget
+    async def checks_used(self) -> int:
+        if not self.enabled:
+            return 0
+        await ensure_checkpoint_index(self.collection)
+        docs = await cursor_list(self.checkpoints.find({"run_id": self.run_id, "kind": "cleanup", "site": self.site}, {"checked": 1}))
+        return sum(doc.get("checked", 0) for doc in docs)
+
+    async def in_flight(self) -> List[str]:
+        if not self.enabled:
+            return []
+        doc = await db_call(self.checkpoints, "find_one", {"_id": self.batch_id()})
+        return (doc or {}).get("in_flight") or []
+
+    async def start_batch(self, links: List[str]):
+        if self.enabled:
+            await db_call(self.checkpoints, "update_one",
+                {"_id": self.batch_id()},
+                {"$set": {"run_id": self.run_id, "kind": "cleanup", "site": self.site, "in_flight": links},
+                 "$setOnInsert": {"checked": 0, "created_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+
+    async def finish_batch(self, checked: int):
+        if self.enabled:
+            await db_call(self.checkpoints, "update_one", {"_id": self.batch_id()}, {"$set": {"in_flight": []}, "$inc": {"checked": checked}})
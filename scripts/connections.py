@@ -0,0 +1,95 @@
+import asyncio
+import os
+
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    import aiohttp
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+# One Mongo client and one HTTP session per process, created on first use inside the running event loop and shared
+# by every entry point (run_all, the standalone scrapers and syncs, cleanup and deduplication). Importing a scraper
+# no longer connects anywhere or needs MONGO_URI; close_connections() at the end of a run releases both.
+# motor (with pymongo) and aiohttp are imported on first use as well, which keeps them out of every entry point's
+# startup until it actually talks to the database or an API.
+MONGO_DB = os.environ.get("MONGO_DB", "endava")
+# Pages in flight across every job plus the cleanup's link checks all write through this pool
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "2"))
+# zlib ships with Python; add zstd or snappy here when their packages are installed
+MONGO_COMPRESSORS = os.environ.get("MONGO_COMPRESSORS", "zlib")
+# Scraped listings are re-fetched every night, so an acknowledged write is enough; no journal wait
+MONGO_WRITE_CONCERN = os.environ.get("MONGO_WRITE_CONCERN", "1")
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "100"))
+HTTP_TOTAL_TIMEOUT = float(os.environ.get("HTTP_TOTAL_TIMEOUT", "60"))
+
+COLLECTIONS = ("cars", "motorcycles", "trucks")
+
+_client: Optional["AsyncIOMotorClient"] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_session: Optional["aiohttp.ClientSession"] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+def write_concern(value: str):
+    return int(value) if value.isdigit() else value
+
+def get_client() -> "AsyncIOMotorClient":
+    global _client, _client_loop
+    loop = running_loop()
+    # Motor binds to the loop it first runs on; a later asyncio.run() needs a client of its own
+    if _client is not None and loop is not None and _client_loop not in (None, loop):
+        _client.close()
+        _client = None
+    if _client is None:
+        mongo_uri = os.environ.get("MONGO_URI")
+        if not mongo_uri:
+            raise RuntimeError("MONGO_URI not set in environment variables.")
+        from motor.motor_asyncio import AsyncIOMotorClient
+        _client = AsyncIOMotorClient(
+            mongo_uri,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            compressors=MONGO_COMPRESSORS,
+            w=write_concern(MONGO_WRITE_CONCERN),
+            appname="endava-scraper"
+        )
+        _client_loop = loop
+    return _client
+
+def get_db(name: str = MONGO_DB):
+    return get_client()[name]
+
+# The vehicle collections the cleanup and deduplication jobs walk, keyed by category
+def vehicle_collections(db=None) -> Dict[str, object]:
+    db = get_db() if db is None else db
+    return {name: db[name] for name in COLLECTIONS}
+
+async def get_session() -> "aiohttp.ClientSession":
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is not None and (_session.closed or _session_loop is not loop):
+        _session = None
+    if _session is None:
+        import aiohttp
+        # Per-host limits are the crawl scheduler's job; the connector only bounds the total
+        connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, ttl_dns_cache=300)
+        _session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=HTTP_TOTAL_TIMEOUT))
+        _session_loop = loop
+    return _session
+
+async def close_connections():
+    global _client, _client_loop, _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+    if _client is not None:
+        _client.close()
+    _client = None
+    _client_loop = None
@@ -0,0 +1,109 @@
+import os
+
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+from db_utils import db_call, link_prefix_match
+from scheduler import listings_exhausted
+
+# Per-(site, category) crawl bookkeeping, stored in the "crawl_state" collection next to the vehicles
+INCREMENTAL_SCRAPE = os.environ.get("INCREMENTAL_SCRAPE", "0") == "1"
+KNOWN_FRACTION_THRESHOLD = float(os.environ.get("KNOWN_FRACTION_THRESHOLD", "1.0"))
+
+# Mark-and-sweep expiry: upserts stamp last_seen on every listing a crawl sees, and after a full crawl any listing
+# missed by the last SWEEP_AFTER_FULL_CRAWLS full crawls is deleted. A sweep that would remove more than
+# SWEEP_MAX_FRACTION of a site's listings is refused, since that points at a blocked or broken crawl.
+SWEEP_AFTER_FULL_CRAWLS = int(os.environ.get("SWEEP_AFTER_FULL_CRAWLS", "2"))
+SWEEP_MAX_FRACTION = float(os.environ.get("SWEEP_MAX_FRACTION", "0.2"))
+FULL_CRAWL_MAX_AGE_HOURS = float(os.environ.get("FULL_CRAWL_MAX_AGE_HOURS", "24"))
+
+def state_collection(collection):
+    return collection.database["crawl_state"]
+
+def state_id(site: str, category: str) -> str:
+    return f"{site}:{category}"
+
+async def load_watermark(collection, site: str, category: str) -> Optional[str]:
+    state = await db_call(state_collection(collection), "find_one", {"_id": state_id(site, category)})
+    return state.get("watermark_link") if state else None
+
+async def save_watermark(collection, site: str, category: str, link: str):
+    await db_call(state_collection(collection), "update_one",
+        {"_id": state_id(site, category)},
+        {"$set": {"watermark_link": link, "watermark_updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+# Promoted ("Top") listings are pinned above the newest ones on every results page, whatever their age, so they
+# never mark where the previous run stopped
+def organic_links(report: Dict) -> List[str]:
+    promoted = set(report.get("promoted") or [])
+    return [link for link in report.get("links", []) if link not in promoted]
+
+# The newest organic listing of a parsed page. An unchanged page (see page_store.py) is not re-parsed and does not
+# say which of its links are promoted, so it leaves the previous watermark in place.
+def watermark_of(report: Dict) -> Optional[str]:
+    if "promoted" not in report:
+        return None
+    links = organic_links(report)
+    return links[0] if links else None
+
+# For newest-first listings: stop once a page is (mostly) already stored or reaches the previous run's newest link
+def incremental_stop(watermark_link: Optional[str], threshold: float = KNOWN_FRACTION_THRESHOLD) -> Callable[[int, Dict], bool]:
+    def should_stop(page_num: int, report: Dict) -> bool:
+        if listings_exhausted(page_num, report):
+            return True
+        listings = report.get("listings")
+        if not listings:
+            return False
+        if watermark_link and watermark_link in organic_links(report):
+            return True
+        known = listings - report.get("new", 0)
+        return known / listings >= threshold
+    return should_stop
+
+# A crawl is full when every page up to the first empty one was scraped and stored
+def is_full_crawl(reports: Dict[int, Dict], start_page: int = 1) -> bool:
+    page_num = start_page
+    while page_num in reports:
+        listings = reports[page_num].get("listings")
+        if listings is None:
+            return False
+        if listings == 0:
+            return True
+        page_num += 1
+    return False
+
+async def record_full_crawl(collection, site: str, category: str, started_at: datetime, keep: int = SWEEP_AFTER_FULL_CRAWLS):
+    await db_call(state_collection(collection), "update_one",
+        {"_id": state_id(site, category)},
+        {"$push": {"full_crawls": {"$each": [started_at], "$slice": -max(1, keep)}}},
+        upsert=True
+    )
+
+async def load_full_crawls(collection, site: str, category: str) -> List[datetime]:
+    state = await db_call(state_collection(collection), "find_one", {"_id": state_id(site, category)})
+    return state.get("full_crawls", []) if state else []
+
+def as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+# Used by cleanup to skip per-link visits for categories the sweep already keeps clean
+async def recently_fully_crawled(collection, site: str, category: str, max_age_hours: float = FULL_CRAWL_MAX_AGE_HOURS) -> bool:
+    crawls = await load_full_crawls(collection, site, category)
+    return bool(crawls) and datetime.now(timezone.utc) - as_utc(crawls[-1]) <= timedelta(hours=max_age_hours)
+
+# Deletes the site's listings not seen since the oldest of the last after_full_crawls full crawls started
+async def sweep_unseen(collection, site: str, category: str, after_full_crawls: int = SWEEP_AFTER_FULL_CRAWLS,
+                       max_fraction: float = SWEEP_MAX_FRACTION) -> int:
+    crawls = await load_full_crawls(collection, site, category)
+    if len(crawls) < after_full_crawls:
+        return 0
+    site_match = link_prefix_match(site)
+    unseen = {**site_match, "last_seen": {"$not": {"$gte": crawls[-after_full_crawls]}}}
+    total = await db_call(collection, "count_documents", site_match)
+    stale = await db_call(collection, "count_documents", unseen)
+    if total and stale / total > max_fraction:
+        print(f"Refusing to sweep {stale}/{total} unseen {site} {category} listings (limit {max_fraction:.0%})")
+        return 0
+    result = await db_call(collection, "delete_many", unseen)
+    return result.deleted_count
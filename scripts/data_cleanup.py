@@ -1,14 +1,22 @@
 import asyncio
 import os
 import sys
+import time
 import logging
 import warnings
 
-from motor.motor_asyncio import AsyncIOMotorClient
 from cryptography.utils import CryptographyDeprecationWarning
-from playwright.async_api import async_playwright
-from playwright_stealth import stealth_async
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+from browser_pool import BrowserPool, async_playwright, stealth_async
+from resource_blocking import TRANSFER_STATS, prepare_page
+from link_validator import LinkValidator
+from recheck_schedule import RECHECK_BUDGET, RecheckBudget, ensure_recheck_index, find_due, mark_verified
+from checkpoints import CleanupJournal
+from db_utils import cursor_batches, db_call
+from metrics import METRICS
+from crawl_state import recently_fully_crawled
+from connections import close_connections, vehicle_collections
+from scheduler import CrawlLimits, Throttled, host_of, is_timeout, retry_after_seconds, throttle_reason
 
 warnings.filterwarnings("ignore", category=CryptographyDeprecationWarning)
 
@@ -20,61 +28,87 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-mongo_uri = os.environ.get("MONGO_URI")
-if not mongo_uri:
-    raise RuntimeError("MONGO_URI not set in environment variables.")
-
-client = AsyncIOMotorClient(mongo_uri)
-db = client["endava"]
-car_collection = db["cars"]
-moto_collection = db["motorcycles"]
-truck_collection = db["trucks"]
-
-async def cleanup_outdated_vehicles(collection, site_name: str, semaphore: asyncio.Semaphore):
-    async with async_playwright() as p:
-        try:
-            cursor = collection.find({}, {"link": 1})
-            links = [doc["link"] async for doc in cursor]
-            filtered_links = [link for link in links if site_name in link]
-            logger.info(f"Checking {len(filtered_links)} vehicle links for validity from site: {site_name}, collection: {collection.name}")
-
-            batch_size = 30
-            for i in range(0, len(filtered_links), batch_size):
-                batch_links = filtered_links[i:i + batch_size]
-                logger.info(f"Processing batch of {len(batch_links)} links (links {i+1} to {i+len(batch_links)}) for collection: {collection.name}")
-                
-                invalid_links = []
-                async with semaphore:  # Limit concurrent browser instances
-                    browser = await p.chromium.launch(headless=True, args=["--disable-blink-features=AutomationControlled"])
-                    context = await browser.new_context(
-                        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
-                        viewport={"width": 1280, "height": 720},
-                        locale="en-US"
-                    )
-
-                    tasks = [check_vehicle_page_validity(context, link, site_name) for link in batch_links]
-                    results = await asyncio.gather(*tasks, return_exceptions=True)
-                    for link, is_valid in zip(batch_links, results):
-                        logger.info(f"Checked link: {link}, Valid: {is_valid}, collection: {collection.name}")
-                        if not is_valid:
-                            invalid_links.append(link)
-
-                    await context.close()
-                    await browser.close()
-                    logger.info(f"Closed browser for batch {i//batch_size + 1}, collection: {collection.name}")
-                
-                # Delete invalid links for this batch in real time
-                if invalid_links:
-                    result = await collection.delete_many({"link": {"$in": invalid_links}})
-                    logger.info(f"Removed {result.deleted_count} outdated vehicles with invalid links from batch {i//batch_size + 1}, collection: {collection.name}")
-                
-                await asyncio.sleep(0.5)
-
-            logger.info(f"Completed cleanup for collection: {collection.name}, site: {site_name}")
-        except Exception as e:
-            logger.error(f"Error during cleanup of outdated vehicles for {site_name}, collection: {collection.name}: {e}")
-
-@retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=2, max=5))
+# Links per recheck batch (the unit the budget and checkpoints count in); how many are checked at once is up to
+# each host's adaptive limit, which grows to CLEANUP_CONCURRENCY
+CLEANUP_BATCH_SIZE = int(os.environ.get("CLEANUP_BATCH_SIZE", "30"))
+CLEANUP_CONCURRENCY = int(os.environ.get("CLEANUP_CONCURRENCY", "10"))
+
+# Rechecks only the listings that are due, oldest-verified first, until the site's budget runs out.
+# A batch interrupted by a crash of the same run (see checkpoints.py) is checked first.
+async def cleanup_outdated_vehicles(collection, site_name: str, limits: CrawlLimits, pool: BrowserPool, validator: LinkValidator = None, budget: RecheckBudget = None, journal: CleanupJournal = None):
+    budget = budget or RecheckBudget()
+    journal = journal or CleanupJournal(collection, site_name)
+    try:
+        await ensure_recheck_index(collection)
+        logger.info(f"Checking vehicle links due for verification from site: {site_name}, collection: {collection.name}")
+
+        batch_size = CLEANUP_BATCH_SIZE
+        checked = 0
+        interrupted = await journal.in_flight()
+        if interrupted:
+            logger.info(f"Resuming interrupted batch of {len(interrupted)} links, collection: {collection.name}")
+
+        async def due_batches():
+            if interrupted:
+                yield [{"link": link} for link in interrupted]
+            async for docs in cursor_batches(find_due(collection, site_name), batch_size):
+                yield docs
+
+        async for docs in due_batches():
+            granted = budget.take(len(docs))
+            if not granted:
+                logger.info(f"Recheck budget for {site_name} exhausted, collection: {collection.name}")
+                break
+            batch_links = [doc["link"] for doc in docs[:granted]]
+            await journal.start_batch(batch_links)
+            logger.info(f"Processing batch of {len(batch_links)} links (links {checked+1} to {checked+len(batch_links)}) for collection: {collection.name}")
+
+            invalid_links = []
+            valid_links = []
+            with METRICS.span("cleanup_batch", site=site_name):
+                results = await check_batch_validity(batch_links, site_name, pool, validator, limits)
+            for link, is_valid in results.items():
+                logger.info(f"Checked link: {link}, Valid: {is_valid}, collection: {collection.name}")
+                if is_valid is True:
+                    valid_links.append(link)
+                elif not is_valid:
+                    invalid_links.append(link)
+
+            # Failed checks stay due and are retried first on the next run
+            await mark_verified(collection, valid_links)
+
+            # Delete invalid links for this batch in real time
+            if invalid_links:
+                result = await db_call(collection, "delete_many", {"link": {"$in": invalid_links}})
+                logger.info(f"Removed {result.deleted_count} outdated vehicles with invalid links from batch {checked//batch_size + 1}, collection: {collection.name}")
+
+            await journal.finish_batch(len(batch_links))
+            checked += len(batch_links)
+
+        logger.info(f"Completed cleanup for collection: {collection.name}, site: {site_name}, {checked} links checked")
+    except Exception as e:
+        METRICS.count("failures", stage="cleanup", site=site_name)
+        logger.error(f"Error during cleanup of outdated vehicles for {site_name}, collection: {collection.name}: {e}")
+
+# Plain HTTP settles most links; only ambiguous ones (bot walls, errors, unexpected statuses) open browser pages.
+# Browser checks take a crawl limits slot each, so a throttling host gets fewer of them; a throttled check comes
+# back as an exception and the link stays due.
+async def check_batch_validity(links, site_name: str, pool: BrowserPool, validator: LinkValidator = None, limits: CrawlLimits = None):
+    results, ambiguous = ({}, links) if validator is None else await validator.triage(links, site_name)
+    if ambiguous:
+        limits = limits or CrawlLimits(global_limit=len(ambiguous), min_interval=0)
+
+        async def check(context, link):
+            async with limits.slot(host_of(link)):
+                return await check_vehicle_page_validity(context, link, site_name)
+
+        async with pool.context(pages=len(ambiguous)) as context:
+            tasks = [check(context, link) for link in ambiguous]
+            results.update(zip(ambiguous, await asyncio.gather(*tasks, return_exceptions=True)))
+    return {link: results[link] for link in links}
+
+@retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=2, max=5), retry=retry_if_not_exception_type(Throttled),
+       before_sleep=METRICS.retry_hook("check_vehicle_page_validity"))
 async def check_vehicle_page_validity(context, link: str, site_name: str) -> bool:
     if site_name not in ["avto.net", "autobid.de"]:
         logger.info(f"Skipping validation for {link} (site {site_name} not in allowed list [avto.net, autobid.de])")
@@ -82,7 +116,14 @@ async def check_vehicle_page_validity(context, link: str, site_name: str) -> boo
     page = await context.new_page()
     await stealth_async(page)
     try:
-        response = await page.goto(link, timeout=15000)
+        await prepare_page(page, link)
+        started = time.perf_counter()
+        with METRICS.span("navigation", site=site_name, stage="cleanup"):
+            response = await page.goto(link, timeout=15000)
+        TRANSFER_STATS.record_load(started)
+        reason = throttle_reason(response.status if response else None)
+        if reason:
+            raise Throttled(reason, retry_after_seconds(response.headers.get("retry-after")))
         if site_name == "avto.net":
             current_url = page.url
             if current_url == "https://www.avto.net/unvalid.asp":
@@ -90,28 +131,61 @@ async def check_vehicle_page_validity(context, link: str, site_name: str) -> boo
                 return False
             return True
         elif site_name == "autobid.de":
-            error_element = await page.query_selector('div.container.mx-auto.h-full span[style*="font-size:35px;"]:contains("Stran ni bila najdena")')
+            error_element = await page.query_selector('div.container.mx-auto.h-full span[style*="font-size:35px;"]:has-text("Stran ni bila najdena")')
             if error_element:
                 logger.info(f"Error page detected for link: {link} (Stran ni bila najdena)")
                 return False
             return True
+    except Throttled:
+        raise
     except Exception as e:
+        METRICS.count("failures", stage="link_check", site=site_name)
         logger.error(f"Error checking link {link} for {site_name}: {e}")
+        # A timeout says nothing about the listing, only about the host
+        if is_timeout(e):
+            raise Throttled("timeout") from e
         return False
     finally:
         await page.close()
 
-async def cleanup_all_collections(site_name: str):
-    semaphore = asyncio.Semaphore(3)  # Limit to 3 concurrent browsers
-    collections = [car_collection, moto_collection, truck_collection]
-    logger.info(f"Starting concurrent cleanup for all collections with site: {site_name}")
-    tasks = [cleanup_outdated_vehicles(collection, site_name, semaphore) for collection in collections]
+async def cleanup_all_collections(site_name: str, pool: BrowserPool, validator: LinkValidator = None, limits: CrawlLimits = None, db=None):
+    limits = limits or CrawlLimits(global_limit=CLEANUP_CONCURRENCY)
+    vehicles = vehicle_collections(db)
+    # Shared by the site's collections; a resumed run only gets what the interrupted attempt left
+    budget = RecheckBudget(max(0, RECHECK_BUDGET - await CleanupJournal(vehicles["cars"], site_name).checks_used()))
+    collections = []
+    for collection in vehicles.values():
+        # Collection names double as the scrapers' category names
+        if await recently_fully_crawled(collection, site_name, collection.name):
+            logger.info(f"Skipping link checks for collection: {collection.name}, site: {site_name} (fully crawled, expiry handled by the sweep)")
+        else:
+            collections.append(collection)
+    logger.info(f"Starting concurrent cleanup for all collections with site: {site_name} (budget: {budget.remaining} checks)")
+    tasks = [cleanup_outdated_vehicles(collection, site_name, limits, pool, validator, budget) for collection in collections]
     await asyncio.gather(*tasks, return_exceptions=True)
     logger.info(f"Completed cleanup for all collections with site: {site_name}")
 
-async def cleanup_all_sites():
-    await cleanup_all_collections("avto.net")
-    await cleanup_all_collections("autobid.de")
+async def cleanup_all_sites(pool: BrowserPool = None, db=None):
+    if pool is None:
+        # One browser pool shared by every site and collection
+        async with async_playwright() as p:
+            async with BrowserPool(p, size=3, legacy_pages_per_launch=30) as own_pool:
+                return await cleanup_all_sites(own_pool, db)
+    # Browser checks of every site share one set of per-host limits
+    limits = CrawlLimits(global_limit=CLEANUP_CONCURRENCY)
+    async with LinkValidator() as validator:
+        await cleanup_all_collections("avto.net", pool, validator, limits, db)
+        await cleanup_all_collections("autobid.de", pool, validator, limits, db)
+    validator.report(log=logger.info)
+    TRANSFER_STATS.report(log=logger.info)
+
+async def main():
+    try:
+        await cleanup_all_sites()
+    finally:
+        await close_connections()
 
 if __name__ == "__main__":
-    asyncio.run(cleanup_all_sites())
\ No newline at end of file
+    asyncio.run(main())
+    METRICS.report(log=logger.info)
+    METRICS.export()
\ No newline at end of file
@@ -0,0 +1,53 @@
+import inspect
+import re
+
+from typing import AsyncIterator, List
+from metrics import METRICS
+
+# Lets the same helper drive motor (awaitable results) and pymongo/mongomock (plain results)
+async def maybe_await(result):
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+# One Mongo call, timed as a db_call span labelled with the operation and collection
+async def db_call(collection, operation: str, *args, **kwargs):
+    with METRICS.span("db_call", op=operation, collection=collection.name):
+        return await maybe_await(getattr(collection, operation)(*args, **kwargs))
+
+# Anchored prefixes can use the link index; an unanchored site_name regex scans every document
+SITE_LINK_PREFIXES = {
+    "avto.net": "https://www.avto.net/",
+    "autobid.de": "https://autobid.de/",
+    "doberavto.si": "https://www.doberavto.si/oglas/",
+    "autolina.ch": "https://www.autolina.ch/auto/"
+}
+
+def link_prefix_match(site_name: str) -> dict:
+    prefix = SITE_LINK_PREFIXES.get(site_name)
+    if prefix is None:
+        return {"link": {"$regex": re.escape(site_name)}}
+    return {"link": {"$regex": "^" + re.escape(prefix)}}
+
+async def cursor_list(cursor) -> List[dict]:
+    if hasattr(cursor, "__aiter__"):
+        return [doc async for doc in cursor]
+    return list(cursor)
+
+# Streams documents from a motor or pymongo cursor in lists of at most size
+async def cursor_batches(cursor, size: int) -> AsyncIterator[List[dict]]:
+    batch = []
+    if hasattr(cursor, "__aiter__"):
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) == size:
+                yield batch
+                batch = []
+    else:
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) == size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
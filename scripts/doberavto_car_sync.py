@@ -1,16 +1,14 @@
-import requests
+import asyncio
 import os
 from datetime import datetime
-from pymongo import MongoClient
+from pipeline import ApiSource, run_standalone
+from vehicle_fields import kw_to_hp
 
-# Use MONGO_URI from GitHub Actions secret
-MONGO_URI = os.getenv("MONGO_URI")
-
-if not MONGO_URI:
-    raise Exception("❌ MONGO_URI not found in environment variables")
-
-# API endpoint
-url = "https://www.doberavto.si/internal-api/v1/marketplace/search?results=5000&from=0&includeSold=true&hiddenVin=false"
+# API endpoint, paged with from= offsets so the sync never truncates at a fixed result count
+url = "https://www.doberavto.si/internal-api/v1/marketplace/search"
+PAGE_SIZE = int(os.environ.get("DOBERAVTO_PAGE_SIZE", "500"))
+CONCURRENCY = int(os.environ.get("DOBERAVTO_CONCURRENCY", "4"))
+LINK_PREFIX = "https://www.doberavto.si/oglas/"
 
 # Helper functions
 def translate_transmission(t):
@@ -33,58 +31,40 @@ def extract_year(date_str):
     except:
         return None
 
-# Connect to MongoDB
-client = MongoClient(MONGO_URI)
-db = client["endava"]
-collection = db["cars"]
-
-# Fetch fresh data
-response = requests.get(url)
-data = response.json()
-
-# Build set of DoberAvto links
-doberavto_links = set()
-new_documents = []
-
-for car in data.get("results", []):
-    post_id = car.get("postId")
-    link = f"https://www.doberavto.si/oglas/{post_id}"
-    doberavto_links.add(link)
-
-    # Check if car already exists by link
-    if not collection.find_one({"link": link}):
-        converted = {
-            "make": car.get("manufacturerName"),
-            "model": car.get("modelName"),
-            "first_registration": extract_year(car.get("registrationDate")),
-            "mileage_km": car.get("odometer"),
-            "fuel_type": translate_fuel(car.get("fuelType")),
-            "gearbox": translate_transmission(car.get("transmission")),
-            "engine_ccm": car.get("engineDisplacement"),
-            "engine_kw": car.get("enginePower"),
-            "engine_hp": round(car.get("enginePower") * 1.36) if car.get("enginePower") else None,
-            "battery_kwh": None,
-            "state": "RABLJENO",
-            "price_eur": car.get("price"),
-            "image_url": car.get("imageUrl"),
-            "link": link
-        }
-        new_documents.append(converted)
+def convert_car(car):
+    return {
+        "make": car.get("manufacturerName"),
+        "model": car.get("modelName"),
+        "first_registration": extract_year(car.get("registrationDate")),
+        "mileage_km": car.get("odometer"),
+        "fuel_type": translate_fuel(car.get("fuelType")),
+        "gearbox": translate_transmission(car.get("transmission")),
+        "engine_ccm": car.get("engineDisplacement"),
+        "engine_kw": car.get("enginePower"),
+        "engine_hp": kw_to_hp(car.get("enginePower")),
+        "battery_kwh": None,
+        "state": "RABLJENO",
+        "price_eur": car.get("price"),
+        "image_url": car.get("imageUrl"),
+        "link": f"{LINK_PREFIX}{car.get('postId')}"
+    }
 
-# Insert new DoberAvto cars
-if new_documents:
-    collection.insert_many(new_documents)
-    print(f"✅ Inserted {len(new_documents)} new DoberAvto cars.")
-else:
-    print("ℹ️ No new DoberAvto cars to insert.")
+def page_params(page_num, page_size):
+    return {"results": page_size, "from": (page_num - 1) * page_size, "includeSold": "true", "hiddenVin": "false"}
 
-# Delete removed DoberAvto cars only
-deleted_count = 0
-cursor = collection.find({"link": {"$regex": "^https://www\\.doberavto\\.si/oglas/"}})
+# Pages are fetched until one comes back empty; listings missing from a complete fetch are deleted afterwards
+SOURCE = ApiSource(
+    "doberavto.si", url, [{"category": "cars", "collection": "cars"}],
+    page_params=page_params,
+    extract=lambda data: data.get("results", []),
+    convert=convert_car,
+    page_size=PAGE_SIZE,
+    concurrency=CONCURRENCY
+)
 
-for doc in cursor:
-    if doc["link"] not in doberavto_links:
-        collection.delete_one({"_id": doc["_id"]})
-        deleted_count += 1
+# Without a db the shared async client from connections.py is used
+def sync_doberavto(db=None):
+    return asyncio.run(run_standalone([SOURCE], db))
 
-print(f"🗑️ Deleted {deleted_count} old DoberAvto cars no longer listed.")
+if __name__ == "__main__":
+    sync_doberavto()
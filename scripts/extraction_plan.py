@@ -0,0 +1,75 @@
+import time
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from metrics import METRICS
+
+# Field specs ({"source": ..., "processor": ...}) compiled once into a flat list of steps. A source is a named
+# row-level value (the split name, the detected make, the parsed engine tuple, ...); it is resolved lazily, at most
+# once per row, and shared by every field that reads it. A field may read several sources by naming a tuple.
+Resolver = Callable[[Dict[str, Any], Callable[[str], Any]], Any]
+
+def is_empty(value: Any) -> bool:
+    return value is None or (hasattr(value, "__len__") and len(value) == 0)
+
+class ExtractionPlan:
+    def __init__(self, fields: Dict[str, Dict[str, Any]], sources: Dict[str, Resolver], skip_empty: bool = False):
+        self.sources = sources
+        # skip_empty: a field is None whenever one of its sources is empty, without calling the processor
+        self.skip_empty = skip_empty
+        self.steps: List[Tuple[str, Tuple[str, ...], Callable]] = []
+        for field, config in fields.items():
+            names = config["source"] if isinstance(config["source"], tuple) else (config["source"],)
+            unknown = [name for name in names if name not in sources]
+            if unknown:
+                raise ValueError(f"Field {field} reads unknown source(s) {unknown}")
+            self.steps.append((field, names, config["processor"]))
+
+    # timings, when given, accumulates seconds per field (sources are charged to the first field that reads them)
+    def apply(self, row: Dict[str, Any], timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        resolved: Dict[str, Any] = {}
+
+        def value(name: str) -> Any:
+            if name not in resolved:
+                try:
+                    resolved[name] = self.sources[name](row, value)
+                except Exception as e:
+                    METRICS.count("field_errors", source=name)
+                    print(f"Error resolving source {name}: {e}")
+                    resolved[name] = None
+            return resolved[name]
+
+        vehicle_data = {}
+        for field, names, processor in self.steps:
+            started = time.perf_counter() if timings is not None else 0.0
+            try:
+                args = [value(name) for name in names]
+                if self.skip_empty and any(is_empty(arg) for arg in args):
+                    vehicle_data[field] = None
+                else:
+                    vehicle_data[field] = processor(*args)
+            except Exception as e:
+                METRICS.count("field_errors", field=field)
+                print(f"Error processing field {field}: {e}")
+                vehicle_data[field] = None
+            if timings is not None:
+                timings[field] = timings.get(field, 0.0) + time.perf_counter() - started
+        return vehicle_data
+
+    # Each field's processing time for the whole batch is one field_processor observation
+    def apply_batch(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        timings: Dict[str, float] = {}
+        vehicles = [self.apply(row, timings) for row in rows]
+        for field, seconds in timings.items():
+            METRICS.observe("field_processor", seconds, field=field)
+        return vehicles
+
+_plans: Dict[Tuple[int, int, bool], Tuple[Dict[str, Dict[str, Any]], ExtractionPlan]] = {}
+
+# Compiles each (FIELDS dict, sources, skip_empty) combination once; later calls reuse the plan
+def plan_for(fields: Dict[str, Dict[str, Any]], sources: Dict[str, Resolver], skip_empty: bool = False) -> ExtractionPlan:
+    key = (id(fields), id(sources), skip_empty)
+    cached = _plans.get(key)
+    if cached is None or cached[0] is not fields or cached[1].sources is not sources:
+        cached = (fields, ExtractionPlan(fields, sources, skip_empty))
+        _plans[key] = cached
+    return cached[1]
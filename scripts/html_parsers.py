@@ -0,0 +1,121 @@
+import json
+import os
+import sys
+import asyncio
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Any
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+
+# Offline parsers for listing pages. They take raw page HTML (page.content(), a stored file or any other
+# fetcher) and return plain row dicts, so they can run in a process pool and re-parse old crawls.
+
+# ---------- Compiled selectors for avto.net ----------
+AVTONET_ROW = CSSSelector("div.row.bg-white.position-relative.GO-Results-Row.GO-Shadow-B, div.row.bg-white.mb-3.pb-3.pb-sm-0.position-relative.GO-Shadow-B.GO-Results-Row")
+AVTONET_NAME = CSSSelector("div.GO-Results-Naziv span")
+AVTONET_REG_PRICE = [CSSSelector("div.GO-Results-Top-Price-TXT-Regular"), CSSSelector("div.GO-Results-Price-TXT-AkcijaCena")]
+AVTONET_SPECIAL_PRICE = [CSSSelector("div.GO-Results-Top-Price-TXT-AkcijaCena"), CSSSelector("div.GO-Results-Price-TXT-AkcijaCena")]
+AVTONET_TABLE = CSSSelector("table.table.table-striped.table-sm.table-borderless.font-weight-normal")
+AVTONET_IMG = [CSSSelector("div.GO-Results-Top-PhotoTop a img"), CSSSelector("div.col-auto.p-3.GO-Results-Photo div a img")]
+AVTONET_LINK = CSSSelector("a.stretched-link")
+AVTONET_PROMOTED = CSSSelector("div.GO-Results-Top-PhotoTop")  # paid "Top" listings pinned above the newest ones
+TABLE_ROW = CSSSelector("tr")
+TABLE_CELL = CSSSelector("td")
+
+# ---------- Compiled selectors for autobid.de ----------
+AUTOBID_ROW = CSSSelector("div.-mx-3.block.px-3.pt-3.cursor-pointer")
+AUTOBID_NAME = CSSSelector("a.relative.max-w-max")
+AUTOBID_PRICE = CSSSelector("div.flex.w-full.flex-col.xl\\:mt-0.xl\\:w-auto.md\\:w-1\\/4.hidden.md\\:flex span span span")
+AUTOBID_SPECS = CSSSelector("span.car-parameter-value.w-full.sm\\:w-auto")
+AUTOBID_MISC = CSSSelector("p.mt-4")
+AUTOBID_IMG = CSSSelector("picture.flex.h-auto.w-full.max-w-full.object-contain img")
+AUTOBID_LINK = CSSSelector("a.flex.w-full.min-w-full.items-center.justify-center.bg-black")
+
+def first_match(element, selectors) -> Optional[Any]:
+    if not isinstance(selectors, list):
+        selectors = [selectors]
+    for selector in selectors:
+        matches = selector(element)
+        if matches:
+            return matches[0]
+    return None
+
+def element_text(element) -> Optional[str]:
+    if element is None:
+        return None
+    return " ".join(element.text_content().split())
+
+def parse_avtonet_rows(html: str) -> List[Dict[str, Any]]:
+    document = lxml_html.fromstring(html)
+    rows = []
+    for row in AVTONET_ROW(document):
+        specs = {}
+        table = first_match(row, AVTONET_TABLE)
+        if table is not None:
+            for tr in TABLE_ROW(table):
+                cells = TABLE_CELL(tr)
+                if len(cells) == 2:
+                    specs[element_text(cells[0])] = element_text(cells[1])
+        img = first_match(row, AVTONET_IMG)
+        link = first_match(row, AVTONET_LINK)
+        rows.append({
+            "name": element_text(first_match(row, AVTONET_NAME)) or "",
+            "reg_price": element_text(first_match(row, AVTONET_REG_PRICE)),
+            "special_price": element_text(first_match(row, AVTONET_SPECIAL_PRICE)),
+            "specs": specs,
+            "img_src": img.get("src") if img is not None else None,
+            "href": link.get("href") if link is not None else None,
+            "promoted": bool(AVTONET_PROMOTED(row))
+        })
+    return rows
+
+def parse_autobid_rows(html: str) -> List[Dict[str, Any]]:
+    document = lxml_html.fromstring(html)
+    rows = []
+    for row in AUTOBID_ROW(document):
+        img = first_match(row, AUTOBID_IMG)
+        link = first_match(row, AUTOBID_LINK)
+        rows.append({
+            "name": element_text(first_match(row, AUTOBID_NAME)) or "",
+            "price": element_text(first_match(row, AUTOBID_PRICE)),
+            "specs": [element_text(span) or "" for span in AUTOBID_SPECS(row)],
+            "misc": element_text(first_match(row, AUTOBID_MISC)) or "",
+            "img_src": img.get("src") if img is not None else None,
+            "href": link.get("href") if link is not None else None
+        })
+    return rows
+
+PARSERS: Dict[str, Callable[[str], List[Dict[str, Any]]]] = {
+    "avto.net": parse_avtonet_rows,
+    "autobid.de": parse_autobid_rows
+}
+
+# ---------- Process pool ----------
+PARSE_WORKERS = int(os.environ.get("HTML_PARSE_WORKERS", "0"))
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    global _parse_pool
+    if PARSE_WORKERS > 0 and _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+    return _parse_pool
+
+async def parse_html_async(parser: Callable[[str], List[Dict[str, Any]]], html: str) -> List[Dict[str, Any]]:
+    # Keeps lxml off the event loop; uses the process pool when HTML_PARSE_WORKERS is set, a thread otherwise
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_parse_pool(), parser, html)
+
+def parse_pages(html_pages: List[str], parser: Callable[[str], List[Dict[str, Any]]], max_workers: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(parser, html_pages))
+
+# Re-parse stored pages without re-fetching: python scripts/html_parsers.py avto.net page1.html page2.html
+if __name__ == "__main__":
+    site, paths = sys.argv[1], sys.argv[2:]
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    for path, rows in zip(paths, parse_pages(pages, PARSERS[site])):
+        print(json.dumps({"file": path, "rows": rows}, ensure_ascii=False))
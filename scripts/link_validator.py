@@ -0,0 +1,128 @@
+import asyncio
+import os
+
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from browser_pool import CONTEXT_OPTIONS
+from scheduler import CrawlLimits, Throttled, host_of, is_bot_wall, retry_after_seconds
+
+if TYPE_CHECKING:
+    import aiohttp
+
+# HTTP-first listing validity checks. A pooled aiohttp session answers most links from the status code,
+# redirect target or a small slice of the body; only ambiguous or bot-blocked responses need a browser.
+# aiohttp is imported when the validator is opened, so importing data_cleanup stays cheap.
+VALID = "valid"
+INVALID = "invalid"
+AMBIGUOUS = "ambiguous"
+
+HTTP_PER_HOST_LIMIT = int(os.environ.get("HTTP_PER_HOST_LIMIT", "8"))
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "15"))
+BODY_SNIFF_BYTES = 65536
+
+def is_bot_blocked(status: int, body: str) -> bool:
+    return status in (403, 429, 503) or is_bot_wall(body)
+
+# avto.net redirects removed listings to /unvalid.asp
+def classify_avtonet(status: int, location: Optional[str], body: str) -> str:
+    if 300 <= status < 400:
+        return INVALID if location and "unvalid.asp" in location.lower() else AMBIGUOUS
+    if status in (404, 410):
+        return INVALID
+    if status == 200 and not is_bot_blocked(status, body):
+        return VALID
+    return AMBIGUOUS
+
+# autobid.de answers 200 for removed auctions too, with a "Stran ni bila najdena" page that may only be rendered
+# client-side, so a missing error text proves nothing. A listing is only valid over HTTP when the full body shows
+# the listing's own spec values; anything else goes to the browser check.
+AUTOBID_NOT_FOUND = "Stran ni bila najdena"
+AUTOBID_LISTING_MARKERS = ("car-parameter-value",)
+
+def classify_autobid(status: int, location: Optional[str], body: str) -> str:
+    if status in (404, 410):
+        return INVALID
+    if status != 200 or is_bot_blocked(status, body):
+        return AMBIGUOUS
+    if AUTOBID_NOT_FOUND in body:
+        return INVALID
+    return VALID if any(marker in body for marker in AUTOBID_LISTING_MARKERS) else AMBIGUOUS
+
+CLASSIFIERS: Dict[str, Callable[[int, Optional[str], str], str]] = {
+    "avto.net": classify_avtonet,
+    "autobid.de": classify_autobid
+}
+
+# How much of a 200 body each classifier reads; None reads it all (the autobid markers can sit anywhere)
+BODY_LIMITS: Dict[str, Optional[int]] = {
+    "avto.net": BODY_SNIFF_BYTES,
+    "autobid.de": None
+}
+
+# HTTP checks back off per host on 429s and timeouts like the crawlers do (see scheduler.py); per_host_limit is the
+# ceiling the adaptive limit grows to. 403/503 bot walls are not rate signals here, plain HTTP just cannot pass them.
+class LinkValidator:
+    def __init__(self, per_host_limit: int = HTTP_PER_HOST_LIMIT, timeout: float = HTTP_TIMEOUT):
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.limits = CrawlLimits(global_limit=per_host_limit * len(CLASSIFIERS), per_host_limit=per_host_limit, min_interval=0)
+        self.session: Optional["aiohttp.ClientSession"] = None
+        self.stats = {"http_valid": 0, "http_invalid": 0, "escalated": 0, "http_errors": 0}
+
+    async def __aenter__(self):
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit_per_host=self.per_host_limit, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"User-Agent": CONTEXT_OPTIONS["user_agent"], "Accept-Language": "sl-SI,sl;q=0.9,en;q=0.8"}
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.session.close()
+
+    async def check_http(self, link: str, site_name: str) -> str:
+        import aiohttp
+        classify = CLASSIFIERS.get(site_name)
+        if classify is None:
+            return AMBIGUOUS
+        try:
+            async with self.limits.slot(host_of(link)) as slot:
+                async with self.session.get(link, allow_redirects=False) as response:
+                    location = response.headers.get("Location")
+                    body = ""
+                    if response.status == 200:
+                        body = (await response.content.read(BODY_LIMITS[site_name] or -1)).decode("utf-8", errors="ignore")
+                    if response.status == 429:
+                        slot.throttle("status_429", retry_after_seconds(response.headers.get("Retry-After")))
+                    return classify(response.status, urljoin(link, location) if location else None, body)
+        except (aiohttp.ClientError, Throttled):
+            self.stats["http_errors"] += 1
+            return AMBIGUOUS
+
+    # Splits links into {link: is_valid} settled over HTTP and the ambiguous ones that need a browser
+    async def triage(self, links: List[str], site_name: str) -> Tuple[Dict[str, bool], List[str]]:
+        verdicts = await asyncio.gather(*(self.check_http(link, site_name) for link in links))
+        settled, ambiguous = {}, []
+        for link, verdict in zip(links, verdicts):
+            if verdict == AMBIGUOUS:
+                ambiguous.append(link)
+            else:
+                settled[link] = verdict == VALID
+        self.stats["http_valid"] += sum(settled.values())
+        self.stats["http_invalid"] += len(settled) - sum(settled.values())
+        self.stats["escalated"] += len(ambiguous)
+        return settled, ambiguous
+
+    def report(self, log=print):
+        resolved = self.stats["http_valid"] + self.stats["http_invalid"]
+        total = resolved + self.stats["escalated"]
+        if not total:
+            return
+        log(
+            f"Link checks: {resolved}/{total} resolved over HTTP ({100 * resolved / total:.0f}%, "
+            f"{self.stats['http_valid']} valid, {self.stats['http_invalid']} invalid), "
+            f"{self.stats['escalated']} escalated to the browser, {self.stats['http_errors']} HTTP errors"
+        )
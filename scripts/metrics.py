@@ -0,0 +1,162 @@
+import json
+import os
+import random
+import re
+import time
+
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+# Run metrics: timing spans (navigation, extraction, field processors, DB calls, ...) aggregated into
+# per-run histograms, retry, failure and throttle counters, and gauges such as each host's current concurrency limit. METRICS.export() writes a JSON summary to METRICS_JSON_PATH
+# and a Prometheus textfile (for node_exporter's textfile collector) to METRICS_PROM_PATH when they are set.
+METRICS_JSON_PATH = os.environ.get("METRICS_JSON_PATH")
+METRICS_PROM_PATH = os.environ.get("METRICS_PROM_PATH")
+# Samples kept per span for the quantiles; count, sum and max stay exact past it
+METRICS_SAMPLE_SIZE = int(os.environ.get("METRICS_SAMPLE_SIZE", "5000"))
+
+QUANTILES = (0.5, 0.95)
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+def metric_key(name: str, labels: Dict[str, Any]) -> Key:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+def quantile(sorted_samples: List[float], q: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(q * len(sorted_samples)))]
+
+class Histogram:
+    def __init__(self, sample_size: int = METRICS_SAMPLE_SIZE):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: List[float] = []
+        self.sample_size = sample_size
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        # Reservoir sampling keeps a uniform sample of every observation so far
+        if len(self.samples) < self.sample_size:
+            self.samples.append(seconds)
+        else:
+            index = random.randrange(self.count)
+            if index < self.sample_size:
+                self.samples[index] = seconds
+
+    def summary(self) -> Dict[str, float]:
+        samples = sorted(self.samples)
+        return {"count": self.count, "sum": self.total, "p50": quantile(samples, 0.5), "p95": quantile(samples, 0.95), "max": self.max}
+
+class RunMetrics:
+    def __init__(self):
+        self.histograms: Dict[Key, Histogram] = {}
+        self.counters: Dict[Key, int] = {}
+        self.gauges: Dict[Key, float] = {}
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = metric_key(name, labels)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].observe(seconds)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def count(self, name: str, value: int = 1, **labels):
+        key = metric_key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    # Last value wins
+    def gauge(self, name: str, value: float, **labels):
+        self.gauges[metric_key(name, labels)] = value
+
+    # tenacity before_sleep hook: counts every retry of the decorated call
+    def retry_hook(self, name: str):
+        def before_sleep(retry_state):
+            error = retry_state.outcome.exception() if retry_state.outcome else None
+            self.count("retries", operation=name, error=type(error).__name__ if error else "none")
+        return before_sleep
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
+        self.gauges.clear()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "spans": [{"name": name, "labels": dict(labels), **histogram.summary()} for (name, labels), histogram in sorted(self.histograms.items())],
+            "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in sorted(self.counters.items())],
+            "gauges": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in sorted(self.gauges.items())]
+        }
+
+    def prometheus(self, prefix: str = "scraper") -> str:
+        lines = [f"# TYPE {prefix}_span_seconds summary"]
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            summary = histogram.summary()
+            base = (("span", name),) + labels
+            for q, field in zip(QUANTILES, ("p50", "p95")):
+                lines.append(f"{prefix}_span_seconds{format_labels(base + (('quantile', str(q)),))} {summary[field]:.6f}")
+            lines.append(f"{prefix}_span_seconds_sum{format_labels(base)} {summary['sum']:.6f}")
+            lines.append(f"{prefix}_span_seconds_count{format_labels(base)} {summary['count']}")
+        lines.append(f"# TYPE {prefix}_span_max_seconds gauge")
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            lines.append(f"{prefix}_span_max_seconds{format_labels((('span', name),) + labels)} {histogram.max:.6f}")
+        for counter in sorted({name for name, _ in self.counters}):
+            lines.append(f"# TYPE {prefix}_{sanitise(counter)}_total counter")
+            for (name, labels), value in sorted(self.counters.items()):
+                if name == counter:
+                    lines.append(f"{prefix}_{sanitise(name)}_total{format_labels(labels)} {value}")
+        for gauge in sorted({name for name, _ in self.gauges}):
+            lines.append(f"# TYPE {prefix}_{sanitise(gauge)} gauge")
+            for (name, labels), value in sorted(self.gauges.items()):
+                if name == gauge:
+                    lines.append(f"{prefix}_{sanitise(name)}{format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, json_path: Optional[str] = METRICS_JSON_PATH, prom_path: Optional[str] = METRICS_PROM_PATH):
+        if json_path:
+            write_atomic(json_path, json.dumps({"generated_at": time.time(), **self.summary()}, indent=2))
+        if prom_path:
+            write_atomic(prom_path, self.prometheus())
+
+    # Slowest spans first, by total time
+    def report(self, log=print, top: int = 15):
+        spans = sorted(self.histograms.items(), key=lambda item: item[1].total, reverse=True)[:top]
+        for (name, labels), histogram in spans:
+            summary = histogram.summary()
+            label_text = " ".join(f"{label}={value}" for label, value in labels)
+            log(f"{name} {label_text}: n={summary['count']} total={summary['sum']:.1f}s p50={summary['p50'] * 1000:.0f}ms "
+                f"p95={summary['p95'] * 1000:.0f}ms max={summary['max'] * 1000:.0f}ms")
+        for (name, labels), value in sorted(self.counters.items()):
+            log(f"{name} {' '.join(f'{label}={v}' for label, v in labels)}: {value}")
+        for (name, labels), value in sorted(self.gauges.items()):
+            log(f"{name} {' '.join(f'{label}={v}' for label, v in labels)}: {value:g}")
+
+def sanitise(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{sanitise(label)}="{escape(value)}"' for label, value in labels) + "}"
+
+# The textfile collector may read at any moment, so never leave a half-written file behind
+def write_atomic(path: str, content: str):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+METRICS = RunMetrics()
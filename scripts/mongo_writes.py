@@ -0,0 +1,109 @@
+import os
+
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from db_utils import db_call
+from metrics import METRICS
+
+if TYPE_CHECKING:
+    from pymongo import UpdateOne
+
+# Shared write layer: a unique index on link per collection plus bulk upserts keyed on link, so two
+# writers seeing the same listing can no longer insert it twice. pymongo is imported on first write rather than at
+# module import (it is the single largest import of every entry point).
+WRITE_BATCH_SIZE = int(os.environ.get("WRITE_BATCH_SIZE", "500"))
+
+# Fields refreshed on every sighting; everything else is only written when the listing is first inserted
+REFRESH_FIELDS = ("price_eur", "mileage_km")
+
+# Sighting timestamps: a listing seen on a results page counts as verified, so cleanup can skip it. They are
+# stamped with a separate update_many (touch_links) rather than in the upsert, so that modified_count only counts
+# listings whose price or mileage actually changed.
+SEEN_FIELDS = ("last_seen", "last_verified")
+
+_indexed_collections = set()
+_unindexable_collections = set()  # create_index failed on stored duplicates; not retried until the next run
+
+def build_upsert(doc: Dict[str, Any], seen_at: Optional[datetime] = None) -> "UpdateOne":
+    from pymongo import UpdateOne
+    refresh = {field: doc[field] for field in REFRESH_FIELDS if field in doc}
+    insert_only = {field: value for field, value in doc.items() if field not in refresh and field not in ("link", "_id")}
+    if seen_at is not None:
+        insert_only.update({"first_seen": seen_at, **{field: seen_at for field in SEEN_FIELDS}})
+    update = {}
+    if refresh:
+        update["$set"] = refresh
+    if insert_only:
+        update["$setOnInsert"] = insert_only
+    return UpdateOne({"link": doc["link"]}, update or {"$setOnInsert": {"link": doc["link"]}}, upsert=True)
+
+def dedupe_by_link(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    seen = {}
+    for doc in docs:
+        if doc.get("link"):
+            seen[doc["link"]] = doc  # the last sighting wins
+    return list(seen.values())
+
+def empty_counts() -> Dict[str, Any]:
+    return {"inserted": 0, "updated": 0, "unchanged": 0, "errors": 0, "round_trips": 0, "inserted_docs": []}
+
+def tally(counts: Dict[str, Any], batch: List[Dict[str, Any]], upserted: Dict[int, Any], matched: int, modified: int, errors: int = 0):
+    counts["inserted"] += len(upserted)
+    counts["updated"] += modified
+    counts["unchanged"] += matched - modified
+    counts["errors"] += errors
+    counts["round_trips"] += 1
+    counts["inserted_docs"].extend(batch[index] for index in sorted(upserted))
+
+def batches(docs: List[Dict[str, Any]], batch_size: int, seen_at: Optional[datetime] = None) -> List[Tuple[List[Dict[str, Any]], List["UpdateOne"]]]:
+    docs = dedupe_by_link(docs)
+    return [(docs[i:i + batch_size], [build_upsert(doc, seen_at) for doc in docs[i:i + batch_size]]) for i in range(0, len(docs), batch_size)]
+
+# Also used for an unchanged page, which still counts as a sighting of every listing on it
+async def touch_links(collection, links: List[str], seen_at: Optional[datetime] = None):
+    seen_at = seen_at or datetime.now(timezone.utc)
+    await db_call(collection, "update_many", {"link": {"$in": links}}, {"$set": {field: seen_at for field in SEEN_FIELDS}})
+
+async def ensure_link_index(collection):
+    key = (collection.database.name, collection.name)
+    if key in _indexed_collections or key in _unindexable_collections:
+        return
+    from pymongo.errors import DuplicateKeyError, OperationFailure
+    try:
+        await db_call(collection, "create_index", "link", unique=True, name="link_unique")
+    except (DuplicateKeyError, OperationFailure) as e:
+        # Remembered for the rest of the run, so every page write doesn't retry it; run_all removes the duplicates
+        # after the scrape, and the next run creates the index
+        print(f"Could not create unique link index on {collection.name} (run remove_duplicate_data.py first): {e}")
+        _unindexable_collections.add(key)
+        return
+    _indexed_collections.add(key)
+
+# Works with motor and pymongo collections; returns inserted/updated/unchanged counts and the inserted docs
+async def bulk_upsert_vehicles(collection, docs: List[Dict[str, Any]], batch_size: int = WRITE_BATCH_SIZE, seen_at: Optional[datetime] = None) -> Dict[str, Any]:
+    counts = empty_counts()
+    if not docs:
+        return counts
+    from pymongo.errors import BulkWriteError
+    await ensure_link_index(collection)
+    seen_at = seen_at or datetime.now(timezone.utc)
+    for batch, operations in batches(docs, batch_size, seen_at):
+        try:
+            result = await db_call(collection, "bulk_write", operations, ordered=False)
+            tally(counts, batch, result.upserted_ids or {}, result.matched_count, result.modified_count)
+        except BulkWriteError as e:
+            details = e.details
+            METRICS.count("db_errors", op="bulk_write", collection=collection.name)
+            print(f"Bulk write to {collection.name} partially failed: {len(details.get('writeErrors', []))} errors")
+            upserted = {item["index"]: item["_id"] for item in details.get("upserted", [])}
+            tally(counts, batch, upserted, details.get("nMatched", 0), details.get("nModified", 0), len(details.get("writeErrors", [])))
+        await touch_links(collection, [doc["link"] for doc in batch], seen_at)
+    # Listings that were already stored vs. new ones; the upsert settles both in the same round trip
+    METRICS.count("upsert_matched", counts["updated"] + counts["unchanged"], collection=collection.name)
+    METRICS.count("upsert_inserted", counts["inserted"], collection=collection.name)
+    return counts
+
+def format_counts(counts: Dict[str, Any]) -> str:
+    return (f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged"
+            + (f", {counts['errors']} errors" if counts["errors"] else "")
+            + f" in {counts['round_trips']} bulk write(s)")
@@ -0,0 +1,186 @@
+import asyncio
+import os
+import sys
+import time
+import logging
+
+from typing import Any, Dict, List, Optional
+from db_utils import SITE_LINK_PREFIXES, cursor_batches, db_call
+from metrics import METRICS
+from connections import close_connections, vehicle_collections
+from vehicle_fields import HP_PER_KW
+
+logger = logging.getLogger(__name__)
+
+# Batch normalisation of stored listings. The four sources disagree on vocabulary ("diesel motor", "Dizel",
+# "Diesel"), on field names (trucks stored "Year") and on how hp is derived, so existing collections are streamed
+# in chunks of NORMALISE_BATCH_SIZE, normalised column by column with pandas and written back with one bulk update
+# per chunk that only sets the fields that actually changed. Every distinct value is looked up once per chunk.
+# pandas is imported on first use so run_all's startup stays light.
+NORMALISE_BATCH_SIZE = int(os.environ.get("NORMALISE_BATCH_SIZE", "5000"))
+DRY_RUN = "--dry-run" in sys.argv or os.environ.get("DRY_RUN") == "1"
+
+# Canonical values follow avto.net, which holds most listings. Values missing from a table are kept as they are;
+# None marks the sources' "unknown" placeholders.
+FUEL_TYPES = {
+    "bencin motor": "bencin motor", "bencinski motor": "bencin motor", "bencin": "bencin motor", "petrol": "bencin motor",
+    "diesel motor": "diesel motor", "dizel": "diesel motor", "diesel": "diesel motor",
+    "elektro motor": "elektro motor", "električni pogon": "elektro motor", "električno vozilo": "elektro motor", "electric": "elektro motor",
+    "hibrid motor": "hibrid motor", "hibridni pogon": "hibrid motor", "hibrid": "hibrid motor", "hybrid": "hibrid motor",
+    "mild-hybrid": "hibrid motor", "plug-in-hybrid": "hibrid motor", "benzin mildhybrid": "hibrid motor",
+    "diesel mildhybrid": "hibrid motor", "diesel plugin hybrid": "hibrid motor",
+    "plin motor": "plin motor", "avtoplin": "plin motor", "zemeljski plin": "plin motor",
+    "neznan": None, "unknown": None
+}
+
+GEARBOXES = {
+    "ročni menjalnik": "ročni menjalnik", "manual": "ročni menjalnik",
+    "4-stopenjsko stikalno gonilo": "ročni menjalnik", "5-stopenjsko stikalno gonilo": "ročni menjalnik",
+    "6-stopenjsko stikalno gonilo": "ročni menjalnik", "7-stopenjsko stikalno gonilo": "ročni menjalnik",
+    "avtomatski menjalnik": "avtomatski menjalnik", "avtomatik": "avtomatski menjalnik", "automatic": "avtomatski menjalnik",
+    "polavtomatik": "avtomatski menjalnik",
+    "neznan": None, "unknown": None
+}
+
+GEAR_COUNT = r"^\d+-stopenjsk"
+
+MAKES = {
+    "vw": "Volkswagen", "volkswagen": "Volkswagen",
+    "mercedes": "Mercedes-Benz", "mercedes benz": "Mercedes-Benz", "mercedes-benz": "Mercedes-Benz",
+    "skoda": "Škoda", "škoda": "Škoda",
+    "bmw": "BMW", "land rover": "Land Rover", "alfa romeo": "Alfa Romeo"
+}
+
+TEXT_COLUMNS = {"fuel_type": FUEL_TYPES, "gearbox": GEARBOXES, "make": MAKES, "model": {}}
+POWER_COLUMNS = ("engine_kw", "engine_hp")
+COLUMNS = tuple(TEXT_COLUMNS) + POWER_COLUMNS + ("first_registration", "gearbox_detail")
+PROJECTION = {column: 1 for column in COLUMNS + ("Year", "link")}
+
+# hp on these sources is derived from kW, formerly with a rounded 1.36 factor, so it is recomputed. They are the
+# only ones whose payload reports a single power unit; elsewhere a missing kW or hp was never reported and stays null.
+DERIVED_HP_PREFIXES = (SITE_LINK_PREFIXES["doberavto.si"], SITE_LINK_PREFIXES["autolina.ch"])
+
+# Missing values go back to Mongo as None, never as NaN or pd.NA
+def with_none(values):
+    import numpy as np
+    import pandas as pd
+    values = np.array(values, dtype=object)
+    values[pd.isna(values)] = None
+    return values
+
+def canonical(column, table: Dict[str, Optional[str]]):
+    import numpy as np
+    import pandas as pd
+    codes, uniques = pd.factorize(column)
+    uniques = pd.Series(uniques, dtype=object)
+    is_text = uniques.map(type).eq(str)
+    text = uniques.astype(str).str.split().str.join(" ")
+    cleaned = text.where(is_text, uniques)  # non-strings are kept as they are
+    keys = text.str.lower().where(is_text)
+    values = keys.map(table).where(keys.isin(table.keys()), cleaned)
+    values = np.append(with_none(values), None)  # code -1 (missing) picks the trailing None
+    return pd.Series(values[codes], index=column.index, dtype=object)
+
+def whole_numbers(series):
+    import pandas as pd
+    return pd.Series(with_none(series.round().astype("Int64")), index=series.index, dtype=object)
+
+# Returns the normalised columns of a chunk; the frame holds one row per stored document
+def normalise_frame(frame):
+    import pandas as pd
+    normalised = pd.DataFrame(index=frame.index)
+    for column, table in TEXT_COLUMNS.items():
+        normalised[column] = canonical(frame[column], table)
+
+    kw = pd.to_numeric(frame["engine_kw"], errors="coerce")
+    hp = pd.to_numeric(frame["engine_hp"], errors="coerce")
+    derived = frame["link"].fillna("").astype(str).str.startswith(DERIVED_HP_PREFIXES)
+    hp = hp.mask(derived & kw.notna(), kw * HP_PER_KW)
+    normalised["engine_kw"] = whole_numbers(kw)
+    normalised["engine_hp"] = whole_numbers(hp)
+
+    # avto.net trucks used to store the registration year as "Year"
+    year = pd.to_numeric(frame["first_registration"], errors="coerce").fillna(pd.to_numeric(frame["Year"], errors="coerce"))
+    normalised["first_registration"] = whole_numbers(year)
+
+    # gearbox only keeps the type, so autobid's "6-stopenjsko stikalno gonilo" keeps its gear count here
+    gearbox = frame["gearbox"].where(frame["gearbox"].map(type).eq(str)).str.split().str.join(" ")
+    detail = gearbox.where(gearbox.str.contains(GEAR_COUNT, na=False))
+    normalised["gearbox_detail"] = with_none(frame["gearbox_detail"].where(frame["gearbox_detail"].notna(), detail))
+    return normalised
+
+def changed_fields(frame, normalised) -> List[Dict[str, Any]]:
+    original = frame[list(COLUMNS)]
+    changed = ~(normalised.eq(original) | (normalised.isna() & original.isna()))
+    renamed = frame["Year"].notna().to_numpy()
+    rows = changed.any(axis=1).to_numpy() | renamed
+    updates = []
+    for doc_id, values, flags, unset_year in zip(frame["_id"].to_numpy()[rows], normalised.to_numpy(dtype=object)[rows],
+                                                changed.to_numpy()[rows], renamed[rows]):
+        update = {}
+        if flags.any():
+            update["$set"] = {column: value for column, value, flag in zip(COLUMNS, values, flags) if flag}
+        if unset_year:
+            update["$unset"] = {"Year": ""}
+        updates.append({"_id": doc_id, "update": update})
+    return updates
+
+def load_frame(docs: List[dict]):
+    import pandas as pd
+    frame = pd.DataFrame.from_records(docs)
+    for column in ("_id", "link") + tuple(PROJECTION):
+        if column not in frame:
+            frame[column] = None
+    return pd.DataFrame(with_none(frame.to_numpy(dtype=object)), index=frame.index, columns=frame.columns)
+
+async def write_updates(collection, updates: List[Dict[str, Any]]) -> int:
+    from pymongo import UpdateOne
+    from pymongo.errors import BulkWriteError
+    try:
+        result = await db_call(collection, "bulk_write", [UpdateOne({"_id": item["_id"]}, item["update"]) for item in updates], ordered=False)
+        return result.modified_count
+    except BulkWriteError as e:
+        METRICS.count("db_errors", op="bulk_write", collection=collection.name)
+        logger.error(f"Normalisation write to {collection.name} partially failed: {len(e.details.get('writeErrors', []))} errors")
+        return e.details.get("nModified", 0)
+
+async def normalise_collection(collection, batch_size: int = NORMALISE_BATCH_SIZE, dry_run: bool = DRY_RUN) -> Dict[str, Any]:
+    started = time.perf_counter()
+    docs_seen, changed, written = 0, 0, 0
+    cursor = collection.find({}, PROJECTION).sort("_id", 1).batch_size(batch_size)
+    async for docs in cursor_batches(cursor, batch_size):
+        with METRICS.span("normalise_batch", collection=collection.name):
+            frame = load_frame(docs)
+            updates = changed_fields(frame, normalise_frame(frame))
+        docs_seen += len(docs)
+        changed += len(updates)
+        if updates and not dry_run:
+            written += await write_updates(collection, updates)
+
+    seconds = time.perf_counter() - started
+    docs_per_sec = round(docs_seen / seconds, 1) if seconds else None
+    METRICS.count("docs_normalised", docs_seen, collection=collection.name)
+    METRICS.gauge("normalise_docs_per_sec", docs_per_sec or 0, collection=collection.name)
+    action = "Would update" if dry_run else "Updated"
+    logger.info(f"{action} {changed} of {docs_seen} documents in {collection.name} ({seconds:.2f}s, {docs_per_sec} docs/sec)")
+    return {"collection": collection.name, "docs": docs_seen, "changed": changed, "written": written, "seconds": seconds, "docs_per_sec": docs_per_sec}
+
+async def normalise_all_collections(db=None, dry_run: bool = DRY_RUN) -> List[Dict[str, Any]]:
+    return [await normalise_collection(collection, dry_run=dry_run) for collection in vehicle_collections(db).values()]
+
+async def main():
+    try:
+        await normalise_all_collections()
+    finally:
+        await close_connections()
+
+if __name__ == "__main__":
+    # Configure logging for GitHub Actions
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    asyncio.run(main())
+    METRICS.report(log=logger.info)
+    METRICS.export()
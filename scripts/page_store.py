@@ -0,0 +1,110 @@
+import gzip
+import hashlib
+import json
+import os
+import sys
+
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from lxml import etree, html as lxml_html
+from db_utils import db_call
+from html_parsers import AUTOBID_ROW, AVTONET_ROW, PARSERS, parse_html_async
+
+# Raw page capture and unchanged-page skipping for browser result pages.
+# PAGE_STORE_DIR keeps every fetched page gzip-compressed under its SHA-256 (identical pages are stored once) and
+# appends a line per page to that day's manifest, so parser changes can be replayed against an old crawl offline.
+# SKIP_UNCHANGED_PAGES=1 hashes only the listing rows of each page; when they hash the same as on the previous run,
+# parsing and the bulk upsert are skipped and the page's known links are just stamped as seen (mark and sweep
+# relies on last_seen). The region hash and links are kept per page URL in the "page_state" collection.
+PAGE_STORE_DIR = os.environ.get("PAGE_STORE_DIR", "")
+SKIP_UNCHANGED_PAGES = os.environ.get("SKIP_UNCHANGED_PAGES", "0") == "1"
+PAGE_CAPTURE = bool(PAGE_STORE_DIR) or SKIP_UNCHANGED_PAGES
+
+REGION_SELECTORS = {
+    "avto.net": AVTONET_ROW,
+    "autobid.de": AUTOBID_ROW
+}
+
+def content_address(html: str) -> str:
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+def page_path(store_dir: str, digest: str) -> Path:
+    return Path(store_dir) / digest[:2] / f"{digest}.html.gz"
+
+def save_page(html: str, store_dir: str = PAGE_STORE_DIR) -> str:
+    digest = content_address(html)
+    path = page_path(store_dir, digest)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(tmp_path, path)
+    return digest
+
+def load_page(digest: str, store_dir: str = PAGE_STORE_DIR) -> str:
+    with gzip.open(page_path(store_dir, digest), "rt", encoding="utf-8") as f:
+        return f.read()
+
+def manifest_path(store_dir: str, day: datetime) -> Path:
+    return Path(store_dir) / f"manifest-{day:%Y-%m-%d}.jsonl"
+
+def record_page(site: str, url: str, digest: str, region: Optional[str], store_dir: str = PAGE_STORE_DIR):
+    fetched_at = datetime.now(timezone.utc)
+    entry = {"site": site, "url": url, "sha256": digest, "region_hash": region, "fetched_at": fetched_at.isoformat()}
+    with open(manifest_path(store_dir, fetched_at), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+# Hash of the result rows only, so ads, counters and tokens elsewhere on the page do not count as changes.
+# A page without rows has no region hash and is never skipped (it is what ends a crawl).
+def region_hash(html: str, site: str) -> Optional[str]:
+    selector = REGION_SELECTORS.get(site)
+    if selector is None:
+        return None
+    rows = selector(lxml_html.fromstring(html))
+    if not rows:
+        return None
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(etree.tostring(row, encoding="utf-8", with_tail=False))
+    return digest.hexdigest()
+
+def page_state_collection(collection):
+    return collection.database["page_state"]
+
+async def load_page_state(collection, url: str) -> Optional[Dict[str, Any]]:
+    return await db_call(page_state_collection(collection), "find_one", {"_id": url})
+
+async def save_page_state(collection, url: str, region: Optional[str], links: List[str]):
+    if SKIP_UNCHANGED_PAGES and region and links:
+        await db_call(page_state_collection(collection), "update_one",
+            {"_id": url},
+            {"$set": {"region_hash": region, "links": links, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+# Stores the page if PAGE_STORE_DIR is set and checks it against the previous run. Returns the region hash (to be
+# saved once the page is written) and, for an unchanged page, the links it held last time.
+async def capture_page(collection, site: str, url: str, html: str) -> Tuple[Optional[str], Optional[List[str]]]:
+    if not PAGE_CAPTURE:
+        return None, None
+    region = await parse_html_async(partial(region_hash, site=site), html)
+    if PAGE_STORE_DIR:
+        record_page(site, url, save_page(html, PAGE_STORE_DIR), region, PAGE_STORE_DIR)
+    if not (SKIP_UNCHANGED_PAGES and region):
+        return region, None
+    previous = await load_page_state(collection, url)
+    if previous and previous.get("region_hash") == region and previous.get("links"):
+        return region, previous["links"]
+    return region, None
+
+# Re-parse a stored crawl: python scripts/page_store.py manifest-2024-05-01.jsonl
+if __name__ == "__main__":
+    manifest = Path(sys.argv[1])
+    with open(manifest, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            rows = PARSERS[entry["site"]](load_page(entry["sha256"], str(manifest.parent)))
+            print(json.dumps({"url": entry["url"], "rows": rows}, ensure_ascii=False))
@@ -0,0 +1,326 @@
+import asyncio
+import time
+
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
+
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+from browser_pool import BrowserPool, async_playwright, stealth_async
+from connections import close_connections, get_db, get_session
+from scheduler import (PAGE_CONCURRENCY, CrawlLimits, Throttled, crawl_pages, host_of, is_bot_wall, listings_exhausted, report_page,
+                       retry_after_seconds, throttle_reason)
+from resource_blocking import TRANSFER_STATS, prepare_page
+from html_parsers import parse_html_async
+from vehicle_fields import valid_candidates
+from mongo_writes import bulk_upsert_vehicles, touch_links
+from metrics import METRICS
+from page_store import PAGE_CAPTURE, capture_page, save_page_state
+from checkpoints import CHECKPOINT_RUN_ID, CrawlJournal
+from crawl_state import (INCREMENTAL_SCRAPE, SWEEP_AFTER_FULL_CRAWLS, SWEEP_MAX_FRACTION, incremental_stop, is_full_crawl,
+                         load_watermark, record_full_crawl, save_watermark, sweep_unseen, watermark_of)
+
+if TYPE_CHECKING:
+    import aiohttp
+
+# Source adapters: every site is a fetch -> parse -> normalise -> write pipeline driven by one shared runtime.
+# A site only declares its categories (start URL or endpoint, field specs, target collection) plus a parser and a
+# row builder; the runtime brings the browser pool, HTTP session, crawl limits, bulk upserts, incremental stops,
+# mark-and-sweep expiry and per-job stats.
+
+class Source:
+    def __init__(self, site: str, categories: List[Dict[str, Any]], concurrency: int = PAGE_CONCURRENCY, max_pages: int = 25,
+                 sweep_after_full_crawls: int = SWEEP_AFTER_FULL_CRAWLS, sweep_max_fraction: float = SWEEP_MAX_FRACTION):
+        self.site = site
+        self.categories = categories
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.sweep_after_full_crawls = sweep_after_full_crawls
+        self.sweep_max_fraction = sweep_max_fraction
+
+    # Same job dict shape the scrapers' build_jobs use
+    def jobs(self, db) -> List[Dict[str, Any]]:
+        return [{"site": self.site, "newest_first": False, **category, "collection": db[category["collection"]]}
+                for category in self.categories]
+
+    def page_url(self, job: Dict[str, Any], page_num: int) -> str:
+        raise NotImplementedError
+
+    def limits(self, runtime: "Runtime") -> CrawlLimits:
+        return runtime.limits
+
+    async def fetch(self, runtime: "Runtime", job: Dict[str, Any], page_num: int) -> Any:
+        raise NotImplementedError
+
+    async def parse(self, raw: Any, job: Dict[str, Any]) -> List[Any]:
+        raise NotImplementedError
+
+    def normalise(self, row: Any, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def blocked(self, raw: Any) -> bool:
+        return False
+
+    # Raw page capture and unchanged-page check (see page_store.py); returns (region hash, links of an unchanged page)
+    async def capture(self, job: Dict[str, Any], page_num: int, raw: Any):
+        return None, None
+
+    # Normalises a whole page at once; None entries (skipped rows) are dropped
+    def normalise_batch(self, rows: List[Any], job: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [doc for doc in (self.normalise(row, job) for row in rows) if doc]
+
+    # Links of the page's promoted listings, which are pinned to the top and skipped by the incremental watermark
+    def promoted_links(self, rows: List[Any], job: Dict[str, Any]) -> List[str]:
+        return []
+
+# Looks up a BrowserSource read_rows function by the mode named in a scraper's *_EXTRACTION_MODE setting
+def select_row_reader(readers: Dict[str, Optional[Callable]], mode: str, setting: str) -> Optional[Callable]:
+    if mode not in readers:
+        raise ValueError(f"Unknown {setting} {mode!r}; expected one of: {', '.join(readers)}")
+    return readers[mode]
+
+# Results pages rendered in the shared browser pool and parsed from their HTML off the event loop. With read_rows
+# the raw rows are read from the live page instead (element handles or one page.evaluate call); fetch then returns
+# {"rows": ..., "html": ...} and only reads the HTML when it is captured or the page came back empty.
+class BrowserSource(Source):
+    def __init__(self, site: str, categories: List[Dict[str, Any]], parser: Callable[[str], List[Dict[str, Any]]],
+                 build: Callable[[List[Dict[str, Any]], Dict[str, Dict[str, Any]]], List[Dict[str, Any]]],
+                 skip_row: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                 read_rows: Optional[Callable[[Any], Awaitable[List[Dict[str, Any]]]]] = None, **options):
+        super().__init__(site, categories, **options)
+        self.parser = parser
+        self.build = build
+        self.skip_row = skip_row
+        self.read_rows = read_rows
+
+    def page_url(self, job: Dict[str, Any], page_num: int) -> str:
+        return job["start_url"].replace("stran=1", f"stran={page_num}").replace("currentPage=1", f"currentPage={page_num}")
+
+    async def fetch(self, runtime: "Runtime", job: Dict[str, Any], page_num: int) -> Any:
+        page_url = self.page_url(job, page_num)
+        async with runtime.pool.context() as context:
+            page = await context.new_page()
+            await stealth_async(page)
+            try:
+                await prepare_page(page, page_url)
+                started = time.perf_counter()
+                with METRICS.span("navigation", site=self.site):
+                    response = await page.goto(page_url, timeout=30000)
+                    reason = throttle_reason(response.status if response else None)
+                    if reason:
+                        raise Throttled(reason, retry_after_seconds(response.headers.get("retry-after")))
+                    await page.wait_for_load_state("domcontentloaded", timeout=30000)
+                TRANSFER_STATS.record_load(started)
+                if self.read_rows is None:
+                    with METRICS.span("content", site=self.site):
+                        return await page.content()
+                with METRICS.span("read_rows", site=self.site):
+                    rows = await self.read_rows(page)
+                return {"rows": rows, "html": await page.content() if PAGE_CAPTURE or not rows else None}
+            finally:
+                await page.close()
+
+    @staticmethod
+    def html_of(raw: Any) -> Optional[str]:
+        return raw["html"] if isinstance(raw, dict) else raw
+
+    # A bot-wall challenge is a throttled page, not the end of the results
+    def blocked(self, raw: Any) -> bool:
+        html = self.html_of(raw)
+        return isinstance(html, str) and is_bot_wall(html)
+
+    async def capture(self, job: Dict[str, Any], page_num: int, raw: Any):
+        html = self.html_of(raw)
+        if html is None:
+            return None, None
+        return await capture_page(job["collection"], self.site, self.page_url(job, page_num), html)
+
+    async def parse(self, raw: Any, job: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if isinstance(raw, dict):
+            return raw["rows"]
+        return await parse_html_async(self.parser, raw)
+
+    def normalise(self, row: Dict[str, Any], job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        docs = self.normalise_batch([row], job)
+        return docs[0] if docs else None
+
+    # build applies the category's compiled field plan to every kept row in one call
+    def normalise_batch(self, rows: List[Dict[str, Any]], job: Dict[str, Any]) -> List[Dict[str, Any]]:
+        rows = [row for row in rows if not (self.skip_row and self.skip_row(row))]
+        return valid_candidates(self.build(rows, job["fields"]))
+
+    # Parsers flag promoted rows with "promoted"
+    def promoted_links(self, rows: List[Dict[str, Any]], job: Dict[str, Any]) -> List[str]:
+        return [doc["link"] for doc in self.normalise_batch([row for row in rows if row.get("promoted")], job)]
+
+# aiohttp is only needed once an API source is crawled, so it is imported on first use (see connections.py)
+def is_connection_error(exc: BaseException) -> bool:
+    import aiohttp
+    return isinstance(exc, aiohttp.ClientConnectionError)
+
+# Connection errors are retried here; throttling statuses and timeouts go back to the host's rate controller
+# (see scheduler.py) and the page is retried by crawl_pages once the host has backed off
+@retry(stop=stop_after_attempt(4), wait=wait_exponential(multiplier=1, min=1, max=10),
+       retry=retry_if_exception(is_connection_error), reraise=True, before_sleep=METRICS.retry_hook("fetch_json"))
+async def fetch_json(session: "aiohttp.ClientSession", url: str, params: Dict[str, Any]) -> Any:
+    async with session.get(url, params=params) as response:
+        reason = throttle_reason(response.status)
+        if reason:
+            raise Throttled(reason, retry_after_seconds(response.headers.get("Retry-After")))
+        response.raise_for_status()
+        return await response.json(content_type=None)
+
+# Paged JSON APIs. They list everything, so one full crawl is enough to expire vanished listings.
+class ApiSource(Source):
+    def __init__(self, site: str, url: str, categories: List[Dict[str, Any]], page_params: Callable[[int, int], Dict[str, Any]],
+                 extract: Callable[[Any], List[Dict[str, Any]]], convert: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 page_size: int, **options):
+        options.setdefault("max_pages", 5000)
+        options.setdefault("sweep_after_full_crawls", 1)
+        options.setdefault("sweep_max_fraction", 1.0)
+        super().__init__(site, categories, **options)
+        self.url = url
+        self.page_params = page_params
+        self.extract = extract
+        self.convert = convert
+        self.page_size = page_size
+
+    def page_url(self, job: Dict[str, Any], page_num: int) -> str:
+        return self.url
+
+    # APIs are not rate limited like the browser sites: their host gets a ceiling of concurrency requests and no
+    # spacing unless the API starts throttling, but the pages still count against the run's global budget
+    def limits(self, runtime: "Runtime") -> CrawlLimits:
+        runtime.limits.override(host_of(self.url), max_concurrency=self.concurrency, min_interval=0)
+        return runtime.limits
+
+    async def fetch(self, runtime: "Runtime", job: Dict[str, Any], page_num: int) -> Any:
+        return await fetch_json(runtime.session, self.url, self.page_params(page_num, self.page_size))
+
+    async def parse(self, raw: Any, job: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self.extract(raw)
+
+    def normalise(self, row: Dict[str, Any], job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self.convert(row)
+
+class Runtime:
+    def __init__(self, db, pool: Optional[BrowserPool] = None, session: Optional["aiohttp.ClientSession"] = None,
+                 limits: Optional[CrawlLimits] = None, incremental: bool = INCREMENTAL_SCRAPE, run_id: str = CHECKPOINT_RUN_ID):
+        self.db = db
+        self.pool = pool
+        self.session = session
+        self.limits = limits or CrawlLimits()
+        self.incremental = incremental
+        self.run_id = run_id  # checkpoint run id; empty disables resuming
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, name: str, **values):
+        stats = self.stats.setdefault(name, {"pages": 0, "listings": 0, "inserted": 0, "expired": 0, "seconds": 0.0})
+        for key, value in values.items():
+            stats[key] += value
+
+    def report(self, log=print):
+        for name, stats in sorted(self.stats.items()):
+            rate = stats["listings"] / stats["seconds"] if stats["seconds"] else 0.0
+            log(f"{name}: {stats['listings']} listings from {stats['pages']} pages in {stats['seconds']:.1f}s "
+                f"({rate:.1f} listings/sec), {stats['inserted']} new, {stats['expired']} expired")
+
+# Opens the browser pool only when a browser source needs it; the HTTP session is the process-wide one
+@asynccontextmanager
+async def open_runtime(db, browser: bool = True, limits: Optional[CrawlLimits] = None, **options):
+    session = await get_session()
+    if not browser:
+        yield Runtime(db, session=session, limits=limits, **options)
+        return
+    async with async_playwright() as p:
+        async with BrowserPool(p) as pool:
+            yield Runtime(db, pool=pool, session=session, limits=limits, **options)
+
+async def run_job(runtime: Runtime, source: Source, job: Dict[str, Any]) -> Dict[int, Dict]:
+    name = f"{job['site']} {job['category']}"
+    collection = job["collection"]
+    started = time.perf_counter()
+
+    journal = CrawlJournal(collection, job["site"], job["category"], runtime.run_id)
+    started_at = await journal.open(datetime.now(timezone.utc))
+    if journal.done:
+        print(f"Skipping {name}: already finished in run {journal.run_id}")
+        return {}
+
+    should_stop = listings_exhausted
+    # Incremental mode only makes sense for result lists sorted newest-first
+    incremental = runtime.incremental and job.get("newest_first", False)
+    if incremental:
+        should_stop = incremental_stop(await load_watermark(collection, job["site"], job["category"]))
+
+    limits = source.limits(runtime)
+    host = host_of(source.page_url(job, 1))
+
+    async def fetch_page(page_num: int):
+        with METRICS.span("page", site=source.site):
+            async with limits.slot(host):
+                with METRICS.span("fetch", site=source.site):
+                    raw = await source.fetch(runtime, job, page_num)
+                # Raised inside the slot, so the host backs off instead of the page counting as a healthy response
+                if source.blocked(raw):
+                    raise Throttled("captcha")
+            region, unchanged_links = await source.capture(job, page_num, raw)
+            if unchanged_links:
+                await touch_links(collection, unchanged_links)
+                METRICS.count("pages_unchanged", site=source.site)
+                report_page(listings=len(unchanged_links), new=0, links=unchanged_links)
+                return
+            with METRICS.span("parse", site=source.site):
+                rows = await source.parse(raw, job)
+            with METRICS.span("normalise", site=source.site):
+                docs = source.normalise_batch(rows, job)
+                promoted = source.promoted_links(rows, job)
+            with METRICS.span("write", site=source.site):
+                counts = await bulk_upsert_vehicles(collection, docs)
+            await save_page_state(collection, source.page_url(job, page_num), region, [doc["link"] for doc in docs])
+        report_page(listings=len(docs), new=counts["inserted"], links=[doc["link"] for doc in docs], promoted=promoted)
+
+    reports = await crawl_pages(range(1, source.max_pages + 1), journal.wrap(fetch_page), source.concurrency, should_stop=should_stop)
+
+    watermark = watermark_of(reports.get(1, {}))
+    if incremental and watermark:
+        await save_watermark(collection, job["site"], job["category"], watermark)
+
+    # Every listing still online was stamped last_seen during this crawl, so a full crawl can expire the rest
+    listings = sum(report.get("listings", 0) for report in reports.values())
+    expired = 0
+    if listings and is_full_crawl(reports):
+        await record_full_crawl(collection, job["site"], job["category"], started_at, keep=source.sweep_after_full_crawls)
+        expired = await sweep_unseen(collection, job["site"], job["category"], source.sweep_after_full_crawls, source.sweep_max_fraction)
+
+    await journal.finish()
+    runtime.record(name, pages=len(reports), listings=listings, inserted=sum(report.get("new", 0) for report in reports.values()),
+                   expired=expired, seconds=time.perf_counter() - started)
+    return reports
+
+# Runs every category of every source at the same time; failures are reported per job
+async def run_sources(sources: List[Source], runtime: Runtime) -> List[Any]:
+    jobs = [(source, job) for source in sources for job in source.jobs(runtime.db)]
+    results = await asyncio.gather(*[run_job(runtime, source, job) for source, job in jobs], return_exceptions=True)
+    for (source, job), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            METRICS.count("failures", stage="job", site=job["site"])
+            print(f"Job {job['site']} {job['category']} failed: {type(result).__name__}: {result}")
+    return results
+
+# Entry point for running a few sources on their own (e.g. a single API sync); db defaults to the shared client
+async def run_standalone(sources: List[Source], db=None):
+    browser = any(isinstance(source, BrowserSource) for source in sources)
+    limits = CrawlLimits(global_limit=max(source.concurrency for source in sources))
+    try:
+        async with open_runtime(get_db() if db is None else db, browser=browser, limits=limits) as runtime:
+            await run_sources(sources, runtime)
+    finally:
+        await close_connections()
+    runtime.report()
+    if browser:
+        TRANSFER_STATS.report()
+    METRICS.report()
+    METRICS.export()
+    return runtime
@@ -0,0 +1,45 @@
+import os
+
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from db_utils import db_call, link_prefix_match
+
+# Recheck scheduling for cleanup: only listings whose last_verified is older than RECHECK_AFTER_HOURS are
+# revalidated, never-verified and oldest-verified first, and each site gets at most RECHECK_BUDGET checks per run.
+# Scraping refreshes last_verified on every sighting (see mongo_writes.SEEN_FIELDS), so live listings rarely come due.
+RECHECK_AFTER_HOURS = float(os.environ.get("RECHECK_AFTER_HOURS", "24"))
+RECHECK_BUDGET = int(os.environ.get("RECHECK_BUDGET", "3000"))
+
+RECHECK_INDEX = [("last_verified", 1), ("first_seen", 1)]
+
+_indexed_collections = set()
+
+class RecheckBudget:
+    def __init__(self, total: int = RECHECK_BUDGET):
+        self.remaining = total
+
+    # Grants up to wanted checks; collections cleaned concurrently draw from the same budget batch by batch
+    def take(self, wanted: int) -> int:
+        granted = min(wanted, self.remaining)
+        self.remaining -= granted
+        return granted
+
+async def ensure_recheck_index(collection):
+    key = (collection.database.name, collection.name)
+    if key in _indexed_collections:
+        return
+    await db_call(collection, "create_index", RECHECK_INDEX, name="recheck_due")
+    _indexed_collections.add(key)
+
+# Missing last_verified (documents written before sightings were tracked) also matches and sorts first
+def due_filter(site_name: str, now: datetime, recheck_after_hours: float = RECHECK_AFTER_HOURS) -> dict:
+    cutoff = now - timedelta(hours=recheck_after_hours)
+    return {**link_prefix_match(site_name), "last_verified": {"$not": {"$gte": cutoff}}}
+
+def find_due(collection, site_name: str, now: Optional[datetime] = None, recheck_after_hours: float = RECHECK_AFTER_HOURS):
+    now = now or datetime.now(timezone.utc)
+    return collection.find(due_filter(site_name, now, recheck_after_hours), {"link": 1}).sort(RECHECK_INDEX)
+
+async def mark_verified(collection, links: List[str], now: Optional[datetime] = None):
+    if links:
+        await db_call(collection, "update_many", {"link": {"$in": links}}, {"$set": {"last_verified": now or datetime.now(timezone.utc)}})
@@ -1,9 +1,12 @@
 import asyncio
 import os
 import sys
+import time
 import logging
 
-from motor.motor_asyncio import AsyncIOMotorClient
+from db_utils import db_call, link_prefix_match
+from metrics import METRICS
+from connections import close_connections, vehicle_collections
 
 # Configure logging for GitHub Actions
 logging.basicConfig(
@@ -13,61 +16,76 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-mongo_uri = os.environ.get("MONGO_URI")
-if not mongo_uri:
-    raise RuntimeError("MONGO_URI not set in environment variables.")
+DELETE_CHUNK_SIZE = int(os.environ.get("DELETE_CHUNK_SIZE", "1000"))
+DRY_RUN = "--dry-run" in sys.argv or os.environ.get("DRY_RUN") == "1"
 
-client = AsyncIOMotorClient(mongo_uri)
-db = client["endava"]
-car_collection = db["cars"]
-moto_collection = db["motorcycles"]
-truck_collection = db["trucks"]
+def duplicate_pipeline(site_name: str) -> list:
+    return [
+        {"$match": link_prefix_match(site_name)},
+        {"$sort": {"_id": 1}},  # keep the oldest document for every link
+        {"$group": {
+            "_id": "$link",
+            "count": {"$sum": 1},
+            "ids": {"$push": "$_id"}
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+        # Only the doomed ids leave the server
+        {"$project": {"doomed": {"$slice": ["$ids", 1, {"$subtract": ["$count", 1]}]}}}
+    ]
 
-async def remove_duplicate_links(collection, site_name: str, semaphore: asyncio.Semaphore):
+async def remove_duplicate_links(collection, site_name: str, semaphore: asyncio.Semaphore, dry_run: bool = DRY_RUN):
     async with semaphore:  # Limit concurrent operations
+        started = time.perf_counter()
         try:
             logger.info(f"Checking for duplicate links in collection: {collection.name}, site: {site_name}")
-            
-            # Aggregate to find duplicate links
-            pipeline = [
-                {"$match": {"link": {"$regex": site_name}}},  # Filter by site_name
-                {"$group": {
-                    "_id": "$link",
-                    "count": {"$sum": 1},
-                    "ids": {"$push": "$_id"}
-                }},
-                {"$match": {"count": {"$gt": 1}}}  # Find links with count > 1
-            ]
-            
-            duplicates = await collection.aggregate(pipeline).to_list(length=None)
-            logger.info(f"Found {len(duplicates)} links with duplicates in collection: {collection.name}, site: {site_name}")
-            
-            for duplicate in duplicates:
-                link = duplicate["_id"]
-                ids = duplicate["ids"]
-                count = duplicate["count"]
-                
-                # Keep the first ID, remove the rest
-                ids_to_remove = ids[1:]  # Skip the first ID
-                if ids_to_remove:
-                    result = await collection.delete_many({"_id": {"$in": ids_to_remove}})
-                    logger.info(f"Removed {result.deleted_count} duplicate entries for link: {link} (kept 1, removed {count-1}) in collection: {collection.name}")
-            
-            logger.info(f"Completed duplicate removal for collection: {collection.name}, site: {site_name}")
+
+            duplicated_links = 0
+            removed = 0
+            chunk = []
+            cursor = collection.aggregate(duplicate_pipeline(site_name), allowDiskUse=True)
+            async for duplicate in cursor:
+                duplicated_links += 1
+                chunk.extend(duplicate["doomed"])
+                if dry_run:
+                    logger.info(f"[dry run] Would remove {len(duplicate['doomed'])} duplicates of link: {duplicate['_id']}")
+                if len(chunk) >= DELETE_CHUNK_SIZE:
+                    removed += await delete_chunk(collection, chunk, dry_run)
+                    chunk = []
+            if chunk:
+                removed += await delete_chunk(collection, chunk, dry_run)
+
+            action = "Would remove" if dry_run else "Removed"
+            logger.info(f"{action} {removed} duplicate entries across {duplicated_links} links in collection: {collection.name}, site: {site_name} ({time.perf_counter() - started:.2f}s)")
+            return {"collection": collection.name, "site": site_name, "links": duplicated_links, "removed": removed, "seconds": time.perf_counter() - started}
         except Exception as e:
+            METRICS.count("failures", stage="deduplication", site=site_name)
             logger.error(f"Error during duplicate removal for {site_name}, collection: {collection.name}: {e}")
 
-async def cleanup_duplicate_links_all_collections(site_name: str):
+async def delete_chunk(collection, ids: list, dry_run: bool) -> int:
+    if dry_run:
+        return len(ids)
+    result = await db_call(collection, "delete_many", {"_id": {"$in": ids}})
+    return result.deleted_count
+
+async def cleanup_duplicate_links_all_collections(site_name: str, db=None):
     semaphore = asyncio.Semaphore(3)  # Limit to 3 concurrent operations
-    collections = [car_collection, moto_collection, truck_collection]
+    collections = list(vehicle_collections(db).values())
     logger.info(f"Starting concurrent duplicate cleanup for all collections with site: {site_name}")
     tasks = [remove_duplicate_links(collection, site_name, semaphore) for collection in collections]
     await asyncio.gather(*tasks, return_exceptions=True)
     logger.info(f"Completed duplicate cleanup for all collections with site: {site_name}")
 
-async def cleanup_duplicate_links_all_sites():
-    await cleanup_duplicate_links_all_collections("avto.net")
-    await cleanup_duplicate_links_all_collections("autobid.de")
+async def cleanup_duplicate_links_all_sites(db=None):
+    await cleanup_duplicate_links_all_collections("avto.net", db)
+    await cleanup_duplicate_links_all_collections("autobid.de", db)
+
+async def main():
+    try:
+        await cleanup_duplicate_links_all_sites()
+    finally:
+        await close_connections()
 
 if __name__ == "__main__":
-    asyncio.run(cleanup_duplicate_links_all_sites())
\ No newline at end of file
+    asyncio.run(main())
+    METRICS.report(log=logger.info)
+    METRICS.export()
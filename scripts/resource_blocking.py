@@ -0,0 +1,101 @@
+import os
+import time
+
+from typing import Dict, List
+from urllib.parse import urlparse
+
+# Request interception for the Playwright fetch path: we only read a few DOM nodes and the image src
+# attribute, so images, media, fonts, stylesheets and ad/analytics hosts are aborted before they load.
+BLOCK_RESOURCES = os.environ.get("BLOCK_RESOURCES", "1") == "1"
+
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+BLOCKED_HOSTS = (
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googletagmanager.com",
+    "google-analytics.com",
+    "adservice.google.com",
+    "facebook.net",
+    "connect.facebook.com",
+    "hotjar.com",
+    "criteo.com",
+    "criteo.net",
+    "gemius.pl",
+    "adnxs.com",
+    "taboola.com",
+    "outbrain.com"
+)
+
+# URL substrings that are never blocked for a site (e.g. bot challenges must load in full)
+SITE_ALLOWLISTS: Dict[str, List[str]] = {
+    "avto.net": ["challenges.cloudflare.com"],
+    "autobid.de": ["challenges.cloudflare.com"]
+}
+
+def site_for(url: str) -> str:
+    host = urlparse(url).netloc
+    for site in SITE_ALLOWLISTS:
+        if host == site or host.endswith("." + site):
+            return site
+    return host
+
+def should_block(url: str, resource_type: str, site: str) -> bool:
+    if any(allowed in url for allowed in SITE_ALLOWLISTS.get(site, [])):
+        return False
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    host = urlparse(url).netloc
+    return any(host == blocked or host.endswith("." + blocked) for blocked in BLOCKED_HOSTS)
+
+class TransferStats:
+    def __init__(self):
+        self.pages = 0
+        self.load_seconds = 0.0
+        self.bytes = 0
+        self.responses = 0
+        self.blocked: Dict[str, int] = {}
+
+    # Registered for "requestfinished", once the body has arrived. request.sizes() gives the bytes actually received
+    # (headers plus the encoded body); content-length is missing on chunked responses and says nothing about headers.
+    async def record_response(self, request):
+        self.responses += 1
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return  # the page was closed before the sizes came back
+        self.bytes += max(0, sizes["responseHeadersSize"]) + max(0, sizes["responseBodySize"])
+
+    def record_blocked(self, resource_type: str):
+        self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+
+    def record_load(self, started: float):
+        self.pages += 1
+        self.load_seconds += time.perf_counter() - started
+
+    def report(self, log=print):
+        if not self.pages:
+            return
+        blocked = ", ".join(f"{kind}: {count}" for kind, count in sorted(self.blocked.items())) or "none"
+        log(
+            f"Page loads ({'blocking on' if BLOCK_RESOURCES else 'blocking off'}): {self.pages} pages, "
+            f"avg load {self.load_seconds / self.pages:.2f}s, {self.bytes / 1_048_576:.1f} MB received over {self.responses} responses, "
+            f"blocked requests: {blocked}"
+        )
+
+TRANSFER_STATS = TransferStats()
+
+async def prepare_page(page, url: str, stats: TransferStats = TRANSFER_STATS):
+    site = site_for(url)
+    page.on("requestfinished", stats.record_response)
+    if not BLOCK_RESOURCES:
+        return
+
+    async def handle_route(route):
+        request = route.request
+        if should_block(request.url, request.resource_type, site):
+            stats.record_blocked(request.resource_type if request.resource_type in BLOCKED_RESOURCE_TYPES else "tracker")
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await page.route("**/*", handle_route)
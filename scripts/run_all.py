@@ -0,0 +1,55 @@
+import asyncio
+import os
+import time
+
+import avtonet_scraper
+import autobid_scraper
+import doberavto_car_sync
+import autolina_scraper
+import data_cleanup
+import remove_duplicate_data
+import normalise_vehicles
+from pipeline import open_runtime, run_sources
+from connections import close_connections, get_db
+from scheduler import CrawlLimits
+from resource_blocking import TRANSFER_STATS
+from metrics import METRICS
+
+# Nightly entry point: every source adapter (both browser sites and both APIs) runs through the shared pipeline
+# at the same time, so the wall-clock approaches the slowest job instead of the sum. Cleanup, deduplication and
+# the batch normalisation of stored listings run afterwards.
+GLOBAL_CONCURRENCY = int(os.environ.get("GLOBAL_CONCURRENCY", "10"))
+PER_HOST_CONCURRENCY = int(os.environ.get("PER_HOST_CONCURRENCY", "5"))
+
+SOURCES = [avtonet_scraper.SOURCE, autobid_scraper.SOURCE, doberavto_car_sync.SOURCE, autolina_scraper.SOURCE]
+
+async def timed(name: str, coroutine):
+    started = time.perf_counter()
+    try:
+        with METRICS.span("run_stage", stage=name):
+            return await coroutine
+    finally:
+        print(f"Job {name} finished in {time.perf_counter() - started:.1f}s")
+
+async def run_all():
+    started = time.perf_counter()
+    db = get_db()  # one Mongo client and HTTP session shared by every job
+    limits = CrawlLimits(global_limit=GLOBAL_CONCURRENCY, per_host_limit=PER_HOST_CONCURRENCY)
+
+    try:
+        async with open_runtime(db, limits=limits) as runtime:
+            await timed("scraping", run_sources(SOURCES, runtime))
+            runtime.report()
+            await timed("cleanup", data_cleanup.cleanup_all_sites(runtime.pool, db))
+
+        TRANSFER_STATS.report()
+        await timed("deduplication", remove_duplicate_data.cleanup_duplicate_links_all_sites(db))
+        await timed("normalisation", normalise_vehicles.normalise_all_collections(db))
+    finally:
+        await close_connections()
+    print(f"All jobs finished in {time.perf_counter() - started:.1f}s")
+    METRICS.report()
+    METRICS.export()
+
+if __name__ == "__main__":
+    asyncio.run(run_all())
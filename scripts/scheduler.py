@@ -0,0 +1,247 @@
+import asyncio
+import os
+import random
+import re
+import time
+
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+from urllib.parse import urlparse
+from metrics import METRICS
+
+PAGE_CONCURRENCY = int(os.environ.get("PAGE_CONCURRENCY", "5"))
+HOST_MIN_INTERVAL = float(os.environ.get("HOST_MIN_INTERVAL", "0.5"))
+
+# AIMD rate control per host: every healthy response adds 1/limit to the host's concurrency limit (about one more
+# request in flight per round trip, up to the configured ceiling) and eases the request spacing back towards
+# HOST_MIN_INTERVAL. A 403/429/5xx, a bot-wall challenge page, a timeout or a response slower than
+# HOST_LATENCY_TARGET halves the limit and doubles the spacing (at least THROTTLE_BACKOFF seconds, at most
+# HOST_MAX_INTERVAL). A Retry-After header is honoured. ADAPTIVE_CONCURRENCY=0 keeps the limits fixed.
+ADAPTIVE_CONCURRENCY = os.environ.get("ADAPTIVE_CONCURRENCY", "1") == "1"
+HOST_LATENCY_TARGET = float(os.environ.get("HOST_LATENCY_TARGET", "10"))
+HOST_MAX_INTERVAL = float(os.environ.get("HOST_MAX_INTERVAL", "30"))
+THROTTLE_BACKOFF = float(os.environ.get("THROTTLE_BACKOFF", "1.0"))
+# Times a throttled page is tried again (after the host has backed off) before it counts as failed
+THROTTLE_RETRIES = int(os.environ.get("THROTTLE_RETRIES", "3"))
+
+# Cloudflare's challenge interstitial: its page title, or the cf-chl form, widget and script options it renders.
+# Words like "captcha" are not enough, since ordinary result pages load reCAPTCHA for their contact forms; blocked
+# responses that come with a 403 or 503 are caught by throttle_reason.
+BOT_WALL_TITLES = ("just a moment...", "attention required! | cloudflare")
+BOT_WALL_TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+BOT_WALL_MARKUP = re.compile(r"cf[-_]chl", re.IGNORECASE)
+
+# Filled in by the pipeline's fetch_page for the page currently being processed (see report_page)
+current_page_report: ContextVar[Optional[Dict]] = ContextVar("current_page_report", default=None)
+
+def report_page(**values):
+    report = current_page_report.get()
+    if report is not None:
+        report.update(values)
+
+def host_of(url: str) -> str:
+    return urlparse(url).netloc
+
+# Raised for a response that means the host wants us to slow down; the slot it was raised in backs the host off
+class Throttled(Exception):
+    def __init__(self, reason: str, retry_after: Optional[float] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+def throttle_reason(status: Optional[int]) -> Optional[str]:
+    if status in (403, 429):
+        return f"status_{status}"
+    if status is not None and status >= 500:
+        return "status_5xx"
+    return None
+
+def is_bot_wall(body: str) -> bool:
+    title = BOT_WALL_TITLE.search(body)
+    if title and " ".join(title.group(1).split()).lower() in BOT_WALL_TITLES:
+        return True
+    return BOT_WALL_MARKUP.search(body) is not None
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+# asyncio and aiohttp raise TimeoutError; playwright has its own exception of the same name
+def is_timeout(error: BaseException) -> bool:
+    return isinstance(error, TimeoutError) or type(error).__name__ == "TimeoutError"
+
+# What the code inside a slot saw, for responses that are throttling signals without being errors
+class SlotSignal:
+    def __init__(self):
+        self.reason: Optional[str] = None
+        self.retry_after: Optional[float] = None
+
+    def throttle(self, reason: str, retry_after: Optional[float] = None):
+        self.reason = reason
+        self.retry_after = retry_after
+
+class HostLimiter:
+    def __init__(self, host: str, max_concurrency: int, min_interval: float, adaptive: bool = ADAPTIVE_CONCURRENCY):
+        self.host = host
+        self.max_concurrency = max(1, max_concurrency)
+        self.adaptive = adaptive
+        # Adaptive hosts start at half the ceiling and earn the rest
+        self.limit = float(max(1, self.max_concurrency // 2) if adaptive else self.max_concurrency)
+        self.in_flight = 0
+        self.changed = asyncio.Condition()
+        self.min_interval = min_interval
+        self.interval = min_interval
+        self.next_start = 0.0
+        self.last_backoff = float("-inf")
+        self.lock = asyncio.Lock()
+        self.publish()
+
+    def publish(self):
+        METRICS.gauge("host_concurrency_limit", int(self.limit), host=self.host)
+        METRICS.gauge("host_interval_seconds", self.interval, host=self.host)
+
+    async def acquire(self):
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self.changed:
+            self.in_flight -= 1
+            self.changed.notify_all()
+
+    async def wait_turn(self):
+        # Spaces out request starts so a host never sees more than one new request per interval (plus some jitter)
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_start - now
+            self.next_start = max(now, self.next_start) + self.interval * random.uniform(1.0, 1.5)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def healthy(self, latency: float):
+        if latency > HOST_LATENCY_TARGET:
+            self.throttle("slow", time.monotonic() - latency)
+            return
+        if self.adaptive:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self.interval = max(self.min_interval, self.interval - THROTTLE_BACKOFF / 4)
+            self.publish()
+
+    # Requests already in flight when the host last backed off report the same congestion, so only requests
+    # sent after it (started) can halve the limit again
+    def throttle(self, reason: str, started: float, retry_after: Optional[float] = None):
+        METRICS.count("throttle_events", host=self.host, reason=reason)
+        now = time.monotonic()
+        if self.adaptive and started >= self.last_backoff:
+            self.limit = max(1.0, self.limit / 2)
+            self.interval = min(HOST_MAX_INTERVAL, max(self.interval * 2, THROTTLE_BACKOFF))
+            self.last_backoff = now
+            self.next_start = max(self.next_start, now + self.interval)
+            self.publish()
+        if retry_after:
+            self.next_start = max(self.next_start, now + min(retry_after, HOST_MAX_INTERVAL))
+
+# Global concurrency budget plus adaptive per-host concurrency and rate limits. A host's ceiling is per_host_limit,
+# or the global limit when there is none; host_overrides can give single hosts their own ceiling and spacing
+# ({"max_concurrency": ..., "min_interval": ...}), but every host still draws from the global budget.
+class CrawlLimits:
+    def __init__(self, global_limit: int = PAGE_CONCURRENCY, per_host_limit: Optional[int] = None, min_interval: float = HOST_MIN_INTERVAL,
+                 adaptive: bool = ADAPTIVE_CONCURRENCY, host_overrides: Optional[Dict[str, Dict[str, float]]] = None):
+        self.global_limit = global_limit
+        self.global_semaphore = asyncio.Semaphore(global_limit)
+        self.per_host_limit = per_host_limit
+        self.min_interval = min_interval
+        self.adaptive = adaptive
+        self.host_overrides: Dict[str, Dict[str, float]] = dict(host_overrides or {})
+        self.hosts: Dict[str, HostLimiter] = {}
+
+    # Only applies to hosts that have not been contacted yet
+    def override(self, host: str, **settings: float):
+        self.host_overrides.setdefault(host, {}).update(settings)
+
+    def host(self, host: str) -> HostLimiter:
+        if host not in self.hosts:
+            settings = self.host_overrides.get(host, {})
+            max_concurrency = min(int(settings.get("max_concurrency", self.per_host_limit or self.global_limit)), self.global_limit)
+            self.hosts[host] = HostLimiter(host, max_concurrency, settings.get("min_interval", self.min_interval), self.adaptive)
+        return self.hosts[host]
+
+    # Yields a SlotSignal; Throttled and timeouts raised inside the slot back the host off (timeouts are re-raised
+    # as Throttled so crawl_pages retries them), a clean exit counts as a healthy response
+    @asynccontextmanager
+    async def slot(self, host: str):
+        limiter = self.host(host)
+        started = time.perf_counter()
+        async with self.global_semaphore:
+            await limiter.acquire()
+            try:
+                await limiter.wait_turn()
+                METRICS.observe("slot_wait", time.perf_counter() - started, host=host)
+                signal = SlotSignal()
+                sent = time.monotonic()
+                try:
+                    yield signal
+                except Throttled as e:
+                    limiter.throttle(e.reason, sent, e.retry_after)
+                    raise
+                except Exception as e:
+                    if not is_timeout(e):
+                        raise
+                    limiter.throttle("timeout", sent)
+                    raise Throttled("timeout") from e
+                if signal.reason:
+                    limiter.throttle(signal.reason, sent, signal.retry_after)
+                else:
+                    limiter.healthy(time.monotonic() - sent)
+            finally:
+                await limiter.release()
+
+def listings_exhausted(page_num: int, report: Dict) -> bool:
+    # Only a page that was parsed and had no rows counts; failed pages leave the report empty
+    return report.get("listings") == 0
+
+# Keeps `concurrency` pages in flight at all times instead of waiting for the slowest page of a batch.
+# Pages are handed out in order; once should_stop fires for a page no later page is started.
+async def crawl_pages(page_numbers: Iterable[int], fetch_page: Callable[[int], Awaitable], concurrency: int,
+                      should_stop: Callable[[int, Dict], bool] = listings_exhausted) -> Dict[int, Dict]:
+    pending = iter(sorted(page_numbers))
+    reports: Dict[int, Dict] = {}
+    stop_at: Dict[str, Optional[int]] = {"page": None}
+
+    # A throttled page is tried again once the host has backed off; any other failure leaves its report empty
+    async def fetch_report(page_num: int) -> Dict:
+        for attempt in range(THROTTLE_RETRIES + 1):
+            report: Dict = {}
+            token = current_page_report.set(report)
+            try:
+                await fetch_page(page_num)
+            except Throttled as e:
+                if attempt < THROTTLE_RETRIES:
+                    print(f"Page {page_num} throttled ({e.reason}), retrying")
+                    continue
+                METRICS.count("failures", stage="page", error="Throttled")
+                print(f"Page {page_num} failed: throttled ({e.reason}) {attempt + 1} times")
+            except Exception as e:
+                METRICS.count("failures", stage="page", error=type(e).__name__)
+                print(f"Page {page_num} failed: {type(e).__name__}: {e}")
+            finally:
+                current_page_report.reset(token)
+            return report
+
+    async def worker():
+        for page_num in pending:
+            if stop_at["page"] is not None and page_num > stop_at["page"]:
+                return
+            report = await fetch_report(page_num)
+            reports[page_num] = report
+            if should_stop(page_num, report):
+                if stop_at["page"] is None or page_num < stop_at["page"]:
+                    print(f"Stopping after page {page_num}: {report}")
+                    stop_at["page"] = page_num
+
+    await asyncio.gather(*[worker() for _ in range(max(1, concurrency))])
+    return reports
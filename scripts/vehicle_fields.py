@@ -0,0 +1,165 @@
+import re
+
+from typing import Any, Dict, List, Optional
+from extraction_plan import plan_for
+
+# Pure listing helpers: name, price and engine parsing plus the avto.net field specs. Kept free of browser,
+# database and HTTP imports so the parsers, the benchmark and the syncs can use them without paying for
+# playwright or pymongo at startup; avtonet_scraper re-exports everything here.
+
+def check_special_make(name_parts: list[str]) -> Optional[str]:
+    if not name_parts:
+        return None
+    multi_word_makes = {
+        ("Land", "Rover"): "Land Rover",
+        ("Alfa", "Romeo"): "Alfa Romeo",
+        ("Aston", "Martin"): "Aston Martin",
+        ("Rolls", "Royce"): "Rolls Royce",
+        ("DS", "Automobiles"): "DS Automobiles"
+    }
+    for key_tuple, full_make in multi_word_makes.items():
+        if name_parts[:len(key_tuple)] == list(key_tuple):
+            return full_make
+    return name_parts[0]
+
+def check_special_model(make: str, name_parts: list[str]) -> Optional[str]:
+    if not name_parts or len(name_parts) < 2:
+        return None
+    offset = len(make.split())
+    try:
+        match make:
+            case "BMW":
+                if name_parts[offset].lower() == "serija":
+                    return f"{name_parts[offset]} {name_parts[offset+1]}".replace(":", "")
+                return name_parts[offset]
+            case "Land Rover":
+                if name_parts[offset].lower() == "range":
+                    return f"{name_parts[offset]} {name_parts[offset+1]}"
+                return name_parts[offset]
+            case "Tesla":
+                if name_parts[offset].lower() == "model":
+                    return f"{name_parts[offset]} {name_parts[offset+1]}"
+                return name_parts[offset]
+            case _:
+                return name_parts[offset]
+    except IndexError:
+        return None
+
+def extract_price_from_text(reg_price_text, special_price_text):
+    for price_text in [reg_price_text, special_price_text]:
+        if price_text is not None:
+            try:
+                return parse_price_text(price_text)
+            except Exception as e:
+                print(f"Error extracting price: {e}")
+                continue
+    return None
+
+def parse_price_text(price_text: str) -> Optional[int]:
+    price_text = price_text.replace(" €", "").replace(".", "").strip()
+    if not price_text.replace(" ", "").isdigit():
+        return None
+    return int(price_text)
+
+ENGINE_CCM_RE = re.compile(r'(\d+)\s*ccm')
+ENGINE_KW_RE = re.compile(r'(\d+)\s*kw')
+ENGINE_HP_RE = re.compile(r'(\d+)\s*km')
+ENGINE_KW_HP_RE = re.compile(r'(\d+)\s*kw\s*\((\d+)\s*km\)')
+
+# Metric horsepower per kilowatt; the API sources only report kW
+HP_PER_KW = 1.35962
+
+def kw_to_hp(kw) -> Optional[int]:
+    return round(kw * HP_PER_KW) if kw else None
+
+def first_int(pattern: re.Pattern, text: str) -> Optional[int]:
+    match = pattern.search(text)
+    return int(match.group(1)) if match else None
+
+def extract_engine_info(engine_info, is_motorcycle=False):
+    if not engine_info:
+        return None, None, None
+    engine_info = ' '.join(engine_info.strip().split()).lower()
+    engine_ccm, engine_kw, engine_hp = None, None, None
+    if is_motorcycle:
+        match = ENGINE_KW_HP_RE.search(engine_info)
+        if match:
+            engine_kw, engine_hp = int(match.group(1)), int(match.group(2))
+        else:
+            engine_kw = first_int(ENGINE_KW_RE, engine_info)
+            engine_hp = first_int(ENGINE_HP_RE, engine_info)
+    else:
+        parts = engine_info.split(',')
+        if parts:
+            engine_ccm = first_int(ENGINE_CCM_RE, parts[0])
+        kw_hp_part = parts[1] if len(parts) > 1 else engine_info
+        engine_kw = first_int(ENGINE_KW_RE, kw_hp_part)
+        engine_hp = first_int(ENGINE_HP_RE, kw_hp_part)
+    return engine_ccm, engine_kw, engine_hp
+
+# ---------- Configuration for Cars and Motorcycles ----------
+# Row-level sources shared by the field specs below; see extraction_plan.py. Each one is resolved once per row,
+# so the engine string is parsed once for engine_ccm/engine_kw/engine_hp.
+ROW_SOURCES = {
+    "name_parts": lambda row, value: (row.get("name") or "").strip().split(),
+    "make": lambda row, value: check_special_make(value("name_parts")),
+    "price": lambda row, value: extract_price_from_text(row.get("reg_price"), row.get("special_price")),
+    "specs": lambda row, value: row.get("specs") or {},
+    "engine": lambda row, value: extract_engine_info(value("specs").get("Motor"), is_motorcycle=False),
+    "motorcycle_engine": lambda row, value: extract_engine_info(value("specs").get("Motor"), is_motorcycle=True),
+    "img_src": lambda row, value: row.get("img_src"),
+    "link": lambda row, value: row["href"].replace("..", "https://www.avto.net") if row.get("href") else None
+}
+
+CAR_FIELDS = {
+    "make": {"source": "make", "processor": lambda make: make},
+    "model": {"source": ("make", "name_parts"), "processor": lambda make, np: check_special_model(make, np)},
+    "price_eur": {"source": "price", "processor": lambda price: price},
+    "first_registration": {"source": "specs", "processor": lambda s: int(s.get("1.registracija").strip()) if s.get("1.registracija") else None},
+    "mileage_km": {"source": "specs", "processor": lambda s: int(s.get("Prevoženih").replace(" km", "").replace(".", "").strip()) if s.get("Prevoženih") else None},
+    "fuel_type": {"source": "specs", "processor": lambda s: s.get("Gorivo")},
+    "gearbox": {"source": "specs", "processor": lambda s: s.get("Menjalnik")},
+    "engine_ccm": {"source": "engine", "processor": lambda e: e[0]},
+    "engine_kw": {"source": "engine", "processor": lambda e: e[1]},
+    "engine_hp": {"source": "engine", "processor": lambda e: e[2]},
+    "battery_kwh": {"source": "specs", "processor": lambda s: float(s.get("Baterija").replace(" kWh", "").replace(",", ".").strip()) if s.get("Baterija") else None},
+    "state": {"source": "specs", "processor": lambda s: s.get("Starost") if s.get("Starost") else "RABLJENO"},
+    "image_url": {"source": "img_src", "processor": lambda img: img},
+    "link": {"source": "link", "processor": lambda link: link}
+}
+
+MOTORCYCLE_FIELDS = {
+    "make": {"source": "make", "processor": lambda make: make},
+    "model": {"source": ("make", "name_parts"), "processor": lambda make, np: check_special_model(make, np)},
+    "price_eur": {"source": "price", "processor": lambda price: price},
+    "first_registration": {"source": "specs", "processor": lambda s: int(s.get("1.registracija").strip()) if s.get("1.registracija") else None},
+    "mileage_km": {"source": "specs", "processor": lambda s: int(s.get("Prevoženih").replace(" km", "").replace(".", "").strip()) if s.get("Prevoženih") else None},
+    "engine_kw": {"source": "motorcycle_engine", "processor": lambda e: e[1]},
+    "engine_hp": {"source": "motorcycle_engine", "processor": lambda e: e[2]},
+    "state": {"source": "specs", "processor": lambda s: s.get("Starost") if s.get("Starost") else "RABLJENO"},
+    "image_url": {"source": "img_src", "processor": lambda img: img},
+    "link": {"source": "link", "processor": lambda link: link}
+}
+
+TRUCK_FIELDS = {
+    "make": {"source": "make", "processor": lambda make: make},
+    "model": {"source": ("make", "name_parts"), "processor": lambda make, np: check_special_model(make, np)},
+    "price_eur": {"source": "price", "processor": lambda price: price},
+    "first_registration": {"source": "specs", "processor": lambda s: int(s.get("Letnik").strip()) if s.get("Letnik") else None},
+    "mileage_km": {"source": "specs", "processor": lambda s: int(s.get("Prevoženih").replace(" km", "").replace(".", "").strip()) if s.get("Prevoženih") else None},
+    "fuel_type": {"source": "specs", "processor": lambda s: s.get("Gorivo")},
+    "gearbox": {"source": "specs", "processor": lambda s: s.get("Menjalnik")},
+    "state": {"source": "specs", "processor": lambda s: s.get("Starost") if s.get("Starost") else "RABLJENO"},
+    "image_url": {"source": "img_src", "processor": lambda img: img},
+    "link": {"source": "link", "processor": lambda link: link}
+}
+
+# Runs the compiled field plan on plain row dicts (as returned by EXTRACT_ROWS_JS or parse_avtonet_rows), without touching the browser
+def build_vehicle_batch(rows: List[Dict[str, Any]], fields: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return plan_for(fields, ROW_SOURCES).apply_batch(rows)
+
+def build_vehicle_data(row: Dict[str, Any], fields: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    return plan_for(fields, ROW_SOURCES).apply(row)
+
+def valid_candidates(vehicles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [vehicle_data for vehicle_data in vehicles if vehicle_data.get("link") and any(vehicle_data.values())]
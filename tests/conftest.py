@@ -0,0 +1,19 @@
+import pytest
+import mongomock
+from pymongo.results import BulkWriteResult
+
+# mongomock's bulk_write does not accept pymongo 4's UpdateOne; replay the upserts one by one instead
+def replay_bulk_write(self, operations, ordered=True):
+    upserted, matched, modified = [], 0, 0
+    for index, operation in enumerate(operations):
+        result = self.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+        if result.upserted_id is not None:
+            upserted.append({"index": index, "_id": result.upserted_id})
+        matched += result.matched_count
+        modified += result.modified_count
+    return BulkWriteResult({"upserted": upserted, "nMatched": matched, "nModified": modified}, True)
+
+@pytest.fixture
+def mongo_db(monkeypatch):
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", replay_bulk_write)
+    return mongomock.MongoClient().db
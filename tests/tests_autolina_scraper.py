@@ -0,0 +1,48 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from tenacity import wait_none
+from autolina_scraper import SOURCE
+from pipeline import run_standalone
+
+def autolina_app(total, failing_offsets=()):
+    calls = []
+
+    async def searchcars(request):
+        offset, limit = int(request.query["offset"]), int(request.query["limit"])
+        calls.append(offset)
+        if offset in failing_offsets:
+            return web.Response(status=503)
+        cars = [{"carId": i, "slug": f"car-{i}", "makeName": "Audi"} for i in range(offset, min(offset + limit, total))]
+        return web.json_response({"data": {"cars": cars}})
+
+    app = web.Application()
+    app.router.add_get("/api/v2/searchcars", searchcars)
+    return app, calls
+
+@pytest.mark.asyncio
+async def test_sync_pages_concurrently_and_deletes_vanished(mocker, mongo_db):
+    mongo_db.cars.insert_many([{"link": "https://www.autolina.ch/auto/car-1/1"}, {"link": "https://www.autolina.ch/auto/old/99"}])
+    app, calls = autolina_app(total=45)
+    async with TestServer(app) as server:
+        mocker.patch.object(SOURCE, "url", str(server.make_url("/api/v2/searchcars")))
+        mocker.patch.object(SOURCE, "page_size", 10)
+        runtime = await run_standalone([SOURCE], mongo_db)
+
+    assert {0, 10, 20, 30, 40, 50} <= set(calls)
+    assert mongo_db.cars.count_documents({}) == 45
+    assert mongo_db.cars.find_one({"link": "https://www.autolina.ch/auto/old/99"}) is None
+    assert runtime.stats["autolina.ch cars"]["listings"] == 45
+
+@pytest.mark.asyncio
+async def test_sync_skips_deletes_when_incomplete(mocker, mongo_db):
+    mocker.patch("pipeline.fetch_json.retry.wait", wait_none())
+    mocker.patch("scheduler.THROTTLE_BACKOFF", 0)  # the 503s back the host off before each retry
+    mongo_db.cars.insert_one({"link": "https://www.autolina.ch/auto/old/1"})
+    app, calls = autolina_app(total=60, failing_offsets={20})
+    async with TestServer(app) as server:
+        mocker.patch.object(SOURCE, "url", str(server.make_url("/api/v2/searchcars")))
+        await run_standalone([SOURCE], mongo_db)
+
+    assert calls.count(20) == 4  # retried with backoff before giving up
+    assert mongo_db.cars.find_one({"link": "https://www.autolina.ch/auto/old/1"}) is not None
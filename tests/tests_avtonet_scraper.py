@@ -1,19 +1,19 @@
 import pytest
 import asyncio
 from unittest.mock import AsyncMock, Mock
-from scripts.avtonet_scraper import (
-    scrape_data, check_special_make, check_special_model,
-    extract_specs_from_table, extract_price, extract_engine_info,
+from avtonet_scraper import (
+    read_rows, check_special_make, check_special_model,
+    extract_specs_from_table, extract_price_from_text, extract_engine_info,
+    read_rows_evaluate, build_vehicle_batch,
     CAR_FIELDS
 )
-import mongomock
 
 @pytest.fixture(autouse=True)
 def mock_env(monkeypatch):
     monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
 
 @pytest.mark.asyncio
-async def test_scrape_data(mocker):
+async def test_read_rows(mocker):
     # Mock Playwright page and elements
     mock_page = AsyncMock()
     mock_vehicle = AsyncMock()
@@ -48,7 +48,7 @@ async def test_scrape_data(mocker):
                 return element
         return None
 
-    mocker.patch("scripts.avtonet_scraper.query_fallback", new=mock_query_fallback)
+    mocker.patch("avtonet_scraper.query_fallback", new=mock_query_fallback)
 
     # Mock element attributes and text
     mock_full_name_element.inner_text.return_value = "BMW Serija 3"
@@ -74,17 +74,8 @@ async def test_scrape_data(mocker):
     mock_img_element.get_attribute.return_value = "https://example.com/image.jpg"
     mock_link_element.get_attribute.return_value = "../details/123"
 
-    # Mock MongoDB collection
-    mock_collection = mongomock.MongoClient().db.collection
-    mocker.patch("scripts.avtonet_scraper.car_collection", mock_collection)
-    mocker.patch.object(mock_collection, "find_one", return_value=None)  # Mock find_one for mongomock
-    mocker.patch.object(mock_collection, "insert_many", return_value=None)  # Mock insert_many for mongomock
-
-    # Mock page URL to avoid RuntimeWarning
-    mock_page.url = "https://example.com/stran=1"
-
-    # Run scrape_data
-    result = await scrape_data(mock_page, CAR_FIELDS, mock_collection)
+    # Run read_rows and the field plan
+    result = build_vehicle_batch(await read_rows(mock_page), CAR_FIELDS)
 
     # Assertions
     assert len(result) == 1
@@ -135,27 +126,10 @@ async def test_extract_specs_from_table():
     specs = await extract_specs_from_table(AsyncMock(), mock_table)
     assert specs == {"1.registracija": "2020", "Gorivo": "Bencin"}
 
-@pytest.mark.asyncio
-async def test_extract_price():
-    # Mock price elements
-    mock_reg_price = AsyncMock()
-    mock_reg_price.inner_text.return_value = "25.000 €"
-    mock_special_price = AsyncMock()
-    mock_special_price.inner_text.return_value = "20.000 €"
-
-    # Test regular price
-    price = await extract_price(mock_reg_price, None)
-    assert price == 25000
-
-    # Test special price
-    price = await extract_price(None, mock_special_price)
-    assert price == 20000
-
-    # Test invalid price
-    mock_invalid_price = AsyncMock()
-    mock_invalid_price.inner_text.return_value = "Negotiable"
-    price = await extract_price(mock_invalid_price, None)
-    assert price == None
+def test_extract_price_from_text():
+    assert extract_price_from_text("25.000 €", None) == 25000
+    assert extract_price_from_text(None, "20.000 €") == 20000
+    assert extract_price_from_text("Negotiable", None) == None
 
 def test_extract_engine_info():
     # Test car engine info
@@ -176,4 +150,38 @@ def test_extract_engine_info():
     ccm, kw, hp = extract_engine_info("", is_motorcycle=False)
     assert ccm == None
     assert kw == None
-    assert hp == None
\ No newline at end of file
+    assert hp == None
+
+
+@pytest.mark.asyncio
+async def test_read_rows_evaluate():
+    mock_page = AsyncMock()
+    mock_page.evaluate.return_value = [{
+        "name": "BMW Serija 3",
+        "reg_price": "25.000 €",
+        "special_price": None,
+        "specs": {
+            "1.registracija": "2020",
+            "Prevoženih": "50.000 km",
+            "Gorivo": "Bencin",
+            "Motor": "2000 ccm, 150 kW (204 KM)"
+        },
+        "img_src": "https://example.com/image.jpg",
+        "href": "../details/123"
+    }]
+    result = build_vehicle_batch(await read_rows_evaluate(mock_page), CAR_FIELDS)
+
+    # Single CDP round-trip for the whole page
+    mock_page.evaluate.assert_called_once()
+    assert len(result) == 1
+    assert result[0]["make"] == "BMW"
+    assert result[0]["model"] == "Serija 3"
+    assert result[0]["price_eur"] == 25000
+    assert result[0]["first_registration"] == 2020
+    assert result[0]["mileage_km"] == 50000
+    assert result[0]["engine_ccm"] == 2000
+    assert result[0]["engine_kw"] == 150
+    assert result[0]["engine_hp"] == 204
+    assert result[0]["state"] == "RABLJENO"
+    assert result[0]["image_url"] == "https://example.com/image.jpg"
+    assert result[0]["link"] == "https://www.avto.net/details/123"
@@ -0,0 +1,25 @@
+import pytest
+from benchmarks.run_benchmarks import run_benchmarks, find_regressions, STAGES
+
+@pytest.mark.asyncio
+async def test_benchmarks_replay_fixtures(mongo_db):
+    report = await run_benchmarks(pages=1, api_pages=1, repeat=1, engine_iterations=1)
+    results = report["benchmarks"]
+
+    assert report["meta"]["mongo"] == "mongomock"
+    assert results["avto.net"]["items"] == 48
+    assert results["autobid.de"]["items"] == 23  # the "Drugo" row is skipped
+    assert results["doberavto.si"]["items"] == 500
+    assert results["autolina.ch"]["items"] == 20
+    assert set(results["avto.net"]["stages"]) == set(STAGES)
+    assert results["extract_engine_info"]["calls"] == 48
+    assert results["normalise"]["docs"] == 48 + 23 + 500 + 20
+    # Importing an entry point loads no browser, database or HTTP client
+    assert all(not result["heavy_modules"] for result in results["startup"].values())
+    assert results["startup"]["avtonet_scraper"]["import_ms"] > 0
+
+def test_find_regressions():
+    baseline = {"benchmarks": {"avto.net": {"stages": {"parse": {"per_item_us": 100.0}}}, "extract_engine_info": {"per_call_us": 3.0}}}
+    report = {"benchmarks": {"avto.net": {"stages": {"parse": {"per_item_us": 140.0}}}, "extract_engine_info": {"per_call_us": 3.1}}}
+    assert find_regressions(report, baseline, tolerance=0.25) == ["avto.net.parse.per_item_us: 100.0 -> 140.0 (+40%)"]
+    assert find_regressions(report, baseline, tolerance=0.5) == []
@@ -0,0 +1,47 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+from browser_pool import BrowserPool, CONTEXT_OPTIONS
+
+@pytest.fixture
+def mock_playwright():
+    playwright = AsyncMock()
+    browser = AsyncMock()
+    browser.is_connected = Mock(return_value=True)
+    browser.new_context.side_effect = lambda **kwargs: AsyncMock()
+    playwright.chromium.launch.return_value = browser
+    return playwright, browser
+
+@pytest.mark.asyncio
+async def test_pool_reuses_browser_and_recycles_contexts(mock_playwright):
+    playwright, browser = mock_playwright
+    pool = BrowserPool(playwright, size=1, recycle_after_pages=2)
+
+    seen = []
+    for _ in range(3):
+        async with pool.context(pages=1) as context:
+            seen.append(context)
+
+    # One launch, the context is replaced once it has served two pages
+    playwright.chromium.launch.assert_called_once()
+    assert seen[0] is seen[1]
+    assert seen[2] is not seen[0]
+    seen[0].close.assert_called_once()
+    browser.new_context.assert_called_with(**CONTEXT_OPTIONS)
+    assert pool.stats["recycled"] == 1
+
+    await pool.close()
+    seen[2].close.assert_called_once()
+    browser.close.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_pool_relaunches_disconnected_browser(mock_playwright):
+    playwright, browser = mock_playwright
+    async with BrowserPool(playwright, size=2) as pool:
+        async with pool.context():
+            pass
+        browser.is_connected.return_value = False
+        async with pool.context():
+            pass
+        browser.is_connected.return_value = True
+
+        assert playwright.chromium.launch.call_count == 2
@@ -0,0 +1,71 @@
+import pytest
+from datetime import timezone
+from unittest.mock import AsyncMock
+from checkpoints import CleanupJournal
+from data_cleanup import cleanup_outdated_vehicles
+from recheck_schedule import RecheckBudget
+from pipeline import Runtime, run_job
+from avtonet_scraper import SOURCE as AVTONET_SOURCE
+from crawl_state import load_full_crawls
+from scheduler import CrawlLimits
+from tests.tests_html_parsers import AVTONET_HTML
+
+class RunnerDied(BaseException):
+    pass
+
+def avtonet_pages(page_num: int) -> str:
+    return AVTONET_HTML.replace("details/123", f"details/{page_num}") if page_num <= 3 else "<html></html>"
+
+@pytest.mark.asyncio
+async def test_rerun_resumes_after_completed_pages(mocker, mongo_db):
+    mocker.patch.object(AVTONET_SOURCE, "concurrency", 1)
+    job = AVTONET_SOURCE.jobs(mongo_db)[0]
+
+    def dies_on_page_3(runtime, job, page_num):
+        if page_num == 3:
+            raise RunnerDied()
+        return avtonet_pages(page_num)
+
+    mocker.patch.object(AVTONET_SOURCE, "fetch", AsyncMock(side_effect=dies_on_page_3))
+    with pytest.raises(RunnerDied):
+        await run_job(Runtime(mongo_db, limits=CrawlLimits(min_interval=0), run_id="run-1"), AVTONET_SOURCE, job)
+    first_started_at = mongo_db.checkpoints.find_one({"_id": "run-1:avto.net:cars"})["started_at"]
+
+    fetch = mocker.patch.object(AVTONET_SOURCE, "fetch", AsyncMock(side_effect=lambda runtime, job, page_num: avtonet_pages(page_num)))
+    reports = await run_job(Runtime(mongo_db, limits=CrawlLimits(min_interval=0), run_id="run-1"), AVTONET_SOURCE, job)
+
+    assert [call.args[2] for call in fetch.call_args_list] == [3, 4]  # pages 1 and 2 were not fetched again
+    assert reports[1]["links"] == ["https://www.avto.net/details/1"]
+    assert mongo_db.cars.count_documents({}) == 3
+    # The resumed full crawl sweeps relative to the first attempt's start
+    full_crawls = await load_full_crawls(mongo_db.cars, "avto.net", "cars")
+    assert full_crawls[-1].replace(tzinfo=timezone.utc) == first_started_at.replace(tzinfo=timezone.utc)
+
+@pytest.mark.asyncio
+async def test_finished_job_is_skipped(mocker, mongo_db):
+    fetch = mocker.patch.object(AVTONET_SOURCE, "fetch", AsyncMock(side_effect=lambda runtime, job, page_num: avtonet_pages(page_num)))
+    job = AVTONET_SOURCE.jobs(mongo_db)[0]
+    await run_job(Runtime(mongo_db, limits=CrawlLimits(min_interval=0), run_id="run-2"), AVTONET_SOURCE, job)
+    fetch.reset_mock()
+
+    assert await run_job(Runtime(mongo_db, limits=CrawlLimits(min_interval=0), run_id="run-2"), AVTONET_SOURCE, job) == {}
+    fetch.assert_not_called()
+
+    await run_job(Runtime(mongo_db, limits=CrawlLimits(min_interval=0), run_id=""), AVTONET_SOURCE, job)
+    fetch.assert_called()  # without a run id nothing is resumed
+
+@pytest.mark.asyncio
+async def test_cleanup_rechecks_interrupted_batch_first(mocker, mongo_db):
+    mongo_db.cars.insert_many([{"link": f"https://www.avto.net/details/{i}"} for i in range(3)])
+    crashed = CleanupJournal(mongo_db.cars, "avto.net", run_id="run-3")
+    await crashed.start_batch(["https://www.avto.net/details/2"])
+    await crashed.finish_batch(0)
+    await crashed.start_batch(["https://www.avto.net/details/2"])
+
+    check = mocker.patch("data_cleanup.check_batch_validity", AsyncMock(side_effect=lambda links, *args: {link: True for link in links}))
+    journal = CleanupJournal(mongo_db.cars, "avto.net", run_id="run-3")
+    await cleanup_outdated_vehicles(mongo_db.cars, "avto.net", CrawlLimits(min_interval=0), pool=None, budget=RecheckBudget(10), journal=journal)
+
+    assert check.call_args_list[0].args[0] == ["https://www.avto.net/details/2"]
+    assert await journal.in_flight() == []
+    assert await journal.checks_used() == 3
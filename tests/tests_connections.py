@@ -0,0 +1,30 @@
+import pytest
+import connections
+
+@pytest.fixture(autouse=True)
+async def fresh_connections():
+    await connections.close_connections()
+    yield
+    await connections.close_connections()
+
+def test_importing_the_scrapers_opens_no_client(monkeypatch):
+    monkeypatch.delenv("MONGO_URI", raising=False)
+    import avtonet_scraper, autobid_scraper, data_cleanup, remove_duplicate_data  # noqa: F401
+    assert connections._client is None
+    with pytest.raises(RuntimeError):
+        connections.get_db()
+
+@pytest.mark.asyncio
+async def test_one_client_and_session_per_process(monkeypatch):
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
+    db = connections.get_db()
+    assert connections.get_db().client is db.client
+    assert db.name == "endava"
+    assert db.client.options.pool_options.max_pool_size == connections.MONGO_MAX_POOL_SIZE
+    assert set(connections.vehicle_collections(db)) == {"cars", "motorcycles", "trucks"}
+
+    session = await connections.get_session()
+    assert await connections.get_session() is session
+    await connections.close_connections()
+    assert session.closed
+    assert connections._client is None
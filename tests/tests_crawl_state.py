@@ -0,0 +1,129 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock
+from crawl_state import incremental_stop, load_watermark, save_watermark, is_full_crawl, record_full_crawl, load_full_crawls, recently_fully_crawled, sweep_unseen
+from pipeline import Runtime, run_job
+from avtonet_scraper import SOURCE as AVTONET_SOURCE
+from scheduler import CrawlLimits
+from tests.tests_html_parsers import AVTONET_HTML, PROMOTED_FIRST_HTML
+import mongomock
+
+def test_incremental_stop():
+    should_stop = incremental_stop("https://www.avto.net/details/5", threshold=0.8)
+
+    assert should_stop(1, {"listings": 0})
+    assert not should_stop(1, {})  # failed page
+    assert not should_stop(1, {"listings": 10, "new": 3, "links": []})
+    assert should_stop(2, {"listings": 10, "new": 2, "links": []})
+    assert should_stop(3, {"listings": 10, "new": 9, "links": ["https://www.avto.net/details/5"]})
+
+@pytest.mark.asyncio
+async def test_watermark_round_trip():
+    collection = mongomock.MongoClient().db.cars
+    assert await load_watermark(collection, "avto.net", "cars") is None
+
+    await save_watermark(collection, "avto.net", "cars", "https://www.avto.net/details/1")
+    await save_watermark(collection, "avto.net", "cars", "https://www.avto.net/details/2")
+
+    assert await load_watermark(collection, "avto.net", "cars") == "https://www.avto.net/details/2"
+    assert await load_watermark(collection, "avto.net", "trucks") is None
+
+@pytest.mark.asyncio
+async def test_run_job_incremental_saves_watermark(mocker, mongo_db):
+    await save_watermark(mongo_db.cars, "avto.net", "cars", "https://www.avto.net/details/123")
+    fetch = mocker.patch.object(AVTONET_SOURCE, "fetch", AsyncMock(return_value=AVTONET_HTML))
+    job = AVTONET_SOURCE.jobs(mongo_db)[0]
+
+    reports = await run_job(Runtime(mongo_db, limits=CrawlLimits(min_interval=0), incremental=True), AVTONET_SOURCE, job)
+
+    # Every page carries the watermark, so the crawl stops with the first window instead of running to max_pages
+    assert len(reports) == fetch.await_count == AVTONET_SOURCE.concurrency
+    assert await load_watermark(mongo_db.cars, "avto.net", "cars") == "https://www.avto.net/details/123"
+
+def test_incremental_stop_ignores_promoted_links():
+    pinned = "https://www.avto.net/details/1"
+    should_stop = incremental_stop(pinned, threshold=0.8)
+
+    # A pinned listing shows up on page 1 every night, so it cannot mark where the last run stopped
+    assert not should_stop(1, {"listings": 3, "new": 2, "links": [pinned, "https://www.avto.net/details/9", "https://www.avto.net/details/8"],
+                               "promoted": [pinned]})
+
+@pytest.mark.asyncio
+async def test_run_job_watermark_skips_pinned_listing(mocker, mongo_db):
+    mocker.patch.object(AVTONET_SOURCE, "fetch", AsyncMock(side_effect=lambda runtime, job, page_num: PROMOTED_FIRST_HTML if page_num == 1 else "<html></html>"))
+
+    reports = await run_job(Runtime(mongo_db, limits=CrawlLimits(min_interval=0), incremental=True), AVTONET_SOURCE, AVTONET_SOURCE.jobs(mongo_db)[0])
+
+    assert reports[1]["links"] == ["https://www.avto.net/details/1", "https://www.avto.net/details/123"]
+    assert reports[1]["promoted"] == ["https://www.avto.net/details/1"]
+    assert await load_watermark(mongo_db.cars, "avto.net", "cars") == "https://www.avto.net/details/123"
+
+def test_is_full_crawl():
+    assert is_full_crawl({1: {"listings": 20}, 2: {"listings": 0}, 3: {"listings": 0}})
+    assert not is_full_crawl({1: {"listings": 20}, 2: {"listings": 20}})  # hit end_page with listings left
+    assert not is_full_crawl({1: {}, 2: {"listings": 0}})  # a page failed
+    assert not is_full_crawl({1: {"listings": 20}, 3: {"listings": 0}})
+
+def seed_sightings(collection, now):
+    collection.insert_many(
+        [{"link": f"https://www.avto.net/details/{i}", "last_seen": now} for i in range(9)]
+        + [{"link": "https://www.avto.net/details/gone", "last_seen": now - timedelta(days=3)},
+           {"link": "https://autobid.de/sl/avto/1", "last_seen": now - timedelta(days=3)}]
+    )
+
+@pytest.mark.asyncio
+async def test_sweep_unseen_after_full_crawls():
+    collection = mongomock.MongoClient().db.cars
+    now = datetime(2025, 6, 3)
+    seed_sightings(collection, now)
+
+    await record_full_crawl(collection, "avto.net", "cars", now - timedelta(days=1))
+    assert await sweep_unseen(collection, "avto.net", "cars", after_full_crawls=2) == 0  # only one full crawl so far
+
+    await record_full_crawl(collection, "avto.net", "cars", now - timedelta(hours=1))
+    await record_full_crawl(collection, "avto.net", "cars", now)
+    assert await load_full_crawls(collection, "avto.net", "cars") == [now - timedelta(hours=1), now]
+
+    assert await sweep_unseen(collection, "avto.net", "cars", after_full_crawls=2) == 1
+    assert collection.find_one({"link": "https://www.avto.net/details/gone"}) is None
+    assert collection.find_one({"link": "https://autobid.de/sl/avto/1"}) is not None  # other site untouched
+
+@pytest.mark.asyncio
+async def test_sweep_refuses_mass_expiry():
+    collection = mongomock.MongoClient().db.cars
+    now = datetime(2025, 6, 3)
+    seed_sightings(collection, now)
+    await record_full_crawl(collection, "avto.net", "cars", now + timedelta(hours=1))
+
+    assert await sweep_unseen(collection, "avto.net", "cars", after_full_crawls=1, max_fraction=0.2) == 0
+    assert collection.count_documents({}) == 11
+
+@pytest.mark.asyncio
+async def test_recently_fully_crawled():
+    collection = mongomock.MongoClient().db.cars
+    assert not await recently_fully_crawled(collection, "avto.net", "trucks")
+    await record_full_crawl(collection, "avto.net", "trucks", datetime.now(timezone.utc) - timedelta(days=2))
+    assert not await recently_fully_crawled(collection, "avto.net", "trucks", max_age_hours=24)
+    await record_full_crawl(collection, "avto.net", "trucks", datetime.now(timezone.utc))
+    assert await recently_fully_crawled(collection, "avto.net", "trucks", max_age_hours=24)
+
+@pytest.mark.asyncio
+async def test_run_job_full_crawl_sweeps(mocker, mongo_db):
+    mocker.patch.object(AVTONET_SOURCE, "fetch", AsyncMock(side_effect=lambda runtime, job, page_num: AVTONET_HTML if page_num == 1 else "<html></html>"))
+    sweep = mocker.patch("pipeline.sweep_unseen", new=AsyncMock(return_value=0))
+    job = AVTONET_SOURCE.jobs(mongo_db)[2]
+
+    await run_job(Runtime(mongo_db, limits=CrawlLimits(min_interval=0)), AVTONET_SOURCE, job)
+
+    assert len(await load_full_crawls(mongo_db.trucks, "avto.net", "trucks")) == 1
+    sweep.assert_awaited_once_with(mongo_db.trucks, "avto.net", "trucks", AVTONET_SOURCE.sweep_after_full_crawls, AVTONET_SOURCE.sweep_max_fraction)
+
+@pytest.mark.asyncio
+async def test_run_job_without_listings_does_not_sweep(mocker, mongo_db):
+    mocker.patch.object(AVTONET_SOURCE, "fetch", AsyncMock(return_value="<html></html>"))
+    sweep = mocker.patch("pipeline.sweep_unseen", new=AsyncMock(return_value=0))
+
+    await run_job(Runtime(mongo_db, limits=CrawlLimits(min_interval=0)), AVTONET_SOURCE, AVTONET_SOURCE.jobs(mongo_db)[2])
+
+    assert await load_full_crawls(mongo_db.trucks, "avto.net", "trucks") == []
+    sweep.assert_not_awaited()
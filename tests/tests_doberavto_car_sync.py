@@ -0,0 +1,53 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from doberavto_car_sync import SOURCE, convert_car
+from pipeline import run_standalone
+
+def doberavto_app(cars):
+    calls = []
+
+    async def search(request):
+        offset, size = int(request.query["from"]), int(request.query["results"])
+        calls.append(offset)
+        return web.json_response({"results": cars[offset:offset + size]})
+
+    app = web.Application()
+    app.router.add_get("/internal-api/v1/marketplace/search", search)
+    return app, calls
+
+def test_convert_car():
+    converted = convert_car({"postId": 7, "enginePower": 100, "registrationDate": "2020-01-01", "fuelType": "DIESEL", "transmission": "A"})
+    assert converted["link"] == "https://www.doberavto.si/oglas/7"
+    assert converted["engine_hp"] == 136
+    assert converted["first_registration"] == 2020
+    assert converted["fuel_type"] == "diesel motor"
+    assert converted["gearbox"] == "avtomatski menjalnik"
+
+@pytest.mark.asyncio
+async def test_sync_walks_offsets_and_deletes_vanished(mocker, mongo_db):
+    mongo_db.cars.insert_many([
+        {"link": "https://www.doberavto.si/oglas/1", "make": "Old"},
+        {"link": "https://www.doberavto.si/oglas/99"},
+        {"link": "https://www.avto.net/details/99"}
+    ])
+    app, calls = doberavto_app([{"postId": i} for i in range(1, 8)])
+    async with TestServer(app) as server:
+        mocker.patch.object(SOURCE, "url", str(server.make_url("/internal-api/v1/marketplace/search")))
+        mocker.patch.object(SOURCE, "page_size", 3)
+        await run_standalone([SOURCE], mongo_db)
+
+    assert {0, 3, 6, 9} <= set(calls)
+    links = {doc["link"] for doc in mongo_db.cars.find()}
+    assert links == {f"https://www.doberavto.si/oglas/{i}" for i in range(1, 8)} | {"https://www.avto.net/details/99"}
+    assert mongo_db.cars.find_one({"link": "https://www.doberavto.si/oglas/1"})["make"] == "Old"  # insert-only fields kept
+
+@pytest.mark.asyncio
+async def test_sync_keeps_data_on_empty_fetch(mocker, mongo_db):
+    mongo_db.cars.insert_one({"link": "https://www.doberavto.si/oglas/1"})
+    app, _ = doberavto_app([])
+    async with TestServer(app) as server:
+        mocker.patch.object(SOURCE, "url", str(server.make_url("/internal-api/v1/marketplace/search")))
+        await run_standalone([SOURCE], mongo_db)
+
+    assert mongo_db.cars.count_documents({}) == 1
@@ -0,0 +1,69 @@
+import pytest
+from unittest.mock import Mock
+from extraction_plan import ExtractionPlan, plan_for
+from avtonet_scraper import build_vehicle_batch, build_vehicle_data, CAR_FIELDS
+from autobid_scraper import build_vehicle_data as build_autobid_vehicle_data, VEHICLE_FIELDS
+
+AVTONET_ROW = {
+    "name": "BMW Serija 3", "reg_price": "25.000 €", "special_price": None,
+    "specs": {"1.registracija": "2020", "Prevoženih": "50.000 km", "Gorivo": "Bencin", "Motor": "2000 ccm, 150 kW (204 KM)"},
+    "img_src": "https://example.com/image.jpg", "href": "../Ads/details.asp?id=1"
+}
+
+def test_source_resolved_once_per_row():
+    engine = Mock(return_value=(150, 204, 2000))
+    plan = ExtractionPlan({
+        "engine_kw": {"source": "engine", "processor": lambda e: e[0]},
+        "engine_hp": {"source": "engine", "processor": lambda e: e[1]},
+        "engine_ccm": {"source": "engine", "processor": lambda e: e[2]}
+    }, {"engine": lambda row, value: engine(row["motor"])})
+
+    assert plan.apply_batch([{"motor": "a"}, {"motor": "b"}]) == [{"engine_kw": 150, "engine_hp": 204, "engine_ccm": 2000}] * 2
+    assert engine.call_count == 2
+
+def test_unknown_source_raises():
+    with pytest.raises(ValueError):
+        ExtractionPlan({"make": {"source": "nope", "processor": lambda x: x}}, {})
+
+def test_skip_empty_and_failing_fields():
+    sources = {"specs": lambda row, value: row.get("specs") or [], "price": lambda row, value: int(row["price"])}
+    fields = {
+        "first": {"source": "specs", "processor": lambda s: s[0]},
+        "price": {"source": "price", "processor": lambda p: p}
+    }
+    assert ExtractionPlan(fields, sources, skip_empty=True).apply({"price": "x"}) == {"first": None, "price": None}
+    assert ExtractionPlan(fields, sources).apply({"specs": ["a"], "price": "3"}) == {"first": "a", "price": 3}
+
+def test_plan_compiled_once_per_fields():
+    sources = {"a": lambda row, value: 1}
+    fields = {"a": {"source": "a", "processor": lambda a: a}}
+    assert plan_for(fields, sources) is plan_for(fields, sources)
+
+def test_plan_cache_keeps_skip_empty_apart():
+    sources = {"specs": lambda row, value: row.get("specs") or []}
+    fields = {"first": {"source": "specs", "processor": lambda s: s[0]}}
+
+    strict = plan_for(fields, sources)
+    lenient = plan_for(fields, sources, skip_empty=True)
+
+    assert strict is not lenient and lenient is plan_for(fields, sources, skip_empty=True)
+    assert lenient.apply({}) == {"first": None}
+    assert not plan_for(fields, sources).skip_empty
+
+def test_avtonet_batch_matches_single_rows():
+    rows = [AVTONET_ROW, {**AVTONET_ROW, "name": "Audi A4", "href": "../Ads/details.asp?id=2"}]
+    batch = build_vehicle_batch(rows, CAR_FIELDS)
+    assert batch == [build_vehicle_data(row, CAR_FIELDS) for row in rows]
+    assert batch[0]["make"] == "BMW"
+    assert batch[0]["engine_kw"] == 150
+    assert batch[0]["link"] == "https://www.avto.net/Ads/details.asp?id=1"
+
+def test_autobid_fields_from_shared_sources():
+    row = {"name": "Volkswagen Golf", "price": "12.500 €", "specs": ["03.2019", "80.000 Kilometrih", "85 kW (116 KM)", "2 lastnika"],
+           "misc": "Dizel, Ročni menjalnik", "img_src": "https://example.com/a.jpg", "href": "/sl/avto/1"}
+    vehicle = build_autobid_vehicle_data(row, VEHICLE_FIELDS)
+    assert (vehicle["engine_kw"], vehicle["engine_hp"], vehicle["first_registration"]) == (85, 116, 2019)
+    assert vehicle["link"] == "https://autobid.de/sl/avto/1"
+
+    empty = build_autobid_vehicle_data({"name": "", "price": None, "specs": [], "misc": "", "img_src": None, "href": None}, VEHICLE_FIELDS)
+    assert all(value is None for value in empty.values())
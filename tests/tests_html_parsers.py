@@ -0,0 +1,109 @@
+import pytest
+from html_parsers import parse_avtonet_rows, parse_autobid_rows
+from avtonet_scraper import SOURCE as AVTONET_SOURCE, build_vehicle_data, CAR_FIELDS
+from autobid_scraper import build_vehicle_data as build_autobid_vehicle_data, VEHICLE_FIELDS
+
+AVTONET_HTML = """
+<html><body>
+<div class="row bg-white mb-3 pb-3 pb-sm-0 position-relative GO-Shadow-B GO-Results-Row">
+    <div class="GO-Results-Naziv"><span>BMW  Serija 3</span></div>
+    <div class="col-auto p-3 GO-Results-Photo"><div><a href="#"><img src="https://example.com/image.jpg"></a></div></div>
+    <table class="table table-striped table-sm table-borderless font-weight-normal">
+        <tr><td>1.registracija</td><td>2020</td></tr>
+        <tr><td>Prevoženih</td><td>50.000 km</td></tr>
+        <tr><td>Gorivo</td><td>Bencin</td></tr>
+        <tr><td>Motor</td><td>2000 ccm, 150 kW
+            (204 KM)</td></tr>
+        <tr><td colspan="2">ignored</td></tr>
+    </table>
+    <div class="GO-Results-Top-Price-TXT-Regular">25.000 €</div>
+    <a class="stretched-link" href="../details/123"></a>
+</div>
+</body></html>
+"""
+
+# A paid "Top" listing pinned above the newest one
+PROMOTED_ROW = """
+<div class="row bg-white position-relative GO-Results-Row GO-Shadow-B">
+    <div class="GO-Results-Naziv"><span>Audi A6</span></div>
+    <div class="GO-Results-Top-PhotoTop"><a href="#"><img src="https://example.com/a6.jpg"></a></div>
+    <div class="GO-Results-Top-Price-TXT-Regular">31.000 €</div>
+    <a class="stretched-link" href="../details/1"></a>
+</div>
+"""
+PROMOTED_FIRST_HTML = AVTONET_HTML.replace("<html><body>", "<html><body>" + PROMOTED_ROW)
+
+AUTOBID_HTML = """
+<html><body>
+<div class="-mx-3 block px-3 pt-3 cursor-pointer">
+    <a class="relative max-w-max">Audi A4 Avant</a>
+    <div class="flex w-full flex-col xl:mt-0 xl:w-auto md:w-1/4 hidden md:flex"><span><span><span>12.500&nbsp;€</span></span></span></div>
+    <span class="car-parameter-value w-full sm:w-auto">03.2019</span>
+    <span class="car-parameter-value w-full sm:w-auto">120.000 Kilometrih</span>
+    <span class="car-parameter-value w-full sm:w-auto">110 kW (150 KM)</span>
+    <span class="car-parameter-value w-full sm:w-auto">2 lastnikov</span>
+    <p class="mt-4">Kombi, Dizel, Avtomatik</p>
+    <picture class="flex h-auto w-full max-w-full object-contain"><img src="https://example.com/a4.jpg"></picture>
+    <a class="flex w-full min-w-full items-center justify-center bg-black" href="/sl/avto/123"></a>
+</div>
+</body></html>
+"""
+
+def test_parse_avtonet_rows():
+    rows = parse_avtonet_rows(AVTONET_HTML)
+    assert rows == [{
+        "name": "BMW Serija 3",
+        "reg_price": "25.000 €",
+        "special_price": None,
+        "specs": {
+            "1.registracija": "2020",
+            "Prevoženih": "50.000 km",
+            "Gorivo": "Bencin",
+            "Motor": "2000 ccm, 150 kW (204 KM)"
+        },
+        "img_src": "https://example.com/image.jpg",
+        "href": "../details/123",
+        "promoted": False
+    }]
+
+    vehicle = build_vehicle_data(rows[0], CAR_FIELDS)
+    assert vehicle["make"] == "BMW"
+    assert vehicle["model"] == "Serija 3"
+    assert vehicle["price_eur"] == 25000
+    assert vehicle["engine_hp"] == 204
+    assert vehicle["link"] == "https://www.avto.net/details/123"
+
+def test_parse_autobid_rows():
+    rows = parse_autobid_rows(AUTOBID_HTML)
+    assert len(rows) == 1
+    assert rows[0]["specs"] == ["03.2019", "120.000 Kilometrih", "110 kW (150 KM)", "2 lastnikov"]
+
+    vehicle = build_autobid_vehicle_data(rows[0], VEHICLE_FIELDS)
+    assert vehicle["make"] == "Audi"
+    assert vehicle["model"] == "A4"
+    assert vehicle["price_eur"] == 12500
+    assert vehicle["first_registration"] == 2019
+    assert vehicle["mileage_km"] == 120000
+    assert vehicle["fuel_type"] == "Dizel"
+    assert vehicle["gearbox"] == "Avtomatik"
+    assert vehicle["engine_kw"] == 110
+    assert vehicle["engine_hp"] == 150
+    assert vehicle["state"] == "RABLJENO"
+    assert vehicle["image_url"] == "https://example.com/a4.jpg"
+    assert vehicle["link"] == "https://autobid.de/sl/avto/123"
+
+def test_parse_flags_promoted_rows():
+    rows = parse_avtonet_rows(PROMOTED_FIRST_HTML)
+    assert [(row["href"], row["promoted"]) for row in rows] == [("../details/1", True), ("../details/123", False)]
+
+def test_parse_empty_page():
+    assert parse_avtonet_rows("<html><body><p>Ni zadetkov</p></body></html>") == []
+    assert parse_autobid_rows("<html><body></body></html>") == []
+
+@pytest.mark.asyncio
+async def test_source_parses_page_html():
+    job = {"fields": CAR_FIELDS}
+
+    docs = AVTONET_SOURCE.normalise_batch(await AVTONET_SOURCE.parse(AVTONET_HTML, job), job)
+
+    assert [vehicle["link"] for vehicle in docs] == ["https://www.avto.net/details/123"]
@@ -0,0 +1,86 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+from link_validator import LinkValidator, classify_avtonet, classify_autobid, BODY_SNIFF_BYTES, VALID, INVALID, AMBIGUOUS
+from data_cleanup import check_batch_validity
+
+def test_classify_avtonet():
+    assert classify_avtonet(302, "https://www.avto.net/unvalid.asp", "") == INVALID
+    assert classify_avtonet(302, "https://www.avto.net/Ads/results.asp", "") == AMBIGUOUS
+    assert classify_avtonet(200, None, "<html>Oglas</html>") == VALID
+    assert classify_avtonet(200, None, "<title>Just a moment...</title>") == AMBIGUOUS
+    assert classify_avtonet(403, None, "") == AMBIGUOUS
+    assert classify_avtonet(500, None, "") == AMBIGUOUS
+
+def test_classify_autobid():
+    assert classify_autobid(404, None, "") == INVALID
+    assert classify_autobid(200, None, "<span>Stran ni bila najdena</span>") == INVALID
+    assert classify_autobid(200, None, '<span class="car-parameter-value w-full sm:w-auto">03.2019</span>') == VALID
+    assert classify_autobid(200, None, "<html><div id=\"app\"></div></html>") == AMBIGUOUS  # rendered client-side
+    assert classify_autobid(200, None, '<span class="car-parameter-value">x</span><title>Just a moment...</title>') == AMBIGUOUS
+    assert classify_autobid(429, None, "") == AMBIGUOUS
+    assert classify_autobid(301, "https://autobid.de/sl", "") == AMBIGUOUS
+
+@pytest.mark.asyncio
+async def test_triage_over_http():
+    async def handler(request):
+        listing = request.match_info["listing"]
+        if listing == "removed":
+            raise web.HTTPFound("/unvalid.asp")
+        if listing == "blocked":
+            return web.Response(status=403, text="Access denied")
+        return web.Response(text="<html>Oglas</html>")
+
+    app = web.Application()
+    app.router.add_get("/details/{listing}", handler)
+    async with TestServer(app) as server:
+        links = [str(server.make_url(f"/details/{listing}")) for listing in ("live", "removed", "blocked")]
+        async with LinkValidator() as validator:
+            settled, ambiguous = await validator.triage(links, "avto.net")
+
+    assert settled == {links[0]: True, links[1]: False}
+    assert ambiguous == [links[2]]
+    assert validator.stats == {"http_valid": 1, "http_invalid": 1, "escalated": 1, "http_errors": 0}
+
+@pytest.mark.asyncio
+async def test_autobid_not_found_past_sniff_window():
+    padding = "<script>" + "x" * BODY_SNIFF_BYTES + "</script>"
+    pages = {
+        "removed": f"<html>{padding}<span class=\"car-parameter-value\">-</span><span>Stran ni bila najdena</span></html>",
+        "live": f"<html>{padding}<span class=\"car-parameter-value\">03.2019</span></html>",
+        "shell": f"<html>{padding}<div id=\"app\"></div></html>"
+    }
+
+    async def handler(request):
+        return web.Response(text=pages[request.match_info["listing"]], content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/sl/avto/{listing}", handler)
+    async with TestServer(app) as server:
+        links = [str(server.make_url(f"/sl/avto/{listing}")) for listing in pages]
+        async with LinkValidator() as validator:
+            settled, ambiguous = await validator.triage(links, "autobid.de")
+
+    assert settled == {links[0]: False, links[1]: True}
+    assert ambiguous == [links[2]]
+
+@pytest.mark.asyncio
+async def test_check_batch_validity_escalates_only_ambiguous():
+    leased = []
+
+    class FakePool:
+        @asynccontextmanager
+        async def context(self, pages=1):
+            leased.append(pages)
+            yield "context"
+
+    validator = LinkValidator()
+    validator.triage = AsyncMock(return_value=({"a": True, "b": False}, ["c"]))
+    with patch("data_cleanup.check_vehicle_page_validity", AsyncMock(return_value=True)) as browser_check:
+        results = await check_batch_validity(["a", "b", "c"], "avto.net", FakePool(), validator)
+
+    assert results == {"a": True, "b": False, "c": True}
+    browser_check.assert_awaited_once_with("context", "c", "avto.net")
+    assert leased == [1]
@@ -0,0 +1,68 @@
+import json
+import pytest
+from tenacity import retry, stop_after_attempt, wait_none
+from metrics import RunMetrics, Histogram
+
+def test_histogram_quantiles():
+    histogram = Histogram()
+    for ms in range(1, 101):
+        histogram.observe(ms / 1000)
+    summary = histogram.summary()
+    assert summary["count"] == 100
+    assert summary["p50"] == pytest.approx(0.051)
+    assert summary["p95"] == pytest.approx(0.096)
+    assert summary["max"] == pytest.approx(0.1)
+    assert summary["sum"] == pytest.approx(5.05)
+
+def test_histogram_sample_is_bounded():
+    histogram = Histogram(sample_size=10)
+    for i in range(1000):
+        histogram.observe(float(i))
+    assert len(histogram.samples) == 10
+    assert histogram.count == 1000
+    assert histogram.max == 999.0
+
+def test_spans_and_counters():
+    metrics = RunMetrics()
+    with metrics.span("parse", site="avto.net"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.span("parse", site="avto.net"):
+            raise ValueError("boom")
+    metrics.count("failures", stage="page")
+    metrics.count("failures", stage="page")
+
+    summary = metrics.summary()
+    assert summary["spans"][0]["name"] == "parse"
+    assert summary["spans"][0]["labels"] == {"site": "avto.net"}
+    assert summary["spans"][0]["count"] == 2  # failed spans are timed too
+    assert summary["counters"] == [{"name": "failures", "labels": {"stage": "page"}, "value": 2}]
+
+def test_retry_hook_counts_retries():
+    metrics = RunMetrics()
+    calls = []
+
+    @retry(stop=stop_after_attempt(3), wait=wait_none(), before_sleep=metrics.retry_hook("flaky"), reraise=True)
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError()
+        return "ok"
+
+    assert flaky() == "ok"
+    assert metrics.summary()["counters"] == [{"name": "retries", "labels": {"error": "ConnectionError", "operation": "flaky"}, "value": 2}]
+
+def test_export_json_and_prometheus(tmp_path):
+    metrics = RunMetrics()
+    metrics.observe("db_call", 0.25, op="bulk_write", collection="cars")
+    metrics.count("retries", operation="fetch_json", error="TimeoutError")
+
+    json_path, prom_path = tmp_path / "metrics.json", tmp_path / "scraper.prom"
+    metrics.export(str(json_path), str(prom_path))
+
+    assert json.loads(json_path.read_text())["spans"][0]["p95"] == 0.25
+    prom = prom_path.read_text().splitlines()
+    assert 'scraper_span_seconds{span="db_call",collection="cars",op="bulk_write",quantile="0.95"} 0.250000' in prom
+    assert 'scraper_span_seconds_count{span="db_call",collection="cars",op="bulk_write"} 1' in prom
+    assert 'scraper_retries_total{error="TimeoutError",operation="fetch_json"} 1' in prom
+    assert not (tmp_path / "scraper.prom.tmp").exists()
@@ -0,0 +1,110 @@
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, Mock
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from pymongo.results import BulkWriteResult
+from mongo_writes import build_upsert, bulk_upsert_vehicles, ensure_link_index, format_counts
+from metrics import RunMetrics
+
+def mock_collection(*results):
+    collection = Mock()
+    collection.name = "cars"
+    collection.database.name = "test_mongo_writes"
+    collection.create_index = AsyncMock()
+    collection.bulk_write = AsyncMock(side_effect=list(results))
+    collection.update_many = AsyncMock()
+    return collection
+
+def test_build_upsert():
+    operation = build_upsert({"link": "https://www.avto.net/details/1", "make": "BMW", "price_eur": 25000, "mileage_km": 50000})
+    assert operation == UpdateOne(
+        {"link": "https://www.avto.net/details/1"},
+        {"$set": {"price_eur": 25000, "mileage_km": 50000}, "$setOnInsert": {"make": "BMW"}},
+        upsert=True
+    )
+
+def test_build_upsert_records_sighting():
+    seen_at = datetime(2025, 6, 1)
+    operation = build_upsert({"link": "https://autobid.de/sl/avto/1", "make": "Audi"}, seen_at)
+    assert operation == UpdateOne(
+        {"link": "https://autobid.de/sl/avto/1"},
+        {"$setOnInsert": {"make": "Audi", "first_seen": seen_at, "last_seen": seen_at, "last_verified": seen_at}},
+        upsert=True
+    )
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_vehicles_counts(mocker):
+    metrics = mocker.patch("mongo_writes.METRICS", RunMetrics())
+    docs = [{"link": f"https://www.avto.net/details/{i}", "price_eur": i} for i in range(3)]
+    docs.append({"link": "https://www.avto.net/details/2", "price_eur": 99})  # same listing twice
+    # What Mongo reports now that the sighting stamp is not part of the upsert: details/0 is stored with another
+    # price, details/1 is new, and details/2 is stored with price 99 already, so matching it modifies nothing
+    collection = mock_collection(
+        BulkWriteResult({"upserted": [{"index": 1, "_id": "b"}], "nMatched": 1, "nModified": 1}, True),
+        BulkWriteResult({"upserted": [], "nMatched": 1, "nModified": 0}, True)
+    )
+
+    seen_at = datetime(2025, 6, 1)
+    counts = await bulk_upsert_vehicles(collection, docs, batch_size=2, seen_at=seen_at)
+
+    collection.create_index.assert_called_once_with("link", unique=True, name="link_unique")
+    assert collection.bulk_write.call_count == 2
+    assert counts["inserted"] == 1
+    assert counts["updated"] == 1
+    assert counts["unchanged"] == 1
+    assert counts["inserted_docs"] == [docs[1]]
+    # Duplicates within one write collapse to the last sighting
+    last_batch = collection.bulk_write.call_args.args[0]
+    assert last_batch == [build_upsert({"link": "https://www.avto.net/details/2", "price_eur": 99}, seen_at)]
+    assert format_counts(counts) == "1 inserted, 1 updated, 1 unchanged in 2 bulk write(s)"
+    assert {"name": "upsert_matched", "labels": {"collection": "cars"}, "value": 2} in metrics.summary()["counters"]
+    assert {"name": "upsert_inserted", "labels": {"collection": "cars"}, "value": 1} in metrics.summary()["counters"]
+    # Sightings are stamped separately, one update_many per batch
+    assert [call.args for call in collection.update_many.call_args_list] == [
+        ({"link": {"$in": [docs[0]["link"], docs[1]["link"]]}}, {"$set": {"last_seen": seen_at, "last_verified": seen_at}}),
+        ({"link": {"$in": [docs[2]["link"]]}}, {"$set": {"last_seen": seen_at, "last_verified": seen_at}})
+    ]
+
+@pytest.mark.asyncio
+async def test_unchanged_resighting_counts_as_unchanged(mongo_db):
+    listing = {"link": "https://www.avto.net/details/1", "make": "BMW", "price_eur": 25000, "mileage_km": 50000}
+    first, second, third = datetime(2025, 6, 1), datetime(2025, 6, 2), datetime(2025, 6, 3)
+    await bulk_upsert_vehicles(mongo_db.cars, [listing], seen_at=first)
+
+    counts = await bulk_upsert_vehicles(mongo_db.cars, [dict(listing)], seen_at=second)
+
+    assert (counts["inserted"], counts["updated"], counts["unchanged"]) == (0, 0, 1)
+    stored = mongo_db.cars.find_one({"link": listing["link"]})
+    assert (stored["first_seen"], stored["last_seen"], stored["last_verified"]) == (first, second, second)
+
+    counts = await bulk_upsert_vehicles(mongo_db.cars, [{**listing, "price_eur": 23500}], seen_at=third)
+
+    assert (counts["updated"], counts["unchanged"]) == (1, 0)
+    assert mongo_db.cars.find_one({"link": listing["link"]})["price_eur"] == 23500
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_vehicles_partial_failure():
+    error = BulkWriteError({"writeErrors": [{"index": 1, "code": 11000}], "upserted": [{"index": 0, "_id": "a"}], "nMatched": 0, "nModified": 0})
+    collection = mock_collection(error)
+    docs = [{"link": "https://autobid.de/a"}, {"link": "https://autobid.de/b"}]
+
+    counts = await bulk_upsert_vehicles(collection, docs)
+
+    assert counts["inserted"] == 1
+    assert counts["errors"] == 1
+    assert await bulk_upsert_vehicles(collection, []) == {"inserted": 0, "updated": 0, "unchanged": 0, "errors": 0, "round_trips": 0, "inserted_docs": []}
+
+@pytest.mark.asyncio
+async def test_failed_link_index_is_not_retried_every_write(capsys):
+    collection = mock_collection(*[BulkWriteResult({"upserted": [], "nMatched": 1, "nModified": 0}, True)] * 3)
+    collection.database.name = "test_failed_link_index"
+    collection.create_index = AsyncMock(side_effect=OperationFailure("E11000 duplicate key"))
+
+    for page in range(3):
+        await bulk_upsert_vehicles(collection, [{"link": f"https://www.avto.net/details/{page}"}])
+
+    # Writes still go through, but the failed index is only attempted (and reported) once per run
+    assert collection.create_index.call_count == 1
+    assert collection.bulk_write.call_count == 3
+    assert capsys.readouterr().out.count("Could not create unique link index") == 1
@@ -0,0 +1,51 @@
+import pytest
+from normalise_vehicles import normalise_all_collections, normalise_collection
+
+def stored_listings():
+    return [
+        {"_id": 1, "link": "https://www.doberavto.si/oglas/1", "make": "VW", "model": " Golf  ", "fuel_type": "bencinski motor",
+         "gearbox": "ročni menjalnik", "engine_kw": 132, "engine_hp": 180, "first_registration": 2019, "price_eur": 9000},
+        {"_id": 2, "link": "https://www.autolina.ch/auto/octavia/2", "make": "Skoda", "model": "Octavia", "fuel_type": "Unknown",
+         "gearbox": "Automatic", "engine_kw": None, "engine_hp": None},
+        {"_id": 3, "link": "https://autobid.de/sl/avto/3", "make": "BMW", "model": "Serija 3", "fuel_type": "Dizel",
+         "gearbox": "6-stopenjsko stikalno gonilo", "engine_kw": 150, "engine_hp": 204},
+        {"_id": 4, "link": "https://www.avto.net/details/4", "make": "BMW", "model": "X5", "fuel_type": "diesel motor",
+         "gearbox": "avtomatski menjalnik", "engine_kw": None, "engine_hp": 204, "first_registration": 2020}
+    ]
+
+@pytest.mark.asyncio
+async def test_sources_converge_on_one_vocabulary(mongo_db):
+    mongo_db.cars.insert_many(stored_listings())
+    mongo_db.trucks.insert_one({"_id": 5, "link": "https://www.avto.net/details/5", "make": "MAN", "Year": 2015})
+
+    stats = await normalise_all_collections(mongo_db, dry_run=False)
+
+    assert {s["collection"]: s["changed"] for s in stats} == {"cars": 3, "motorcycles": 0, "trucks": 1}
+    cars = {doc["_id"]: doc for doc in mongo_db.cars.find()}
+    assert (cars[1]["make"], cars[1]["model"], cars[1]["fuel_type"]) == ("Volkswagen", "Golf", "bencin motor")
+    assert cars[1]["engine_hp"] == 179  # derived from kW with the exact factor, not 1.36
+    assert cars[1]["price_eur"] == 9000
+    assert (cars[2]["make"], cars[2]["fuel_type"], cars[2]["gearbox"]) == ("Škoda", None, "avtomatski menjalnik")
+    assert (cars[3]["fuel_type"], cars[3]["gearbox"], cars[3]["engine_hp"]) == ("diesel motor", "ročni menjalnik", 204)  # parsed hp is kept
+    assert cars[3]["gearbox_detail"] == "6-stopenjsko stikalno gonilo"
+    assert "gearbox_detail" not in cars[1]
+    assert (cars[4]["engine_kw"], cars[4]["engine_hp"]) == (None, 204)  # avto.net never reported the kW
+    assert mongo_db.trucks.find_one({"_id": 5}, {"_id": 0, "link": 0}) == {"make": "MAN", "first_registration": 2015}
+
+@pytest.mark.asyncio
+async def test_only_changed_fields_are_written(mocker, mongo_db):
+    mongo_db.cars.insert_many(stored_listings())
+    bulk_write = mocker.spy(mongo_db.cars, "bulk_write")
+
+    dry_run = await normalise_collection(mongo_db.cars, batch_size=2, dry_run=True)
+    assert (dry_run["docs"], dry_run["changed"], dry_run["written"]) == (4, 3, 0)
+    bulk_write.assert_not_called()
+
+    await normalise_collection(mongo_db.cars, batch_size=2, dry_run=False)
+    assert bulk_write.call_count == 2  # one bulk update per chunk
+    first = bulk_write.call_args_list[0].args[0][0]
+    assert first._doc == {"$set": {"fuel_type": "bencin motor", "make": "Volkswagen", "model": "Golf", "engine_hp": 179}}
+
+    rerun = await normalise_collection(mongo_db.cars, batch_size=2, dry_run=False)
+    assert (rerun["changed"], bulk_write.call_count) == (0, 2)
+    assert rerun["docs_per_sec"] > 0
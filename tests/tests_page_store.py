@@ -0,0 +1,48 @@
+import gzip
+import json
+import pytest
+from unittest.mock import AsyncMock
+from page_store import save_page, load_page, page_path, region_hash, record_page
+from pipeline import Runtime, run_job
+from avtonet_scraper import SOURCE as AVTONET_SOURCE
+from scheduler import CrawlLimits
+from tests.tests_html_parsers import AVTONET_HTML
+
+def test_pages_are_content_addressed(tmp_path):
+    digest = save_page(AVTONET_HTML, str(tmp_path))
+    assert save_page(AVTONET_HTML, str(tmp_path)) == digest
+    assert len(list(tmp_path.rglob("*.html.gz"))) == 1
+    assert gzip.open(page_path(str(tmp_path), digest), "rt", encoding="utf-8").read() == AVTONET_HTML
+    assert load_page(digest, str(tmp_path)) == AVTONET_HTML
+
+    record_page("avto.net", "https://www.avto.net/results.asp?stran=1", digest, "abc", str(tmp_path))
+    entry = json.loads(next(tmp_path.glob("manifest-*.jsonl")).read_text())
+    assert entry["sha256"] == digest and entry["site"] == "avto.net"
+
+def test_region_hash_covers_listing_rows_only():
+    base = region_hash(AVTONET_HTML, "avto.net")
+    assert base is not None
+    assert region_hash(AVTONET_HTML.replace("<body>", "<body><div class='ad'>Banner 42</div>"), "avto.net") == base
+    assert region_hash(AVTONET_HTML.replace("25.000 €", "24.500 €"), "avto.net") != base
+    assert region_hash("<html><body></body></html>", "avto.net") is None
+
+@pytest.mark.asyncio
+async def test_unchanged_page_skips_parse_and_write(mocker, mongo_db):
+    mocker.patch("page_store.SKIP_UNCHANGED_PAGES", True)
+    mocker.patch("page_store.PAGE_CAPTURE", True)
+    pages = {1: AVTONET_HTML}
+    mocker.patch.object(AVTONET_SOURCE, "fetch", AsyncMock(side_effect=lambda runtime, job, page_num: pages.get(page_num, "<html></html>")))
+    runtime = Runtime(mongo_db, limits=CrawlLimits(min_interval=0))
+    job = AVTONET_SOURCE.jobs(mongo_db)[0]
+
+    await run_job(runtime, AVTONET_SOURCE, job)
+    first_seen = mongo_db.cars.find_one()["last_seen"]
+    assert mongo_db.page_state.count_documents({}) == 1
+
+    pages[1] = AVTONET_HTML.replace("<body>", "<body><div class='ad'>Banner</div>")
+    parse = mocker.spy(AVTONET_SOURCE, "parse")
+    reports = await run_job(runtime, AVTONET_SOURCE, job)
+
+    assert all(call.args[0] == "<html></html>" for call in parse.call_args_list)  # only empty pages were parsed
+    assert reports[1] == {"listings": 1, "new": 0, "links": ["https://www.avto.net/details/123"]}
+    assert mongo_db.cars.find_one()["last_seen"] > first_seen
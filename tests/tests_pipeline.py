@@ -0,0 +1,167 @@
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, Mock
+from pipeline import BrowserSource, Runtime, run_job, run_sources, select_row_reader
+from avtonet_scraper import SOURCE as AVTONET_SOURCE, ROW_READERS, read_rows_evaluate
+from html_parsers import parse_avtonet_rows
+from vehicle_fields import build_vehicle_batch
+from autobid_scraper import SOURCE as AUTOBID_SOURCE
+from doberavto_car_sync import SOURCE as DOBERAVTO_SOURCE
+from crawl_state import load_watermark, load_full_crawls
+from scheduler import CrawlLimits, is_bot_wall
+from metrics import RunMetrics
+from tests.tests_html_parsers import AVTONET_HTML
+
+def test_sources_declare_jobs(mongo_db):
+    jobs = AVTONET_SOURCE.jobs(mongo_db) + AUTOBID_SOURCE.jobs(mongo_db)
+    assert [(job["site"], job["category"], job["newest_first"]) for job in jobs] == [
+        ("avto.net", "cars", True), ("avto.net", "motorcycles", False), ("avto.net", "trucks", False),
+        ("autobid.de", "cars", True), ("autobid.de", "motorcycles", True), ("autobid.de", "trucks", True)
+    ]
+    assert jobs[1]["collection"].name == "motorcycles"
+    assert AVTONET_SOURCE.page_url(jobs[0], 3).endswith("stran=3")
+    assert AUTOBID_SOURCE.page_url(jobs[3], 3).endswith("currentPage=3")
+
+def test_select_row_reader_rejects_unknown_modes():
+    assert select_row_reader(ROW_READERS, "evaluate", "AVTONET_EXTRACTION_MODE") is read_rows_evaluate
+    assert select_row_reader(ROW_READERS, "html", "AVTONET_EXTRACTION_MODE") is None
+    with pytest.raises(ValueError, match="Unknown AVTONET_EXTRACTION_MODE 'evalute'; expected one of: handles, evaluate, html"):
+        select_row_reader(ROW_READERS, "evalute", "AVTONET_EXTRACTION_MODE")
+
+def test_autobid_source_skips_other_category():
+    row = {"name": "Prikolica", "price": None, "specs": [], "misc": "Drugo", "img_src": None, "href": "/sl/avto/1"}
+    assert AUTOBID_SOURCE.normalise(row, {"fields": {}}) is None
+
+@pytest.mark.asyncio
+async def test_run_job_through_pipeline(mocker, mongo_db):
+    mocker.patch.object(AVTONET_SOURCE, "fetch", AsyncMock(side_effect=lambda runtime, job, page_num: AVTONET_HTML if page_num == 1 else "<html></html>"))
+    metrics = mocker.patch("pipeline.METRICS", RunMetrics())
+    runtime = Runtime(mongo_db, limits=CrawlLimits(min_interval=0), incremental=True)
+    job = AVTONET_SOURCE.jobs(mongo_db)[0]
+
+    reports = await run_job(runtime, AVTONET_SOURCE, job)
+
+    assert reports[1]["links"] == ["https://www.avto.net/details/123"]
+    stored = mongo_db.cars.find_one({"link": "https://www.avto.net/details/123"})
+    assert stored["make"] == "BMW" and stored["last_seen"] is not None
+    assert await load_watermark(mongo_db.cars, "avto.net", "cars") == "https://www.avto.net/details/123"
+    assert len(await load_full_crawls(mongo_db.cars, "avto.net", "cars")) == 1
+    assert runtime.stats["avto.net cars"]["listings"] == 1
+    assert runtime.stats["avto.net cars"]["inserted"] == 1
+    spans = {(span["name"], span["labels"]["site"]): span["count"] for span in metrics.summary()["spans"]}
+    assert spans[("fetch", "avto.net")] == spans[("parse", "avto.net")] == spans[("write", "avto.net")] == len(reports)
+
+CHALLENGE_HTML = """<html><head><title>Just a moment...</title></head>
+<body><form id="challenge-form" action="/Ads/results.asp?__cf_chl_f_tk=abc" method="POST"></form></body></html>"""
+RECAPTCHA_EMPTY_HTML = """<html><head><script src="https://www.google.com/recaptcha/api.js" async defer></script></head>
+<body><p>Ni zadetkov</p><div class="g-recaptcha" data-sitekey="key"></div></body></html>"""
+
+def test_is_bot_wall_matches_only_challenge_pages():
+    assert is_bot_wall(CHALLENGE_HTML)
+    assert is_bot_wall("<html><head><title>Attention Required! | Cloudflare</title></head></html>")
+    assert is_bot_wall('<div id="cf-chl-widget-abc"></div>')
+    assert not is_bot_wall(RECAPTCHA_EMPTY_HTML)
+    assert not is_bot_wall("<html><body>Access denied to the dealer area</body></html>")
+
+@pytest.mark.asyncio
+async def test_empty_page_with_recaptcha_ends_the_crawl(mocker, mongo_db):
+    mocker.patch.object(AVTONET_SOURCE, "fetch", AsyncMock(side_effect=lambda runtime, job, page_num: AVTONET_HTML if page_num == 1 else RECAPTCHA_EMPTY_HTML))
+    limits = CrawlLimits(min_interval=0)
+
+    reports = await run_job(Runtime(mongo_db, limits=limits), AVTONET_SOURCE, AVTONET_SOURCE.jobs(mongo_db)[1])
+
+    assert reports[2]["listings"] == 0
+    assert len(await load_full_crawls(mongo_db.motorcycles, "avto.net", "motorcycles")) == 1
+    assert limits.host("www.avto.net").last_backoff == float("-inf")
+
+@pytest.mark.asyncio
+async def test_challenge_page_backs_host_off_and_is_retried(mocker, mongo_db):
+    mocker.patch("scheduler.THROTTLE_BACKOFF", 0.01)
+    challenged = []
+
+    async def fetch(runtime, job, page_num):
+        if page_num == 2 and not challenged:
+            challenged.append(page_num)
+            return CHALLENGE_HTML
+        return AVTONET_HTML if page_num == 1 else "<html></html>"
+
+    mocker.patch.object(AVTONET_SOURCE, "fetch", AsyncMock(side_effect=fetch))
+    limits = CrawlLimits(min_interval=0)
+    healthy = mocker.spy(limits.host("www.avto.net"), "healthy")
+
+    reports = await run_job(Runtime(mongo_db, limits=limits), AVTONET_SOURCE, AVTONET_SOURCE.jobs(mongo_db)[1])
+
+    # The slot records the challenge as a throttle and every other response as healthy
+    assert limits.host("www.avto.net").last_backoff > float("-inf")
+    assert healthy.call_count == AVTONET_SOURCE.fetch.await_count - 1
+    assert reports[2]["listings"] == 0
+    assert [call.args[2] for call in AVTONET_SOURCE.fetch.await_args_list].count(2) == 2
+
+class FakePool:
+    def __init__(self, pages):
+        self.browser_context = Mock(new_page=AsyncMock(side_effect=pages))
+
+    @asynccontextmanager
+    async def context(self):
+        yield self.browser_context
+
+def live_page(rows, html="<html></html>"):
+    page = AsyncMock()
+    page.on = Mock()
+    page.goto.return_value = Mock(status=200)
+    page.evaluate.return_value = rows
+    page.content.return_value = html
+    return page
+
+@pytest.mark.asyncio
+async def test_browser_source_reads_rows_from_live_page(mocker, mongo_db):
+    mocker.patch("pipeline.stealth_async", AsyncMock())
+    source = BrowserSource("avto.net", AVTONET_SOURCE.categories[:1], parser=parse_avtonet_rows, build=build_vehicle_batch,
+                           read_rows=read_rows_evaluate, max_pages=3, concurrency=1)
+    row = {"name": "BMW Serija 3", "reg_price": "25.000 €", "special_price": None, "specs": {"1.registracija": "2020"},
+           "img_src": None, "href": "../details/123"}
+    pages = [live_page([row]), live_page([])]
+    runtime = Runtime(mongo_db, pool=FakePool(pages), limits=CrawlLimits(min_interval=0), incremental=False)
+
+    reports = await run_job(runtime, source, source.jobs(mongo_db)[0])
+
+    assert reports[1]["links"] == ["https://www.avto.net/details/123"] and reports[2]["listings"] == 0
+    assert mongo_db.cars.find_one({"link": "https://www.avto.net/details/123"})["price_eur"] == 25000
+    # The HTML is only read for the empty page, to tell the end of the results from a bot wall
+    pages[0].content.assert_not_awaited()
+    pages[1].content.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_api_and_browser_jobs_share_the_global_budget(mocker, mongo_db):
+    in_flight, peak = [0], [0]
+
+    def tracked(result):
+        async def fetch(runtime, job, page_num):
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            return result
+        return fetch
+
+    mocker.patch.object(AVTONET_SOURCE, "fetch", AsyncMock(side_effect=tracked("<html></html>")))
+    mocker.patch.object(DOBERAVTO_SOURCE, "fetch", AsyncMock(side_effect=tracked({"results": []})))
+    mocker.patch.object(AVTONET_SOURCE, "categories", AVTONET_SOURCE.categories[:1])
+    limits = CrawlLimits(global_limit=3, min_interval=0, adaptive=False)
+
+    await run_sources([AVTONET_SOURCE, DOBERAVTO_SOURCE], Runtime(mongo_db, limits=limits))
+
+    assert DOBERAVTO_SOURCE.limits(Runtime(mongo_db, limits=limits)) is limits
+    assert AVTONET_SOURCE.fetch.await_count + DOBERAVTO_SOURCE.fetch.await_count > limits.global_limit
+    assert peak[0] == limits.global_limit
+    # The API host keeps its own ceiling and spacing within the shared budget
+    api_host = limits.host("www.doberavto.si")
+    assert api_host.max_concurrency == min(DOBERAVTO_SOURCE.concurrency, limits.global_limit) and api_host.min_interval == 0
+
+@pytest.mark.asyncio
+async def test_run_sources_reports_failed_jobs(mocker, mongo_db, capsys):
+    mocker.patch("pipeline.run_job", AsyncMock(side_effect=[RuntimeError("boom"), {}, {}]))
+    results = await run_sources([AVTONET_SOURCE], Runtime(mongo_db))
+    assert isinstance(results[0], RuntimeError)
+    assert "Job avto.net cars failed: RuntimeError: boom" in capsys.readouterr().out
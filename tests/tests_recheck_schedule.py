@@ -0,0 +1,54 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+from recheck_schedule import RecheckBudget, find_due, mark_verified
+from data_cleanup import cleanup_outdated_vehicles
+from scheduler import CrawlLimits
+import mongomock
+
+NOW = datetime(2025, 6, 1, 3, 0)
+
+def seed_collection():
+    collection = mongomock.MongoClient().db.cars
+    collection.insert_many([
+        {"link": "https://www.avto.net/details/fresh", "last_verified": NOW - timedelta(hours=2), "first_seen": NOW - timedelta(days=9)},
+        {"link": "https://www.avto.net/details/stale", "last_verified": NOW - timedelta(days=3), "first_seen": NOW - timedelta(days=9)},
+        {"link": "https://www.avto.net/details/older", "last_verified": NOW - timedelta(days=5), "first_seen": NOW - timedelta(days=30)},
+        {"link": "https://www.avto.net/details/legacy"},
+        {"link": "https://autobid.de/sl/avto/1", "last_verified": NOW - timedelta(days=5)}
+    ])
+    return collection
+
+def test_find_due_orders_by_last_verified():
+    collection = seed_collection()
+    links = [doc["link"] for doc in find_due(collection, "avto.net", now=NOW, recheck_after_hours=24)]
+    assert links == [
+        "https://www.avto.net/details/legacy",
+        "https://www.avto.net/details/older",
+        "https://www.avto.net/details/stale"
+    ]
+
+@pytest.mark.asyncio
+async def test_mark_verified_takes_link_out_of_schedule():
+    collection = seed_collection()
+    await mark_verified(collection, ["https://www.avto.net/details/legacy"], now=NOW)
+    links = [doc["link"] for doc in find_due(collection, "avto.net", now=NOW, recheck_after_hours=24)]
+    assert "https://www.avto.net/details/legacy" not in links
+
+def test_recheck_budget():
+    budget = RecheckBudget(50)
+    assert budget.take(30) == 30
+    assert budget.take(30) == 20
+    assert budget.take(30) == 0
+
+@pytest.mark.asyncio
+async def test_cleanup_respects_budget(mocker):
+    collection = seed_collection()
+    collection.delete_many = AsyncMock()
+    check = mocker.patch("data_cleanup.check_batch_validity", AsyncMock(side_effect=lambda links, *args: {link: True for link in links}))
+
+    await cleanup_outdated_vehicles(collection, "avto.net", CrawlLimits(min_interval=0), pool=None, budget=RecheckBudget(2))
+
+    assert check.call_args.args[0] == ["https://www.avto.net/details/legacy", "https://www.avto.net/details/older"]
+    collection.delete_many.assert_not_called()
+    assert collection.find_one({"link": "https://www.avto.net/details/legacy"})["last_verified"] is not None
@@ -0,0 +1,58 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+from remove_duplicate_data import duplicate_pipeline, link_prefix_match, remove_duplicate_links
+import asyncio
+import mongomock
+
+class AsyncCursor:
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.docs:
+            raise StopAsyncIteration
+        return self.docs.pop(0)
+
+def test_link_prefix_match():
+    assert link_prefix_match("avto.net") == {"link": {"$regex": "^https://www\\.avto\\.net/"}}
+    assert link_prefix_match("example.com") == {"link": {"$regex": "example\\.com"}}
+
+def test_duplicate_pipeline_keeps_oldest():
+    collection = mongomock.MongoClient().db.cars
+    collection.insert_many([
+        {"_id": 1, "link": "https://www.avto.net/details/1"},
+        {"_id": 2, "link": "https://www.avto.net/details/1"},
+        {"_id": 3, "link": "https://www.avto.net/details/1"},
+        {"_id": 4, "link": "https://www.avto.net/details/2"},
+        {"_id": 5, "link": "https://autobid.de/details/1"},
+        {"_id": 6, "link": "https://autobid.de/details/1"},
+    ])
+
+    # mongomock cannot evaluate the expression-based $slice, so the final $project is checked separately
+    pipeline = duplicate_pipeline("avto.net")
+    duplicates = list(collection.aggregate(pipeline[:-1]))
+
+    assert duplicates == [{"_id": "https://www.avto.net/details/1", "count": 3, "ids": [1, 2, 3]}]
+    assert pipeline[-1] == {"$project": {"doomed": {"$slice": ["$ids", 1, {"$subtract": ["$count", 1]}]}}}
+
+@pytest.mark.asyncio
+async def test_remove_duplicate_links_chunks_and_dry_run(mocker):
+    mocker.patch("remove_duplicate_data.DELETE_CHUNK_SIZE", 2)
+    duplicates = [{"_id": "a", "doomed": [2, 3]}, {"_id": "b", "doomed": [5]}]
+    collection = Mock()
+    collection.name = "cars"
+    collection.aggregate = Mock(side_effect=lambda *args, **kwargs: AsyncCursor(duplicates))
+    collection.delete_many = AsyncMock(side_effect=lambda query: Mock(deleted_count=len(query["_id"]["$in"])))
+
+    report = await remove_duplicate_links(collection, "avto.net", asyncio.Semaphore(1), dry_run=True)
+    assert report["removed"] == 3
+    collection.delete_many.assert_not_called()
+    assert collection.aggregate.call_args.kwargs == {"allowDiskUse": True}
+
+    report = await remove_duplicate_links(collection, "avto.net", asyncio.Semaphore(1), dry_run=False)
+    assert report["removed"] == 3
+    assert report["links"] == 2
+    assert [call.args[0] for call in collection.delete_many.call_args_list] == [{"_id": {"$in": [2, 3]}}, {"_id": {"$in": [5]}}]
@@ -0,0 +1,47 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+from resource_blocking import should_block, site_for, prepare_page, TransferStats
+
+def test_site_for():
+    assert site_for("https://www.avto.net/Ads/results.asp?stran=1") == "avto.net"
+    assert site_for("https://autobid.de/sl/rezultati-iskanja") == "autobid.de"
+    assert site_for("https://example.com/") == "example.com"
+
+def test_should_block():
+    assert should_block("https://images.avto.net/photo.jpg", "image", "avto.net")
+    assert should_block("https://www.avto.net/style.css", "stylesheet", "avto.net")
+    assert should_block("https://www.googletagmanager.com/gtm.js", "script", "avto.net")
+    assert not should_block("https://www.avto.net/Ads/results.asp", "document", "avto.net")
+    assert not should_block("https://www.avto.net/js/app.js", "script", "avto.net")
+    # Allowlisted challenge resources always load
+    assert not should_block("https://challenges.cloudflare.com/turnstile/v0/api.js", "stylesheet", "autobid.de")
+
+@pytest.mark.asyncio
+async def test_prepare_page_routes_requests():
+    page = AsyncMock()
+    page.on = Mock()
+    stats = TransferStats()
+
+    await prepare_page(page, "https://www.avto.net/Ads/results.asp?stran=1", stats)
+
+    handler = page.route.call_args.args[1]
+    image_route = AsyncMock()
+    image_route.request = Mock(url="https://images.avto.net/1.jpg", resource_type="image")
+    document_route = AsyncMock()
+    document_route.request = Mock(url="https://www.avto.net/Ads/results.asp", resource_type="document")
+
+    await handler(image_route)
+    await handler(document_route)
+
+    image_route.abort.assert_called_once()
+    document_route.continue_.assert_called_once()
+    assert stats.blocked == {"image": 1}
+
+    event, record_response = page.on.call_args.args
+    assert event == "requestfinished"
+    # Chunked responses have no content-length; the transferred sizes count either way
+    await record_response(Mock(sizes=AsyncMock(return_value={"responseHeadersSize": 400, "responseBodySize": 2048})))
+    await record_response(Mock(sizes=AsyncMock(return_value={"responseHeadersSize": 300, "responseBodySize": -1})))
+    await record_response(Mock(sizes=AsyncMock(side_effect=Exception("Target page, context or browser has been closed"))))
+    assert stats.bytes == 2748
+    assert stats.responses == 3